@@ -0,0 +1,105 @@
+"""
+	Measures how much memory each bank account takes with the old Loan class
+	(a __dict__ per loan, a datetime and copied loan terms, an empty list for
+	every chatter) and with the compact loans.Loan.
+
+	Usage: python bank_memory.py [accounts...]
+"""
+import os
+import sys
+import random
+from datetime import datetime
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Modules'))
+
+import loans
+
+class OldLoan:
+	def __init__(self, amount, interest, fee):
+		self.Amount = amount
+		self._currentAmount = amount
+		self.Interest = interest
+		self.InterestStart = datetime.now()
+		self.Fee = fee
+
+def _sizeOf(root):
+	"""
+		Gets the size of an object and everything it references, counting
+		shared objects once.
+	"""
+	seen = set()
+	stack = [root]
+	total = 0
+
+	while stack:
+		obj = stack.pop()
+
+		if id(obj) in seen:
+			continue
+
+		seen.add(id(obj))
+		total += sys.getsizeof(obj)
+
+		if isinstance(obj, dict):
+			stack.extend(obj.iterkeys())
+			stack.extend(obj.itervalues())
+		elif isinstance(obj, (list, tuple, set)):
+			stack.extend(obj)
+
+		if hasattr(obj, '__dict__'):
+			stack.append(obj.__dict__)
+
+		for slot in getattr(type(obj), '__slots__', ()):
+			if hasattr(obj, slot):
+				stack.append(getattr(obj, slot))
+
+	return total
+
+def _loanCounts(accounts):
+	# Most chatters never borrow, some borrow once and a few borrow a lot.
+	rng = random.Random(accounts)
+	return [rng.choice((0, 0, 0, 0, 0, 0, 1, 1, 2, 4)) for i in xrange(accounts)]
+
+def Before(accounts):
+	money = {}
+	playerLoans = {}
+
+	for steamID, count in enumerate(_loanCounts(accounts)):
+		money[steamID] = 200
+		playerLoans[steamID] = []
+
+		for i in xrange(count):
+			loanType = loans.LoanTypes[i % len(loans.LoanTypes)]
+			playerLoans[steamID].append(
+				OldLoan(loanType.Amount, loanType.Interest, loanType.Fee))
+
+	return money, playerLoans
+
+def After(accounts):
+	money = {}
+	playerLoans = {}
+
+	for steamID, count in enumerate(_loanCounts(accounts)):
+		money[steamID] = 200
+
+		if count > 0:
+			playerLoans[steamID] = [
+				loans.Loan(loans.LoanTypes[i % len(loans.LoanTypes)])
+				for i in xrange(count)
+			]
+
+	return money, playerLoans
+
+def Run(accounts):
+	for name, build in (("Before", Before), ("After", After)):
+		money, playerLoans = build(accounts)
+		# Ints are shared by both layouts, so keys and money are counted too.
+		size = _sizeOf((money, playerLoans))
+		print "{:<7} {:>9,} accounts: {:>14,} bytes ({:,.1f} bytes/account)".format(
+			name, accounts, size, size / float(accounts))
+
+if __name__ == '__main__':
+	sizes = [int(arg) for arg in sys.argv[1:]] or [10000, 1000000]
+
+	for accounts in sizes:
+		Run(accounts)
@@ -0,0 +1,69 @@
+"""
+	Compares dealing a lot of cards with deck.Deck.GetCards(), which makes a
+	Card for every card dealt, with batchshoe.BatchShoe.GetBlock(), which
+	hands back slices of card codes and values.
+
+	Each way deals the same number of cards two at a time and counts how many
+	of the pairs are naturals (an ace and a ten-value card).
+
+	Usage: python batch_shoe.py [cards]
+"""
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Modules'))
+
+import deck
+import batchshoe
+from blackjackhand import GetValue
+
+def DealCards(count):
+	cards = deck.Deck(6, seed = 1)
+	naturals = 0
+
+	for i in xrange(count / 2):
+		first, second = cards.GetCards(2)
+
+		if GetValue(first) + GetValue(second) == 21:
+			naturals += 1
+
+		if cards.NeedsShuffle():
+			cards.Shuffle()
+
+	return naturals
+
+def DealBlocks(count, block = 208):
+	shoe = batchshoe.BatchShoe(6, seed = 1)
+	naturals = 0
+	dealt = 0
+
+	while dealt < count:
+		n = min(block, count - dealt)
+		codes, values = shoe.GetBlock(n)
+
+		if batchshoe.numpy:
+			naturals += int(((values[0::2] + values[1::2]) == 21).sum())
+		else:
+			naturals += sum(1 for first, second in zip(values[0::2], values[1::2])
+				if first + second == 21)
+
+		dealt += n
+
+		if shoe.NeedsShuffle():
+			shoe.Shuffle()
+
+	return naturals
+
+def Run(count):
+	print "NumPy: {}".format("yes" if batchshoe.numpy else "no")
+
+	for name, deal in (("Deck.GetCards()", DealCards), ("BatchShoe.GetBlock()", DealBlocks)):
+		start = time.time()
+		naturals = deal(count)
+		seconds = time.time() - start
+		print "{:<22} {:>12,.0f} cards/s  naturals {:.3%}".format(
+			name, count / seconds, naturals / (count / 2.))
+
+if __name__ == '__main__':
+	Run(int(sys.argv[1]) if len(sys.argv) > 1 else 2000000)
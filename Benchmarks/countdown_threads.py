@@ -0,0 +1,88 @@
+"""
+	Compares starting and stopping countdowns the old way, with a
+	threading.Timer for the callback and for every second announced, against
+	countdown.Countdown on the shared scheduler.
+
+	Before timing anything it checks that the scheduler runs calls in order,
+	never runs cancelled ones and keeps repeating calls going.
+
+	Usage: python countdown_threads.py [countdowns]
+"""
+import os
+import sys
+import time
+import threading
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Modules'))
+
+import countdown
+import scheduler
+
+class OldCountdown(countdown.Countdown):
+	def start(self):
+		self.Timers = [threading.Timer(self.Interval, self.Callback)]
+
+		for i in xrange(1, self.Start + 1):
+			if self.Interval - i < 0:
+				break
+
+			count = "{}...".format(i)
+			self.Timers.append(threading.Timer(self.Interval - i, lambda count=count: self.Say(count)))
+
+		for timer in self.Timers:
+			timer.start()
+
+	def stop(self):
+		for timer in self.Timers:
+			timer.cancel()
+
+def Check():
+	ran = []
+	done = threading.Event()
+	calls = [scheduler.Schedule(0.1 + 0.001 * (i % 50), lambda i=i: ran.append(i))
+		for i in xrange(1000)]
+
+	for call in calls[1::2]:
+		call.Cancel()
+
+	ticks = []
+	every = scheduler.Every(0.01, lambda: ticks.append(1))
+	scheduler.Schedule(0.3, done.set)
+	done.wait(5)
+	every.Cancel()
+
+	expected = sorted(xrange(0, 1000, 2), key = lambda i: (calls[i].When, i))
+
+	if ran != expected:
+		raise AssertionError("Ran {} calls out of order or ran cancelled ones.".format(len(ran)))
+
+	if len(ticks) < 10:
+		raise AssertionError("Repeating call only ran {} times.".format(len(ticks)))
+
+def Run(count):
+	Check()
+	print "Checked the scheduler."
+
+	for name, cls in (("Timer threads", OldCountdown), ("Scheduler", countdown.Countdown)):
+		before = threading.active_count()
+		start = time.time()
+		countdowns = [cls(30, 3, lambda: None, lambda message: None) for i in xrange(count)]
+
+		for timer in countdowns:
+			timer.start()
+
+		started = time.time() - start
+		threads = threading.active_count() - before
+
+		for timer in countdowns:
+			timer.stop()
+
+		print "{:<14} {:,} countdowns started in {:.3f} s, {:,} more threads".format(
+			name, count, started, threads)
+
+		# Let the old timers' threads wind down.
+		while threading.active_count() > before + 1:
+			time.sleep(0.05)
+
+if __name__ == '__main__':
+	Run(int(sys.argv[1]) if len(sys.argv) > 1 else 200)
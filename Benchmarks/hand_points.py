@@ -0,0 +1,63 @@
+"""
+	Compares the old Hand.GetPoints(), which added up every card (comparing
+	enums to value each one) each time it was called, with the running totals
+	blackjackhand.Hand keeps now. Tests/test_blackjackhand.py checks that
+	both give the same points.
+
+	Usage: python hand_points.py [rounds]
+"""
+import os
+import sys
+import timeit
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Modules'))
+
+import deck
+from blackjackhand import Hand
+
+def OldGetValue(card):
+	if card.Rank == deck.Ranks.Ace:
+		return 11
+	elif card.Rank in (deck.Ranks.Jack, deck.Ranks.Queen, deck.Ranks.King):
+		return 10
+	else:
+		return card.Rank.value
+
+def OldGetPoints(hand):
+	points = 0
+
+	for card in hand.Cards:
+		points += OldGetValue(card)
+
+	for card in hand.Cards:
+		if card.Rank == deck.Ranks.Ace:
+			if points > 21:
+				hand.Soft = False
+				points -= 10
+			else:
+				hand.Soft = True
+				break
+
+	return points
+
+class OldHand(Hand):
+	def GetPoints(self):
+		return OldGetPoints(self)
+
+def Run(rounds):
+	cards = deck.Deck().GetCards(4)
+
+	for name, cls in (("Old", OldHand), ("New", Hand)):
+		hand = cls()
+		hand.Deal(cards)
+
+		deal = lambda: cls().Deal(cards)
+		points = hand.GetPoints
+
+		dealTime = min(timeit.repeat(deal, number = rounds, repeat = 5))
+		pointsTime = min(timeit.repeat(points, number = rounds, repeat = 5))
+		print "{:<4} Deal(4 cards) {:>8.3f} us   GetPoints() {:>8.3f} us".format(
+			name, dealTime / rounds * 1e6, pointsTime / rounds * 1e6)
+
+if __name__ == '__main__':
+	Run(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+"""
+	Compares rendering hands the old way, where every card was its own
+	mutable object that built its text each time it was printed, with the
+	shared deck.Cards and the text Hand keeps now.
+
+	Before timing anything it checks that both render the same text for
+	random hands, with and without a face down card and with split hands.
+
+	Usage: python hand_render.py [rounds]
+"""
+import os
+import sys
+import random
+import timeit
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Modules'))
+
+import deck
+from blackjackhand import HandStates, Player, Hand
+
+class OldCard(object):
+	def __init__(self, suit, rank):
+		self.Suit = suit
+		self.Rank = rank
+		self.FaceDown = False
+
+	def __str__(self):
+		return u'🂠' if self.FaceDown else self.Suit.value + str(self.Rank.value)
+
+class OldHand(Hand):
+	def __str__(self):
+		return u"{} {}"  \
+			.format(' ' \
+				.join([unicode(card) for card in self.Cards]),
+					  self.StateString())
+
+	def StateString(self):
+		if any(card.FaceDown for card in self.Cards):
+			return ""
+		elif self.State == HandStates.Stand:
+			return "Stand"
+		elif self.State == HandStates.DoubleDown:
+			return "Double Down"
+		elif self.State == HandStates.Surrender:
+			return "Surrender"
+		elif self.State == HandStates.Blackjack:
+			return "Blackjack"
+		elif self.State == HandStates.Bust:
+			return "Bust"
+		elif self.State == HandStates.Charlie:
+			return "8-card Charlie"
+		else:
+			return ""
+
+class OldPlayer(Player):
+	def __str__(self):
+		if len(self.Hands) == 1:
+			return unicode(self.Hands[0])
+		elif len(self.Hands) > 1:
+			return u''.join(u"{}. {}".format(i, hand) for i, hand in enumerate(self.Hands))
+
+		return ""
+
+def _hands(cards, faceDown):
+	old = OldHand()
+	old.Deal([OldCard(card.Suit, card.Rank) for card in cards])
+	new = Hand()
+	new.Deal(cards)
+
+	if faceDown:
+		old.Cards[1].FaceDown = True
+		new.Hide(1)
+
+	return old, new
+
+def Check(count = 10000):
+	cardDeck = deck.Deck(6)
+
+	for i in xrange(count):
+		cards = cardDeck.GetCards(random.randint(2, 8))
+		old, new = _hands(cards, i % 3 == 0)
+
+		if unicode(old) != unicode(new):
+			raise AssertionError(u"Hand: got {!r}, expected {!r}".format(
+				unicode(new), unicode(old)))
+
+		oldPlayer = OldPlayer(10)
+		newPlayer = Player(10)
+		oldPlayer.Hands = [old, _hands(cards[:2], False)[0]]
+		newPlayer.Hands = [new, _hands(cards[:2], False)[1]]
+
+		if unicode(oldPlayer) != unicode(newPlayer):
+			raise AssertionError(u"Player: got {!r}, expected {!r}".format(
+				unicode(newPlayer), unicode(oldPlayer)))
+
+	return count
+
+def Run(rounds):
+	print "Checked {:,} hands.".format(Check())
+
+	cards = deck.Deck(6).GetCards(4)
+
+	for name, playerClass, faceDown in (("Old", OldPlayer, False), ("New", Player, False),
+		("Old", OldPlayer, True), ("New", Player, True)):
+		old, new = _hands(cards, faceDown)
+		hand = old if playerClass == OldPlayer else new
+		player = playerClass(10)
+		player.Hands = [hand, _hands(cards[:2], False)[playerClass == Player]]
+
+		handTime = min(timeit.repeat(lambda: unicode(hand), number = rounds, repeat = 5))
+		playerTime = min(timeit.repeat(lambda: unicode(player), number = rounds, repeat = 5))
+		print "{:<4} {:<10} Hand {:>8.3f} us   Player (2 hands) {:>8.3f} us".format(
+			name, "face down" if faceDown else "face up",
+			handTime / rounds * 1e6, playerTime / rounds * 1e6)
+
+if __name__ == '__main__':
+	Run(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
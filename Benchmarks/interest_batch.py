@@ -0,0 +1,56 @@
+"""
+	Compares working out every loan's balance one Loan.GetAmount() at a time
+	against interest.LoanBatch.
+
+	Usage: python interest_batch.py [loans]
+"""
+import os
+import sys
+import time
+import random
+import timeit
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Modules'))
+
+import loans
+import interest
+
+def MakeLoans(count):
+	rng = random.Random(count)
+	now = time.time()
+	playerLoans = []
+
+	for i in xrange(count):
+		loan = loans.Loan(rng.choice(loans.LoanTypes))
+		loan.InterestStart = now - rng.random() * 7 * loans.SecondsPerDay
+		playerLoans.append((i / 3, loan))
+
+	return playerLoans
+
+def Run(count):
+	playerLoans = MakeLoans(count)
+	rows = [(owner, loan._currentAmount, loan.Interest, loan.InterestStart)
+		for owner, loan in playerLoans]
+	batch = interest.LoanBatch(rows)
+
+	def loop():
+		return sum(loan.GetAmount() for owner, loan in playerLoans)
+
+	def pack():
+		return interest.LoanBatch(rows).Total()
+
+	tests = (
+		("Loan.GetAmount() loop", loop),
+		("LoanBatch.Total()", batch.Total),
+		("LoanBatch pack + Total()", pack),
+		("LoanBatch.Totals()", batch.Totals),
+	)
+
+	print "{:,} loans, numpy: {}".format(count, interest.numpy != None)
+
+	for name, test in tests:
+		best = min(timeit.repeat(test, number = 1, repeat = 5))
+		print "{:<26} {:>9.2f} ms".format(name, best * 1000)
+
+if __name__ == '__main__':
+	Run(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
@@ -0,0 +1,99 @@
+"""
+	Compares saving the Todo list the old way, pickling the whole list after
+	every change, with todojournal.Journal, which appends each change to a
+	journal and folds it into a snapshot now and then. Also times loading a
+	big list with a long history of changes.
+
+	Usage: python todo_journal.py [items] [changes]
+"""
+import os
+import sys
+import time
+import random
+import shutil
+import tempfile
+import cPickle as pickle
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Modules'))
+
+import todojournal
+
+def MakeChanges(items, changes, rng):
+	"""
+		Gets a list of (index, item) changes, where an item of None removes
+		the item at index.
+	"""
+	size = items
+	made = []
+
+	for i in xrange(changes):
+		if size and rng.random() < 0.4:
+			made.append((rng.randrange(size), None))
+			size -= 1
+		else:
+			made.append((rng.randint(0, size), "Change {} to the list".format(i)))
+			size += 1
+
+	return made
+
+def OldSave(path, items, changes):
+	for index, item in changes:
+		if item == None:
+			del items[index]
+		else:
+			items[index:index] = [item]
+
+		pickle.dump(items, open(path, 'wb'))
+
+def JournalSave(path, items, changes):
+	journal = todojournal.Journal(path)
+	pickle.dump(items, open(path, 'wb'))
+	journal.Load()
+	began = time.time()
+
+	for index, item in changes:
+		if item == None:
+			journal.Remove(index)
+		else:
+			journal.Insert(index, [item])
+
+	# Syncing is done in the background, so it's timed on its own.
+	changed = time.time() - began
+	journal.Flush()
+	return journal.Items, changed, time.time() - began - changed
+
+def Run(items, changes):
+	folder = tempfile.mkdtemp()
+	rng = random.Random(items)
+	start = ["Thing to do number {}".format(i) for i in xrange(items)]
+	made = MakeChanges(items, changes, rng)
+
+	try:
+		old = list(start)
+		began = time.time()
+		OldSave(os.path.join(folder, 'old.p'), old, made)
+		oldTime = time.time() - began
+
+		new, newTime, syncTime = JournalSave(os.path.join(folder, 'TODO.p'), list(start), made)
+
+		if list(new) != old:
+			raise AssertionError("The journal gave a different list.")
+
+		began = time.time()
+		loaded = todojournal.Journal(os.path.join(folder, 'TODO.p')).Load()
+		loadTime = time.time() - began
+
+		if list(loaded) != old:
+			raise AssertionError("Loading the journal gave a different list.")
+
+		print "{:,} items, {:,} changes".format(items, changes)
+		print "Pickle every change  {:>10.1f} us per change".format(oldTime / changes * 1e6)
+		print "Journal              {:>10.1f} us per change, then {:.0f} ms to sync".format(
+			newTime / changes * 1e6, syncTime * 1e3)
+		print "Load                 {:>10.1f} ms".format(loadTime * 1e3)
+	finally:
+		shutil.rmtree(folder, True)
+
+if __name__ == '__main__':
+	Run(int(sys.argv[1]) if len(sys.argv) > 1 else 20000,
+		int(sys.argv[2]) if len(sys.argv) > 2 else 500)
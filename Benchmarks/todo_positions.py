@@ -0,0 +1,104 @@
+"""
+	Compares making random edits at random lines of a long todo list kept in
+	a plain list, where every insert and delete shifts everything after it,
+	with blocklist.BlockList, which only shifts one block.
+
+	Usage: python todo_positions.py [items] [edits]
+"""
+import os
+import sys
+import time
+import random
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Modules'))
+
+from blocklist import BlockList
+
+def MakeEdits(items, edits, rng):
+	"""
+		Gets a list of (line, item) edits, where an item of None removes the
+		line. About as many lines are removed as added, so the list stays
+		around the same size.
+	"""
+	size = items
+	made = []
+
+	for i in xrange(edits):
+		if size and rng.random() < 0.5:
+			made.append((rng.randrange(size), None))
+			size -= 1
+		else:
+			made.append((rng.randint(0, size), "Edit {}".format(i)))
+			size += 1
+
+	return made
+
+def ListEdits(items, edits):
+	for line, item in edits:
+		if item == None:
+			del items[line]
+		else:
+			items[:] = items[:line] + [item] + items[line:]
+
+		items[line - 1 if line else 0]
+
+def SliceEdits(items, edits):
+	for line, item in edits:
+		if item == None:
+			del items[line]
+		else:
+			items[line:line] = [item]
+
+		items[line - 1 if line else 0]
+
+def BlockEdits(items, edits):
+	for line, item in edits:
+		if item == None:
+			items.Pop(line)
+		else:
+			items.Insert(line, (item,))
+
+		items[line - 1 if line else 0]
+
+def Time(edit, make, edits, repeat = 3):
+	"""
+		Gets the best time of a few runs, each on a new list from make().
+	"""
+	best = None
+
+	for i in xrange(repeat):
+		items = make()
+		began = time.time()
+		edit(items, edits)
+		elapsed = time.time() - began
+		best = elapsed if best == None else min(best, elapsed)
+
+	return best
+
+def Run(items, edits):
+	rng = random.Random(items)
+	start = ["Thing to do number {}".format(i) for i in xrange(items)]
+	made = MakeEdits(items, edits, rng)
+
+	print "{:,} items, {:,} edits".format(items, edits)
+
+	# Rebuilding the list on every edit is slow enough to only time a few.
+	rebuilds = min(edits, 1000)
+	rebuild = Time(ListEdits, lambda: list(start), made[:rebuilds], 1)
+	print "Rebuild the list   {:>8.2f} us per edit".format(rebuild / rebuilds * 1e6)
+
+	for name, edit, make in (("Shift the list", SliceEdits, lambda: list(start)),
+		("BlockList", BlockEdits, lambda: BlockList(start))):
+		print "{:<18} {:>8.2f} us per edit".format(name, Time(edit, make, made) / edits * 1e6)
+
+	expected = list(start)
+	SliceEdits(expected, made)
+	items = BlockList(start)
+	BlockEdits(items, made)
+
+	if list(items) != expected:
+		raise AssertionError("The BlockList gave a different list.")
+
+if __name__ == '__main__':
+	Run(int(sys.argv[1]) if len(sys.argv) > 1 else 100000,
+		int(sys.argv[2]) if len(sys.argv) > 2 else 100000)
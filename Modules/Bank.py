@@ -1,54 +1,22 @@
 import math
 import os
 import cPickle as pickle
+import bankstore
+import nameindex
+import blocklist
+import interest
+import ledger
+import SteamKit2
 from threading import Timer
-from datetime import datetime, timedelta
+from collections import OrderedDict
+from loans import Loan, Debt, GetTime, LoanTypes
 
 Module.Name = "Bank"
 Module.Description = "Handles money."
 
-class Loan:
-	def __init__(self, amount, interest, fee):
-		self.Amount = amount
-		self._currentAmount = amount
-		self.Interest = interest
-		self.InterestStart = datetime.now()
-		self.Fee = fee
-		
-		
-	""" 
-		Gets the amount of the loan + interest. 
-	"""
-	def GetAmount(self):
-		# Divide the difference in seconds by the seconds in a day to get the 
-		# time in fractional days.
-		interestTime = ((datetime.now() - self.InterestStart).total_seconds() \
-			/ timedelta(1).total_seconds())
-		
-		# Use the continuous interest formula to FUCK PEOPLE OVER EVEN MORE.
-		amount = self._currentAmount * math.e ** (self.Interest * interestTime)
-		return int(amount)
-	
-	
-	""" 
-		Pays off the loan and resets the amount.
-		Returns True if the loan was totally paid off, else False.
-	"""
-	def Payoff(self, amount):
-		difference = self.GetAmount() - amount
-		
-		if difference <= 0:
-			self._currentAmount = 0
-			return True
-		
-		# Reset the interest start time.
-		self.InterestStart = datetime.now()
-		self._currentAmount = difference
-		
-
 var.PlayerMoney = {}
 var.PlayerLoans = {}
-var.LoanTypes = [Loan(100, 0.10, 10), Loan(500, 0.15, 50), Loan(1000, 0.20, 100)]
+var.LoanTypes = LoanTypes
 	
 var.MoneyFile = "Money.p"
 var.MoneyPath = os.path.join(os.getenv('APPDATA'), "SteamNerd", var.MoneyFile)	
@@ -56,48 +24,421 @@ var.LoanFile = "Loans.p"
 var.LoanPath = os.path.join(os.getenv('APPDATA'), "SteamNerd", var.LoanFile)
 var.Changed = False
 
+# Chatters without loans aren't in PlayerLoans or PlayerDebts.
+var.PlayerDebts = {}
+
+# Set UseDatabase to keep accounts in a SQLite database instead of the pickle
+# files. The first time the database is opened, Money.p and Loans.p are 
+# migrated into it.
+var.UseDatabase = False
+var.DatabaseFile = "Bank.db"
+var.DatabasePath = os.path.join(os.getenv('APPDATA'), "SteamNerd", var.DatabaseFile)
+var.Store = None
+
+# Every change to the bank goes through the ledger, so changes from chat 
+# callbacks and timer threads are applied one at a time, in order, and
+# committed in batches. It's opened in Start().
+var.Ledger = None
+
+# Keys of the transfers that were made with a key, so that a transfer that's
+# tried again after a crash or a reload only moves the money once. They're 
+# saved along with the money, and only the newest SettledSize are kept.
+var.Settled = OrderedDict()
+var.SettledSize = 10000
+var.SettledFile = "Transfers.p"
+var.SettledPath = os.path.join(os.getenv('APPDATA'), "SteamNerd", var.SettledFile)
+
+# Chatter names, kept up to date as chatters come, go and change names.
+var.Names = nameindex.NameIndex()
+var.NamesLoaded = False
+
+# Rankings of the richest chatters and the biggest debtors. They're built the
+# first time someone asks for them and kept in order from then on. Debtors 
+# are ranked by their debt the last time it was looked at or changed.
+var.Richest = None
+var.Debtors = None
+var.RankingSize = 10
+var.MaxRankingSize = 25
+
+# How many days ahead statements project debts.
+var.StatementDays = [0, 1, 7, 30]
+
+
+def Start():
+	# Every chatroom has its own Bank, so each opens the ledger for its room.
+	# Reloading the module stops the last module's ledger for the room.
+	var.Ledger = ledger.Open(("Bank", bankstore.GetKey(Module.Chatroom)), lambda: _commit())
+	
+	if var.UseDatabase:
+		Load()
+
 
 def Load():
+	# Without sqlite3 the bank keeps using the pickle files.
+	if var.UseDatabase and bankstore.sqlite3 == None:
+		print "{} can't be opened without sqlite3.".format(var.DatabaseFile)
+	elif var.UseDatabase:
+		_openDatabase()
+		return
+
 	try:
 		var.PlayerMoney = pickle.load(open(var.MoneyPath, 'rb'))
 		var.PlayerLoans = pickle.load(open(var.LoanPath, 'rb'))
+		var.Settled = pickle.load(open(var.SettledPath, 'rb'))
 	except:
 		pass
 
 
+def _openDatabase():
+	var.Store = bankstore.SQLiteStore(var.DatabasePath)
+	var.Settled = OrderedDict((key, True) for key in var.Store.GetTransfers())
+	
+	if var.Store.IsEmpty():
+		count = var.Store.Migrate(var.MoneyPath, var.LoanPath, _loanToRow)
+		
+		if count > 0:
+			print "Migrated {} bank accounts to {}.".format(count, var.DatabaseFile)
+	
+	
+def _loanToRow(loan):
+	return bankstore.LoanToRow(loan)
+	
+	
+def _rowToLoan(row):
+	loan = bankstore.RowToLoan(row[1:])
+	loan.Id = row[0]
+	return loan
+
+
 def Save():
+	var.Ledger.Submit(_save)
+	
+	
+def _save():
+	# The database is committed after every batch of changes.
+	if var.Store:
+		return
+
 	if var.Changed:
 		var.Changed = False
 		pickle.dump(var.PlayerMoney, open(var.MoneyPath, 'wb'))
 		pickle.dump(var.PlayerLoans, open(var.LoanPath, 'wb'))
+		pickle.dump(var.Settled, open(var.SettledPath, 'wb'))
+		
+		
+def _commit():
+	if var.Store:
+		var.Store.Commit()
 		
 		
 def AddChatter(steamID):
+	var.Ledger.Submit(_addChatter, steamID)
+	
+	
+def _addChatter(steamID):
 	var.PlayerMoney[steamID] = 200
-	var.PlayerLoans[steamID] = []
+	var.PlayerLoans.pop(steamID, None)
+	var.PlayerDebts.pop(steamID, None)
 	var.Changed = True
+	_rankMoney(steamID)
+	_rankDebt(steamID)
+	
+	if var.Store:
+		var.Store.SetMoney(steamID, 200)
+	
+	
+"""
+	Makes sure the chatter has an account, loading it from the database if
+	it isn't loaded yet.
+"""
+def CheckChatter(chatter):
+	if chatter in var.PlayerMoney:
+		return
+		
+	var.Ledger.Submit(_loadChatter, chatter)
+	
+	
+def _loadChatter(chatter):
+	if chatter in var.PlayerMoney:
+		return
+	
+	account = var.Store.GetAccount(chatter) if var.Store else None
+	
+	if account == None:
+		_addChatter(chatter)
+		return
+	
+	money, rows = account
+	var.PlayerMoney[chatter] = money
+	var.PlayerDebts.pop(chatter, None)
+	
+	if len(rows) > 0:
+		var.PlayerLoans[chatter] = [_rowToLoan(row) for row in rows]
+	else:
+		var.PlayerLoans.pop(chatter, None)
+	
+	
+def GetLoans(chatter):
+	return var.PlayerLoans.get(chatter, ())
+	
+	
+"""
+	Gets the chatter's debt total, or None if they don't have any loans.
+"""
+def _getDebt(chatter):
+	debt = var.PlayerDebts.get(chatter)
+	
+	if debt == None and chatter in var.PlayerLoans:
+		debt = Debt(var.PlayerLoans[chatter])
+		var.PlayerDebts[chatter] = debt
+		
+	return debt
+	
+	
+def _getDebtAmount(chatter):
+	debt = _getDebt(chatter)
+	return debt.GetAmount() if debt else 0
 	
 	
 def GetMoney(chatter):
-	if not chatter in var.PlayerMoney:
-		AddChatter(chatter)
+	CheckChatter(chatter)
 	
 	return var.PlayerMoney[chatter]
 	
 	
 def GetDebt(chatter):
-	if not chatter in var.PlayerLoans:
-		AddChatter(chatter)
+	CheckChatter(chatter)
 		
-	return sum(loan.GetAmount() for loan in var.PlayerLoans[chatter])
+	return var.Ledger.Submit(_rankDebt, chatter)
+	
+	
+def GetNetWorth(chatter):
+	return GetMoney(chatter) - GetDebt(chatter)
 
 
 def GiveMoney(chatter, amount):
-	if not chatter in var.PlayerMoney:
-		AddChatter(chatter)
+	Transfer([(chatter, amount)])
+	
+	
+"""
+	Moves money in and out of accounts in one transaction. legs is a list of
+	(chatter, amount) pairs. If minimum isn't None, nothing moves unless 
+	everyone who pays still has at least minimum afterwards. If key isn't 
+	None, nothing moves if a transfer with the same key already has. Returns
+	True if the money moved.
+"""
+def Transfer(legs, minimum = None, key = None):
+	return TransferLater(legs, minimum, key).Wait()
+	
+	
+"""
+	Queues a Transfer() without waiting for it, and returns its
+	ledger.Transaction.
+"""
+def TransferLater(legs, minimum = None, key = None):
+	return var.Ledger.Post(_transfer, legs, minimum, key)
+	
+	
+def _transfer(legs, minimum = None, key = None):
+	if key != None and key in var.Settled:
+		return False
+		
+	totals = {}
+	
+	for chatter, amount in legs:
+		_loadChatter(chatter)
+		totals[chatter] = totals.get(chatter, 0) + amount
+		
+	if minimum != None:
+		for chatter, amount in totals.iteritems():
+			if amount < 0 and var.PlayerMoney[chatter] + amount < minimum:
+				return False
+				
+	for chatter, amount in totals.iteritems():
+		var.PlayerMoney[chatter] += amount
+		_rankMoney(chatter)
+		
+		if var.Store:
+			var.Store.SetMoney(chatter, var.PlayerMoney[chatter])
+			
+	if key != None:
+		_settle(key)
 		
-	var.PlayerMoney[chatter] += amount
 	var.Changed = True
+	return True
+	
+	
+def _settle(key):
+	var.Settled[key] = True
+	
+	while len(var.Settled) > var.SettledSize:
+		var.Settled.popitem(False)
+		
+	# It's committed in the same transaction as the money.
+	if var.Store:
+		var.Store.AddTransfer(key, var.SettledSize)
+
+
+"""
+	Gets the chatter name index, filling it with the chatroom's chatters the
+	first time it's used.
+"""
+def GetNames():
+	if not var.NamesLoaded:
+		var.NamesLoaded = True
+		
+		for chatter in SteamNerd.Chatrooms[Module.Chatroom].Chatters:
+			var.Names.Add(chatter, SteamNerd.GetName(chatter))
+			
+	return var.Names
+	
+	
+def OnChatEnter(callback):
+	GetNames().Add(callback.FriendID, callback.Name)
+	
+	
+def OnChatLeave(callback):
+	GetNames().Remove(callback.StateChangeInfo.ChatterActedOn)
+
+
+"""
+	Builds the rankings from every account the first time they're needed.
+"""
+def _getRankings():
+	if var.Richest == None:
+		money = {}
+		debts = {}
+		
+		if var.Store:
+			for key, amount in var.Store.GetAllMoney():
+				money[key] = amount
+				
+			totals = _getLoanBatch().Totals(GetTime())
+			
+			for key in totals:
+				debts[key] = int(totals[key])
+				
+		# Loaded accounts are at least as new as the database.
+		for chatter in var.PlayerMoney:
+			key = bankstore.GetKey(chatter)
+			money[key] = var.PlayerMoney[chatter]
+			debts[key] = _getDebtAmount(chatter)
+			
+		var.Richest = blocklist.Ranking(money)
+		var.Debtors = blocklist.Ranking(
+			(key, debt) for key, debt in debts.iteritems() if debt > 0)
+		
+	return var.Richest, var.Debtors
+	
+	
+"""
+	Gets every outstanding loan as an interest.LoanBatch, so that every
+	balance can be worked out at once. The batch's owners are account keys.
+"""
+def GetLoanBatch():
+	return var.Ledger.Submit(_getLoanBatch)
+	
+	
+def _getLoanBatch():
+	if var.Store:
+		return interest.LoanBatch(var.Store.GetAllLoans())
+		
+	return interest.LoanBatch(_loanRows(var.PlayerLoans))
+	
+	
+def _loanRows(playerLoans):
+	for chatter in playerLoans:
+		key = bankstore.GetKey(chatter)
+		
+		for loan in playerLoans[chatter]:
+			yield (key, loan._currentAmount, loan.Interest, loan.InterestStart)
+	
+	
+def _rankMoney(chatter):
+	if var.Richest != None:
+		var.Richest.Set(bankstore.GetKey(chatter), var.PlayerMoney[chatter])
+		
+		
+"""
+	Updates the chatter's place in the debtor ranking. Returns their debt.
+"""
+def _rankDebt(chatter):
+	debt = _getDebtAmount(chatter)
+	
+	if var.Debtors != None:
+		if debt > 0:
+			var.Debtors.Set(bankstore.GetKey(chatter), debt)
+		else:
+			var.Debtors.Remove(bankstore.GetKey(chatter))
+			
+	return debt
+
+
+"""
+	Lends the chatter a loan of this type if they can pay the fee. Returns True
+	if they got the loan.
+"""
+def _buyLoan(chatter, loanType):
+	_loadChatter(chatter)
+	
+	if var.PlayerMoney[chatter] < loanType.Fee:
+		return False
+		
+	_addLoan(chatter, Loan(loanType))
+	_transfer([(chatter, loanType.Amount - loanType.Fee)])
+	return True
+	
+	
+"""
+	Pays back some of a loan. Returns False if the loan is gone or the chatter
+	can't afford it anymore.
+"""
+def _payback(chatter, loan, amount):
+	if not loan in GetLoans(chatter) or var.PlayerMoney[chatter] < amount:
+		return False
+		
+	_transfer([(chatter, -amount)])
+	_payoffLoan(chatter, loan, amount)
+	return True
+
+
+def _addLoan(chatter, loan):
+	if chatter in var.PlayerLoans:
+		var.PlayerLoans[chatter].append(loan)
+		_getDebt(chatter).Update(loan)
+	else:
+		var.PlayerLoans[chatter] = [loan]
+		
+	_rankDebt(chatter)
+	var.Changed = True
+	
+	if var.Store:
+		loan.Id = var.Store.AddLoan(chatter, *_loanToRow(loan))
+	
+	
+def _payoffLoan(chatter, loan, amount):
+	paid = loan.Payoff(amount)
+	
+	loans = var.PlayerLoans[chatter]
+	
+	if paid:
+		loans.remove(loan)
+		
+	if len(loans) > 0:
+		_getDebt(chatter).Update(loan)
+	else:
+		del var.PlayerLoans[chatter]
+		var.PlayerDebts.pop(chatter, None)
+		
+	_rankDebt(chatter)
+	var.Changed = True
+	
+	if var.Store:
+		if paid:
+			var.Store.RemoveLoan(loan.Id)
+		else:
+			row = _loanToRow(loan)
+			var.Store.UpdateLoan(loan.Id, row[1], row[3])
 
 
 def ViewMoney(callback, args):
@@ -108,7 +449,7 @@ def ViewMoney(callback, args):
 	message = "{} has ${}.\n".format(name, GetMoney(chatter))
 	
 	if debt > 0:
-		message += "{} is ${} in debt.".format(name, GetDebt(chatter))
+		message += "{} is ${} in debt.".format(name, debt)
 		
 	Say(message)
 
@@ -116,8 +457,7 @@ def ViewMoney(callback, args):
 def BuyLoans(callback, args):
 	chatter = callback.ChatterID
 	
-	if not chatter in var.PlayerLoans:
-		AddChatter(chatter)
+	CheckChatter(chatter)
 
 	if len(args) < 2:
 		ViewLoans()
@@ -136,14 +476,8 @@ def BuyLoans(callback, args):
 		
 		loanType = var.LoanTypes[loanIndex]
 		
-		if GetMoney(chatter) < loanType.Fee:
+		if not var.Ledger.Submit(_buyLoan, chatter, loanType):
 			Say("You can't afford this loan!")
-			return
-			
-		loan = Loan(loanType.Amount, loanType.Interest, loanType.Fee)
-		var.PlayerLoans[chatter].append(loan)
-		GiveMoney(chatter, -loan.Fee)
-		GiveMoney(chatter, loan.Amount)
 
 
 def Payback(callback, args):
@@ -152,11 +486,10 @@ def Payback(callback, args):
 	payback = 0
 	loanIndex = -1
 	
-	if not chatter in var.PlayerLoans:
-		AddChatter(chatter)
+	CheckChatter(chatter)
 	
 	money = var.PlayerMoney[chatter]	
-	loans = var.PlayerLoans[chatter]
+	loans = GetLoans(chatter)
 	loan = None
 
 	if len(loans) == 0:
@@ -197,8 +530,10 @@ def Payback(callback, args):
 			
 		loan = loans[loanIndex]
 		
-	if payback > loan.GetAmount():
-		payback = loan.GetAmount()
+	amount = loan.GetAmount()
+	
+	if payback > amount:
+		payback = amount
 	
 	if money < payback:
 		Say("You don't have enough money to payback that much!")
@@ -208,12 +543,8 @@ def Payback(callback, args):
 		Say("You can't payback a negative amount!")
 		return
 	
-	GiveMoney(chatter, -payback)
-	
-	if loan.Payoff(payback):
-		loans.remove(loan)	
-	
-	var.Changed = True			
+	if not var.Ledger.Submit(_payback, chatter, loan, payback):
+		Say("You don't have enough money to payback that much!")
 	
 			
 def ViewLoans():
@@ -231,10 +562,9 @@ def ViewDebts(callback, args):
 	chatter = callback.ChatterID
 	name = SteamNerd.GetName(chatter)
 	
-	if not chatter in var.PlayerLoans:
-		AddChatter(chatter)
+	CheckChatter(chatter)
 		
-	loans = var.PlayerLoans[chatter]
+	loans = GetLoans(chatter)
 	
 	if len(loans) == 0:
 		Say("{} has no debts!".format(name))
@@ -258,22 +588,24 @@ def Bank(callback, args):
 def Give(callback, args):
 	if len(args) < 3:
 		Say("Usage: {}give [chatter] [amount]".format(SteamNerd.CommandChar))
+		return
 	
 	giver = callback.ChatterID
 	name = SteamNerd.GetName(giver)
-	recipient = None
-	
-	for chatter in SteamNerd.Chatrooms[Module.Chatroom].Chatters:
-		chatterName = SteamNerd.GetName(chatter).lower()
-		
-		if chatterName.find(args[1].lower()) >= 0:
-			recipient = chatter
-			break
+	matches = GetNames().Find(args[1])
 	
-	if recipient == None:
+	if len(matches) == 0:
 		Say("{} not found!".format(args[1]))
 		return
+		
+	if len(matches) > 1:
+		Say("{} could be {}. Who did you mean?".format(
+			args[1], 
+			', '.join(sorted(SteamNerd.GetName(chatter) for chatter in matches))
+		))
+		return
 	
+	recipient = matches[0]
 	amount = 0
 	recipientName = SteamNerd.GetName(recipient)
 	
@@ -283,28 +615,116 @@ def Give(callback, args):
 		Say("That is not a number!")
 		return
 	
-	if amount > GetMoney(giver):
-		Say("You don't have that much money!")
-		return
-		
 	if amount < 0:
 		Say("You must give more than $0.")
 		return
 	
-	GiveMoney(giver, -amount)
-	GiveMoney(recipient, amount)
+	if not Transfer([(giver, -amount), (recipient, amount)], 0):
+		Say("You don't have that much money!")
+		return
 
 	Say("{} gave {} ${}!".format(name, recipientName, amount))
 
 
 def Bankrupt(callback, args):
-	chatter = callback.ChatterID
-	var.PlayerMoney[chatter] = 200
-	var.PlayerLoans[chatter] = []
+	var.Ledger.Submit(_bankrupt, callback.ChatterID)
 	
 	Say("{} declared bankrupcy!"
 		.format(SteamNerd.GetName(callback.ChatterID)))
 		
+		
+def _bankrupt(chatter):
+	var.PlayerMoney[chatter] = 200
+	var.PlayerLoans.pop(chatter, None)
+	var.PlayerDebts.pop(chatter, None)
+	var.Changed = True
+	_rankMoney(chatter)
+	_rankDebt(chatter)
+	
+	if var.Store:
+		var.Store.ResetAccount(chatter, 200)
+		
+		
+def Leaderboard(callback, args):
+	CheckChatter(callback.ChatterID)
+	_viewRanking(callback, args, 0, "Leaderboard", "Nobody has any money!")
+	
+	
+def ViewDebtors(callback, args):
+	GetDebt(callback.ChatterID)
+	_viewRanking(callback, args, 1, "Debtors", "Nobody is in debt!")
+	
+	
+def Statement(callback, args):
+	chatter = callback.ChatterID
+	name = SteamNerd.GetName(chatter)
+	CheckChatter(chatter)
+	
+	batch = GetLoanBatch()
+	now = GetTime()
+	totals = batch.Project(var.StatementDays, now)
+	
+	message = "Bank Statement:\n" + \
+		"{:<20} {:,}\n".format("Loans:", len(batch)) + \
+		"{:<20} ${:,}\n".format("Outstanding Debt:", totals[0])
+		
+	for days, total in zip(var.StatementDays[1:], totals[1:]):
+		message += "{:<20} ${:,}\n".format("In {} day{}:".format(days, "" if days == 1 else "s"), total)
+		
+	loans = GetLoans(chatter)
+	
+	if len(loans) > 0:
+		key = bankstore.GetKey(chatter)
+		projected = interest.LoanBatch(_loanRows({key: loans})) \
+			.Project(var.StatementDays, now)
+		message += "\n{}'s debt: ${:,}".format(name, projected[0])
+		
+		for days, total in zip(var.StatementDays[1:], projected[1:]):
+			message += "\n{:<20} ${:,}".format("In {} day{}:".format(days, "" if days == 1 else "s"), total)
+		
+	Say(message)
+	
+	
+def _viewRanking(callback, args, which, title, emptyMessage):
+	count = var.RankingSize
+	
+	if len(args) > 1:
+		try:
+			count = int(args[1])
+		except ValueError:
+			Say("That is not a number!")
+			return
+			
+	if count <= 0:
+		Say("You must ask for at least 1 chatter!")
+		return
+		
+	count = min(count, var.MaxRankingSize)
+	
+	# The rankings change on the ledger's thread, so read them there too.
+	Say(var.Ledger.Submit(
+		_rankingMessage, callback.ChatterID, which, title, emptyMessage, count))
+	
+	
+def _rankingMessage(chatter, which, title, emptyMessage, count):
+	ranking = _getRankings()[which]
+	
+	if len(ranking) == 0:
+		return emptyMessage
+		
+	message = "{}:\n".format(title)
+	
+	for i, (key, amount) in enumerate(ranking.Top(count)):
+		name = SteamNerd.GetName(SteamKit2.SteamID(key))
+		message += "{}. {:<20} ${}\n".format(i + 1, name, amount)
+		
+	rank = ranking.Rank(bankstore.GetKey(chatter))
+	
+	if rank != None:
+		message += "You are #{:,} of {:,}.".format(rank, len(ranking))
+		
+	return message
+		
 	
 #Load()
 #saveTimer = Timer(60, Save)
@@ -347,4 +767,19 @@ Module.AddCommand(
 	"give", 
 	"Give money to another chatter. Usage: {}give [chatter] [amount]".format(SteamNerd.CommandChar),
 	Give 
+)
+Module.AddCommand(
+	"leaderboard", 
+	"See who has the most money. Usage: {}leaderboard [count]".format(SteamNerd.CommandChar),
+	Leaderboard
+)
+Module.AddCommand(
+	"debtors", 
+	"See who is the most in debt. Usage: {}debtors [count]".format(SteamNerd.CommandChar),
+	ViewDebtors
+)
+Module.AddCommand(
+	"statement", 
+	"See how much everyone owes the bank, now and in the future.",
+	Statement
 )
\ No newline at end of file
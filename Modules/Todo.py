@@ -1,45 +1,121 @@
 ﻿import os
-import cPickle as pickle
-import threading
-import time
+import todojournal
+import todoindex
 
 Module.Name = "TODO"
 Module.Description = "Things to do."
 Module.Global = True
 
-var.TodoList = []
 var.File = "TODO.p"
 var.Path = os.path.join(os.getenv('APPDATA'), "SteamNerd", var.File)
-var.Changed = False
+
+# Every change is added to a journal as it's made, and the journal is folded
+# into the TODO.p snapshot once it gets big. The list is a BlockList, so lines
+# are added and removed anywhere without shifting the whole list. The journal
+# outlives reloads of this module, so it's only read the first time.
+var.Journal = todojournal.GetJournal(var.Path)
+var.TodoList = var.Journal.Items
+
+# Rendered pages of the list by page number, until the list changes. Steam
+# won't send a chat message longer than MessageLimit, so pages are split into
+# messages under it.
+var.PageSize = 20
+var.MessageLimit = 2048
+var.Rendered = {}
+
+# Finds items by the words in them, and is kept up to date along with the list.
+var.Index = todoindex.TodoIndex()
+var.SearchResults = 10
 
 def LoadTodo():
-	try:
-		var.TodoList = pickle.load(open(var.Path, 'rb'))
-	except:
-		pass
+	var.TodoList = var.Journal.Load()
+	var.Index.Build(var.TodoList)
+	ClearRendered()
 
 def SaveTodo():
-	print "Saving"
-	
-	if var.Changed:
-		var.Changed = False
-		pickle.dump(var.TodoList, open(var.Path, 'wb'))
-		
-	#threading.Timer(60, SaveTodo)
-		
+	var.Journal.Compact()
+	var.Journal.Flush()
+
 
 def PrintTodo(callback, args):
-	message = ""
-	
 	if len(var.TodoList) == 0:
-		message = "Wow! There's nothing to do!"
-	else:
-		message = "TODO:\n"
-		
-		for i in xrange(len(var.TodoList)):
-			message += "{}. {}\n".format(i + 1, var.TodoList[i])
-		
-	Say(message, callback.ChatRoomID)
+		Say("Wow! There's nothing to do!", callback.ChatRoomID)
+		return
+
+	page = 1
+
+	if len(args) > 1:
+		try:
+			page = int(args[1])
+		except ValueError:
+			page = 0
+
+	pages = GetPageCount()
+
+	if page < 1 or page > pages:
+		Say(
+			"Usage: {}todo [page number]. There {}.".format(
+				SteamNerd.CommandChar,
+				"is 1 page" if pages == 1 else "are {} pages".format(pages)
+			),
+			callback.ChatRoomID
+		)
+		return
+
+	for message in RenderPage(page):
+		Say(message, callback.ChatRoomID)
+
+def GetPageCount():
+	return max(1, (len(var.TodoList) + var.PageSize - 1) // var.PageSize)
+
+def RenderPage(page):
+	"""
+		Gets the messages showing a page of the list. Only that page's items
+		are rendered, and the messages are kept until the list changes.
+	"""
+	if page in var.Rendered:
+		return var.Rendered[page]
+
+	start = (page - 1) * var.PageSize
+	pages = GetPageCount()
+	lines = ["TODO:" if pages == 1 else "TODO (page {} of {}):".format(page, pages)]
+	lines.extend(
+		"{}. {}".format(start + i + 1, item)
+		for i, item in enumerate(var.TodoList.Slice(start, start + var.PageSize))
+	)
+
+	var.Rendered[page] = SplitMessage(lines, var.MessageLimit)
+	return var.Rendered[page]
+
+def SplitMessage(lines, limit):
+	"""
+		Joins lines into as few messages as fit under limit characters,
+		breaking up any line that's too long by itself.
+	"""
+	messages = []
+	current = []
+	size = 0
+
+	for line in lines:
+		if current and size + 1 + len(line) > limit:
+			messages.append("\n".join(current))
+			current = []
+			size = 0
+
+		while len(line) > limit:
+			messages.append(line[:limit])
+			line = line[limit:]
+
+		size += len(line) + (1 if current else 0)
+		current.append(line)
+
+	if current:
+		messages.append("\n".join(current))
+
+	return messages
+
+def ClearRendered():
+	var.Rendered.clear()
 
 def AddTodo(callback, args):
 	if len(args) < 3:
@@ -64,12 +140,13 @@ def AddTodo(callback, args):
 	
 	tempList.append(tempItem)
 	
-	if line >= 0:
-		var.TodoList = var.TodoList[:line] + tempList + var.TodoList[line:]
-	else:
-		var.TodoList.extend(tempList)
-		
-	var.Changed = True
+	if line < 0:
+		line = len(var.TodoList)
+
+	var.Journal.Insert(line, tempList)
+	var.Index.Insert(line, tempList)
+
+	ClearRendered()
 
 def RemoveTodo(callback, args):
 	if len(args) < 3:
@@ -82,8 +159,29 @@ def RemoveTodo(callback, args):
 	line = CheckNumber(args[2])
 	
 	if line >= 0:
-		del var.TodoList[line]
-		var.Changed = True
+		var.Journal.Remove(line)
+		var.Index.Remove(line)
+		ClearRendered()
+
+def SearchTodo(callback, args):
+	if len(args) < 3:
+		Say(
+			"Usage: {}todo search [words]".format(SteamNerd.CommandChar),
+			callback.ChatRoomID
+		)
+		return
+
+	found = var.Index.Search(' '.join(args[2:]), var.SearchResults)
+
+	if len(found) == 0:
+		Say("Nothing to do like that.", callback.ChatRoomID)
+		return
+
+	lines = ["Found:"]
+	lines.extend("{}. {}".format(line + 1, var.TodoList[line]) for line, score in found)
+
+	for message in SplitMessage(lines, var.MessageLimit):
+		Say(message, callback.ChatRoomID)
 
 def CheckNumber(arg):
 	line = 0
@@ -99,9 +197,12 @@ def CheckNumber(arg):
 	return line
 
 LoadTodo()
-#threading.Timer(60, SaveTodo)
 	
-Module.AddCommand("todo", "Print the todo list.", PrintTodo)
+Module.AddCommand(
+	"todo",
+	"Print the todo list. Usage: {0}todo or {0}todo [page number]".format(SteamNerd.CommandChar),
+	PrintTodo
+)
 
 Module.AddCommand(
 	("todo", "add"), 
@@ -113,3 +214,8 @@ Module.AddCommand(
 	"Removes a thing to do from the todo list. Usage: {}todo remove [item number]".format(SteamNerd.CommandChar),
 	RemoveTodo
 )
+Module.AddCommand(
+	("todo", "search"),
+	"Finds things to do with any of the words, best matches first. Usage: {}todo search [words]".format(SteamNerd.CommandChar),
+	SearchTodo
+)
@@ -0,0 +1,500 @@
+import os
+import csv
+import json
+import cPickle as pickle
+import safefile
+from threading import Lock
+from loans import Loan, GetLoanType
+
+# sqlite3 isn't available everywhere (stock IronPython doesn't have it), and
+# the store is optional, so the Bank still loads without it.
+try:
+	import sqlite3
+except ImportError:
+	sqlite3 = None
+
+CSVColumns = ['record', 'steamid', 'money', 'amount', 'current', 'interest', 'start', 'fee']
+LoanColumns = ['amount', 'current', 'interest', 'start', 'fee']
+
+def GetKey(steamID):
+	"""
+		Gets the 64-bit number that is used as an account's key.
+	"""
+	if hasattr(steamID, 'ConvertToUInt64'):
+		return long(steamID.ConvertToUInt64())
+
+	return long(steamID)
+
+def LoanToRow(loan):
+	"""
+		Gets the (amount, current, interest, start, fee) row for a Loan.
+	"""
+	return (loan.Amount, loan._currentAmount, loan.Interest, loan.InterestStart, loan.Fee)
+
+def RowToLoan(row):
+	"""
+		Makes a Loan from an (amount, current, interest, start, fee) row.
+	"""
+	amount, current, interest, start, fee = row
+	loan = Loan(GetLoanType(amount, interest, fee))
+	loan._currentAmount = current
+	loan.InterestStart = start
+	return loan
+
+class PickleStore(object):
+	"""
+		Reads and writes the accounts in the Bank's Money.p and Loans.p, the
+		files it uses unless var.UseDatabase is set, so that they can be
+		exported and imported like a SQLiteStore. Every account is held in
+		memory, and Commit() rewrites both files. The Bank shouldn't be
+		running, or it will write over them.
+	"""
+	def __init__(self, moneyPath, loanPath):
+		self.MoneyPath = moneyPath
+		self.LoanPath = loanPath
+		self._money = self._load(moneyPath)
+		self._loans = self._load(loanPath)
+
+		# The files are keyed by SteamIDs, so an imported account replaces
+		# the one with the same key.
+		self._ids = dict((GetKey(steamID), steamID)
+			for steamID in set(self._money) | set(self._loans))
+
+	def _load(self, path):
+		return safefile.Load(path, pickle.load,
+			(EOFError, pickle.UnpicklingError)) or {}
+
+	def IterAccounts(self, after = -1, chunkSize = 1000):
+		"""
+			Yields (steamid, money, loan rows) for every account with a steamid
+			greater than after, in steamid order, like SQLiteStore does.
+		"""
+		for key in sorted(key for key in self._ids if key > after):
+			steamID = self._ids[key]
+			yield key, self._money.get(steamID, 0), \
+				[LoanToRow(loan) for loan in self._loans.get(steamID, [])]
+
+	def PutAccount(self, steamID, money, loans):
+		"""
+			Replaces an account and all of its loans.
+		"""
+		key = GetKey(steamID)
+
+		if not key in self._ids:
+			# The Bank looks accounts up by SteamID.
+			import SteamKit2
+			self._ids[key] = SteamKit2.SteamID(key)
+
+		steamID = self._ids[key]
+		self._money[steamID] = money
+
+		# Chatters without loans aren't in Loans.p.
+		if len(loans) > 0:
+			self._loans[steamID] = [RowToLoan(loan) for loan in loans]
+		else:
+			self._loans.pop(steamID, None)
+
+	def Commit(self):
+		safefile.Replace(self.MoneyPath, lambda file: pickle.dump(self._money, file))
+		safefile.Replace(self.LoanPath, lambda file: pickle.dump(self._loans, file))
+
+	def Close(self):
+		pass
+
+class SQLiteStore(object):
+	"""
+		Stores bank accounts and loans in a SQLite database, so that a change
+		to one account only rewrites that account's rows. Changes aren't saved
+		until Commit() is called.
+	"""
+	def __init__(self, path):
+		if sqlite3 == None:
+			raise ImportError("SQLiteStore needs sqlite3.")
+
+		self.Path = path
+		self._lock = Lock()
+		self._connection = sqlite3.connect(path, check_same_thread = False)
+		self._createTables()
+
+	def _createTables(self):
+		with self._lock:
+			self._connection.executescript("""
+				CREATE TABLE IF NOT EXISTS accounts (
+					steamid INTEGER PRIMARY KEY,
+					money INTEGER NOT NULL
+				);
+				CREATE TABLE IF NOT EXISTS loans (
+					id INTEGER PRIMARY KEY AUTOINCREMENT,
+					steamid INTEGER NOT NULL,
+					amount INTEGER NOT NULL,
+					current INTEGER NOT NULL,
+					interest REAL NOT NULL,
+					start REAL NOT NULL,
+					fee INTEGER NOT NULL
+				);
+				CREATE INDEX IF NOT EXISTS loans_steamid ON loans (steamid);
+				CREATE TABLE IF NOT EXISTS transfers (
+					id INTEGER PRIMARY KEY AUTOINCREMENT,
+					key TEXT NOT NULL UNIQUE
+				);
+			""")
+			self._connection.commit()
+
+	def _execute(self, query, params = ()):
+		with self._lock:
+			return self._connection.execute(query, params)
+
+	def Commit(self):
+		"""
+			Commits every change since the last commit.
+		"""
+		with self._lock:
+			self._connection.commit()
+
+	def IsEmpty(self):
+		with self._lock:
+			return self._connection.execute(
+				"SELECT 1 FROM accounts LIMIT 1").fetchone() is None
+
+	def GetAccount(self, steamID):
+		"""
+			Returns (money, loan rows) for an account, or None if the account
+			doesn't exist. Loan rows are (id, amount, current, interest,
+			start, fee).
+		"""
+		key = GetKey(steamID)
+
+		with self._lock:
+			row = self._connection.execute(
+				"SELECT money FROM accounts WHERE steamid = ?", (key,)
+			).fetchone()
+
+			if row is None:
+				return None
+
+			loans = self._connection.execute(
+				"SELECT id, amount, current, interest, start, fee FROM loans " +
+				"WHERE steamid = ? ORDER BY id", (key,)
+			).fetchall()
+
+		return row[0], loans
+
+	def GetAllMoney(self):
+		"""
+			Returns (steamid, money) for every account.
+		"""
+		with self._lock:
+			return self._connection.execute(
+				"SELECT steamid, money FROM accounts").fetchall()
+
+	def GetAllLoans(self):
+		"""
+			Returns (steamid, current, interest, start) for every loan.
+		"""
+		with self._lock:
+			return self._connection.execute(
+				"SELECT steamid, current, interest, start FROM loans").fetchall()
+
+	def IterAccounts(self, after = -1, chunkSize = 1000):
+		"""
+			Yields (steamid, money, loan rows) for every account with a steamid
+			greater than after, in steamid order. Loan rows are (amount, 
+			current, interest, start, fee). Accounts are read chunkSize at a 
+			time, so this uses the same memory no matter how many accounts
+			there are and never holds the database for long.
+		"""
+		while True:
+			with self._lock:
+				accounts = self._connection.execute(
+					"SELECT steamid, money FROM accounts WHERE steamid > ? " +
+					"ORDER BY steamid LIMIT ?", (after, chunkSize)
+				).fetchall()
+
+				if len(accounts) == 0:
+					return
+
+				rows = self._connection.execute(
+					"SELECT steamid, amount, current, interest, start, fee " +
+					"FROM loans WHERE steamid BETWEEN ? AND ? ORDER BY steamid, id",
+					(accounts[0][0], accounts[-1][0])
+				).fetchall()
+
+			loans = {}
+
+			for row in rows:
+				loans.setdefault(row[0], []).append(row[1:])
+
+			for steamID, money in accounts:
+				yield steamID, money, loans.get(steamID, [])
+
+			after = accounts[-1][0]
+
+	def PutAccount(self, steamID, money, loans):
+		"""
+			Replaces an account and all of its loans.
+		"""
+		key = GetKey(steamID)
+
+		with self._lock:
+			self._connection.execute(
+				"INSERT OR REPLACE INTO accounts (steamid, money) VALUES (?, ?)",
+				(key, money)
+			)
+			self._connection.execute("DELETE FROM loans WHERE steamid = ?", (key,))
+			self._connection.executemany(
+				"INSERT INTO loans (steamid, amount, current, interest, start, fee) " +
+				"VALUES (?, ?, ?, ?, ?, ?)",
+				[(key,) + tuple(loan) for loan in loans]
+			)
+
+	def SetMoney(self, steamID, money):
+		self._execute(
+			"INSERT OR REPLACE INTO accounts (steamid, money) VALUES (?, ?)",
+			(GetKey(steamID), money)
+		)
+
+	def AddLoan(self, steamID, amount, current, interest, start, fee):
+		"""
+			Adds a loan and returns its id.
+		"""
+		return self._execute(
+			"INSERT INTO loans (steamid, amount, current, interest, start, fee) " +
+			"VALUES (?, ?, ?, ?, ?, ?)",
+			(GetKey(steamID), amount, current, interest, start, fee)
+		).lastrowid
+
+	def UpdateLoan(self, loanID, current, start):
+		self._execute(
+			"UPDATE loans SET current = ?, start = ? WHERE id = ?",
+			(current, start, loanID)
+		)
+
+	def RemoveLoan(self, loanID):
+		self._execute("DELETE FROM loans WHERE id = ?", (loanID,))
+
+	def GetTransfers(self):
+		"""
+			Returns the keys of the transfers that have been made, oldest
+			first.
+		"""
+		with self._lock:
+			return [row[0] for row in self._connection.execute(
+				"SELECT key FROM transfers ORDER BY id").fetchall()]
+
+	def AddTransfer(self, key, keep):
+		"""
+			Records that a transfer was made, and forgets all but the newest
+			keep of them.
+		"""
+		with self._lock:
+			added = self._connection.execute(
+				"INSERT OR IGNORE INTO transfers (key) VALUES (?)", (key,)).lastrowid
+			self._connection.execute("DELETE FROM transfers WHERE id <= ?",
+				(added - keep,))
+
+	def ResetAccount(self, steamID, money):
+		key = GetKey(steamID)
+
+		with self._lock:
+			self._connection.execute(
+				"INSERT OR REPLACE INTO accounts (steamid, money) VALUES (?, ?)",
+				(key, money)
+			)
+			self._connection.execute("DELETE FROM loans WHERE steamid = ?", (key,))
+
+	def Migrate(self, moneyPath, loanPath, loanToRow):
+		"""
+			Copies every account from the old pickle files into the database
+			in one transaction. loanToRow turns a pickled loan into an
+			(amount, current, interest, start, fee) tuple. Returns the number
+			of accounts that were migrated.
+		"""
+		if not os.path.exists(moneyPath):
+			return 0
+
+		with open(moneyPath, 'rb') as moneyFile:
+			playerMoney = pickle.load(moneyFile)
+
+		playerLoans = {}
+
+		if os.path.exists(loanPath):
+			with open(loanPath, 'rb') as loanFile:
+				playerLoans = pickle.load(loanFile)
+
+		with self._lock:
+			for steamID, money in playerMoney.iteritems():
+				key = GetKey(steamID)
+				self._connection.execute(
+					"INSERT OR REPLACE INTO accounts (steamid, money) VALUES (?, ?)",
+					(key, money)
+				)
+
+				for loan in playerLoans.get(steamID, []):
+					self._connection.execute(
+						"INSERT INTO loans (steamid, amount, current, interest, start, fee) " +
+						"VALUES (?, ?, ?, ?, ?, ?)",
+						(key,) + tuple(loanToRow(loan))
+					)
+
+			self._connection.commit()
+
+		return len(playerMoney)
+
+	def Close(self):
+		with self._lock:
+			self._connection.close()
+
+def _getFormat(path, format):
+	if format != None:
+		return format
+
+	return 'csv' if path.lower().endswith('.csv') else 'jsonl'
+
+def _progressPath(path):
+	return path + '.progress'
+
+def _readProgress(path):
+	try:
+		with open(_progressPath(path), 'rb') as progressFile:
+			return json.load(progressFile)
+	except (IOError, ValueError):
+		return None
+
+def _writeProgress(path, progress):
+	with open(_progressPath(path), 'wb') as progressFile:
+		json.dump(progress, progressFile)
+
+def _finishProgress(path):
+	if os.path.exists(_progressPath(path)):
+		os.remove(_progressPath(path))
+
+def Export(store, path, format = None, resume = True, chunkSize = 1000):
+	"""
+		Streams every account and its loans from the store, a SQLiteStore or
+		a PickleStore, to a CSV or JSON Lines file, one account at a time. Progress is saved after every
+		chunk, so an interrupted export picks up where it left off when
+		resume is True. Returns the number of accounts written.
+	"""
+	format = _getFormat(path, format)
+	progress = _readProgress(path) if resume else None
+
+	if progress and os.path.exists(path):
+		output = open(path, 'r+b')
+		output.truncate(progress['offset'])
+		output.seek(progress['offset'])
+		after = progress['steamid']
+		count = progress['count']
+	else:
+		output = open(path, 'wb')
+		after = -1
+		count = 0
+
+	with output:
+		writer = csv.writer(output) if format == 'csv' else None
+
+		if writer and count == 0:
+			writer.writerow(CSVColumns)
+
+		for steamID, money, loans in store.IterAccounts(after, chunkSize):
+			if writer:
+				writer.writerow(['account', steamID, money, '', '', '', '', ''])
+
+				# str() only keeps 12 digits of a float, which loses the
+				# fractions of a second of when interest started.
+				for loan in loans:
+					writer.writerow(['loan', steamID, ''] +
+						[repr(value) if isinstance(value, float) else value for value in loan])
+			else:
+				output.write(json.dumps({
+					'steamid': steamID,
+					'money': money,
+					'loans': [dict(zip(LoanColumns, loan)) for loan in loans]
+				}) + '\n')
+
+			count += 1
+
+			if count % chunkSize == 0:
+				output.flush()
+				_writeProgress(path, 
+					{'offset': output.tell(), 'steamid': steamID, 'count': count})
+
+	_finishProgress(path)
+	return count
+
+def _readCSVAccounts(input):
+	"""
+		Yields (steamid, money, loans, offset) for each account in a CSV
+		export, where offset is where the next account starts.
+	"""
+	account = None
+	
+	while True:
+		offset = input.tell()
+		line = input.readline()
+
+		if line == '':
+			break
+
+		row = next(csv.reader([line]))
+
+		if len(row) == 0 or row[0] == 'record':
+			continue
+
+		if row[0] == 'account':
+			if account:
+				yield account + (offset,)
+
+			account = (long(row[1]), int(row[2]), [])
+		elif row[0] == 'loan' and account:
+			account[2].append((int(row[3]), int(row[4]), float(row[5]), 
+				float(row[6]), int(row[7])))
+
+	if account:
+		yield account + (input.tell(),)
+
+def _readJSONAccounts(input):
+	while True:
+		line = input.readline()
+
+		if line == '':
+			break
+
+		if line.strip() == '':
+			continue
+
+		record = json.loads(line)
+		loans = [tuple(loan[column] for column in LoanColumns) 
+			for loan in record['loans']]
+		yield long(record['steamid']), record['money'], loans, input.tell()
+
+def Import(store, path, format = None, resume = True, batchSize = 1000):
+	"""
+		Streams accounts from a CSV or JSON Lines file into the store, a
+		SQLiteStore or a PickleStore, one account at a time, committing every batchSize accounts. Importing an
+		account replaces it, so importing the same file twice is harmless.
+		Progress is saved after every commit, so an interrupted import picks
+		up where it left off when resume is True. Returns the number of
+		accounts read.
+	"""
+	format = _getFormat(path, format)
+	progress = _readProgress(path) if resume else None
+	count = 0
+
+	with open(path, 'rb') as input:
+		if progress:
+			input.seek(progress['offset'])
+			count = progress['count']
+
+		read = _readCSVAccounts if format == 'csv' else _readJSONAccounts
+
+		for steamID, money, loans, offset in read(input):
+			store.PutAccount(steamID, money, loans)
+			count += 1
+
+			if count % batchSize == 0:
+				store.Commit()
+				_writeProgress(path, {'offset': offset, 'count': count})
+
+	store.Commit()
+	_finishProgress(path)
+	return count
@@ -0,0 +1,116 @@
+import deck
+from blackjackhand import GetValue
+
+# NumPy isn't available everywhere (IronPython doesn't have it), so fall back
+# to a bytearray when it's missing.
+try:
+	import numpy
+except ImportError:
+	numpy = None
+
+# The Blackjack value of every card code, aces counted as 11, as a table for
+# bytearray.translate().
+_valueTable = str(bytearray(
+	[GetValue(deck.GetCard(code)) for code in xrange(deck.CardsPerDeck)] +
+	[0] * (256 - deck.CardsPerDeck)))
+
+class BatchShoe(object):
+	"""
+		A shoe for dealing a lot of cards at once, for simulations and
+		analytics. The shoe is a NumPy uint8 array of card codes, and every
+		card's Blackjack value is worked out for the whole shoe when it's
+		shuffled, so GetBlock() hands back slices of both without making a
+		Card for each one. Without NumPy they're bytearrays instead.
+
+		Every shuffle puts the whole shoe back together, so Discard() doesn't
+		need to do anything. It's there, along with GetCards(), so a BatchShoe
+		can stand in for a deck.Deck.
+
+		The same seed deals the same cards. Without NumPy a shuffle comes out
+		the same as deck.ReplayCodes() for the seed. NumPy is slow to seed,
+		so its stream is only seeded once and its shuffles depend on the ones
+		before them.
+	"""
+	def __init__(self, decks = 1, penetration = 0.75, seed = None):
+		self.Decks = decks
+		self.Penetration = penetration
+		self.Seed = deck.NewSeed() if seed == None else seed
+		self.Shuffles = 0
+		self._cards = None
+		self._values = None
+		self._cardIndex = 0
+
+		if numpy:
+			seed = deck.GetShuffleSeed(self.Seed, 0)
+			self._random = numpy.random.RandomState([seed & 0xffffffff, seed >> 32])
+			self._fresh = numpy.tile(numpy.arange(deck.CardsPerDeck, dtype = numpy.uint8),
+				max(1, decks))
+			self._valueTable = numpy.frombuffer(_valueTable, dtype = numpy.uint8)
+
+		self.Shuffle()
+
+	def __len__(self):
+		return len(self._cards)
+
+	def Shuffle(self):
+		self.Shuffles += 1
+		self._cardIndex = 0
+
+		if numpy:
+			self._cards = self._fresh[self._random.permutation(len(self._fresh))]
+			self._values = self._valueTable[self._cards]
+		else:
+			self._cards = deck.ReplayCodes(self.Seed, self.Shuffles, self.Decks)
+			self._values = self._cards.translate(_valueTable)
+
+	def NeedsShuffle(self):
+		return self._cardIndex >= len(self._cards) * self.Penetration
+
+	def Discard(self, cards):
+		pass
+
+	def GetPosition(self):
+		return self.Shuffles, self._cardIndex
+
+	def GetBlock(self, n):
+		"""
+			Deals n cards as (codes, values). If there aren't n cards left the
+			rest of the shoe is burned and the block comes from a new shuffle,
+			so n can't be more than the shoe holds.
+		"""
+		if n > len(self._cards):
+			raise ValueError("The shoe only holds {} cards.".format(len(self._cards)))
+
+		if self._cardIndex + n > len(self._cards):
+			self.Shuffle()
+
+		start = self._cardIndex
+		self._cardIndex += n
+		return self._cards[start:self._cardIndex], self._values[start:self._cardIndex]
+
+	def GetCodes(self, n = 1):
+		"""
+			Deals n card codes, running on into a new shuffle if the shoe runs
+			out, like deck.Deck.GetCodes().
+		"""
+		left = len(self._cards) - self._cardIndex
+
+		if n > left:
+			codes = self.GetBlock(left)[0]
+			self.Shuffle()
+			rest = self.GetCodes(n - left)
+
+			if numpy:
+				return numpy.concatenate((codes, rest))
+
+			return codes + rest
+
+		return self.GetBlock(n)[0]
+
+	def GetCards(self, n = 1):
+		codes = self.GetCodes(n)
+
+		if numpy:
+			codes = codes.tolist()
+
+		return [deck.GetCard(code) for code in codes]
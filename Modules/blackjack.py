@@ -1,595 +1,866 @@
+import os
 import random
+import struct
 import deck
+import SteamKit2
+import blackjacksave
+import blackjackhistory
+import blackjackstrategy
+from bankstore import GetKey
 from enum import Enum
 import countdown
-import time
+import scheduler
+from scheduler import CancelToken
+from blackjackhand import HandStates, Player, Hand, InsurancePayout
 
 # Enums
 BlackjackStates = Enum('BlackjackStates', 'NoGame Waiting Dealing ' + \
 	'PlayerTurn DealerTurn Payout')
 
-HandStates = Enum('HandStates', 'None Stand DoubleDown Surrender ' + \
-	'Blackjack Bust Split AceSplit Charlie')
-
 # Classes
-class Player:
-	def __init__(self, bet):
-		self.Bet = bet
-		self.Hands = []
-		self.HasInsurance = False
-		
-	def __str__(self):
-		if len(self.Hands) == 1:
-			return str(self.Hands[0])
-		elif len(self.Hands) > 1:
-			return ''.join("{}. {}".format(i, hand) for i, hand in enumerate(self.Hands))
-		
-		return ""
-
-	def CheckDone(self):
-		return all(hand.Done for hand in self.Hands)
-
-def GetValue(card):
-	if card.Rank == deck.Ranks.Ace:
-		return 11
-	elif card.Rank in (deck.Ranks.Jack, deck.Ranks.Queen, deck.Ranks.King): 
-		return 10
-	else:
-		return card.Rank.value
-
-class Hand:
-	def __init__(self):
-		self.Cards = []
-		self.State = HandStates.None
-		self.Soft = False
-		self.Done = False
-
-	def __str__(self):
-		return "{} {}"  \
-			.format(' ' \
-				.join([str(card) for card in self.Cards]),
-					  self.StateString())
-
-	def GetPoints(self):
-		points = 0
-		
-		for card in self.Cards:
-			points += GetValue(card)
-			
-		for card in self.Cards:
-			if card.Rank == deck.Ranks.Ace:
-				if points > 21:
-					self.Soft = False
-					points -= 10
-				else:
-					self.Soft = True
-					break
-				
-		return points
-	
-	def Deal(self, cards):
-		self.Cards.extend(cards)
-		self.CheckState()
-			
+class Table(object):
+	"""
+		One game of Blackjack. Every table has its own players, dealer, deck
+		and timers, so a chat can have a few games going at once.
+	"""
+	def __init__(self, number):
+		self.Number = number
+		self.WaitingQueue = {}
+		self.Players = {}
+		self.CanInsure = False
+		self.GameState = BlackjackStates.NoGame
+		self.Skippers = []
+		self.DealerHand = Hand()
+		self.Deck = deck.Deck(var.Decks, var.Penetration)
+		self.RoundStart = (0, 0)
+		self.Round = 0
+		self.Countdown = None
+		self.DealerTimer = None
+		self.Token = CancelToken(var.Token)
+
+	def Say(self, message):
+		# Only say which table it is when there's more than one.
+		if len(var.Tables) > 1:
+			message = "[Table {}] {}".format(self.Number, message)
+
+		Say(message)
+
+	def GetSeats(self):
+		return len(self.Players) + len(self.WaitingQueue)
+
 	def SetState(self, state):
-		self.State = state
-
-		if not state in (HandStates.None, HandStates.Split):
-			self.Done = True
-		
-	def CheckState(self):
-		points = self.GetPoints()
-		
-		if points > 21:
-			self.SetState(HandStates.Bust)
-		elif len(self.Cards) == 2 and points == 21 and \
-			 self.State == HandStates.None:
-			self.SetState(HandStates.Blackjack)
-		elif points == 21:
-			self.SetState(HandStates.Stand)
-		elif len(self.Cards) >= 8:
-			self.SetState(HandStates.Charlie)
-	
-	def StateString(self):
-		if any(card.FaceDown for card in self.Cards):
-			return ""
-		elif self.State == HandStates.Stand:
-			return "Stand"
-		elif self.State == HandStates.DoubleDown:
-			return "Double Down"
-		elif self.State == HandStates.Surrender:
-			return "Surrender"
-		elif self.State == HandStates.Blackjack:
-			return "Blackjack"
-		elif self.State == HandStates.Bust:
-			return "Bust"
-		elif self.State == HandStates.Charlie:
-			return "8-card Charlie"
+		if self.GameState == BlackjackStates.NoGame and state != BlackjackStates.Waiting:
+			return
+
+		self.GameState = state
+
+		# Anything that was waiting on the last state won't run now.
+		self.Token.Cancel()
+		self.Token = CancelToken(var.Token)
+
+		if state == BlackjackStates.NoGame:
+			pass
+		elif state == BlackjackStates.Waiting:
+			self.Waiting()
+		elif state == BlackjackStates.Dealing:
+			self.Dealing()
+		elif state == BlackjackStates.PlayerTurn:
+			pass
+		elif state == BlackjackStates.DealerTurn:
+			self.DealerTurn()
+		elif state == BlackjackStates.Payout:
+			self.Payout()
+
+		self.Checkpoint()
+
+	def Checkpoint(self):
+		"""
+			Saves the table so that its round can be picked back up if the
+			module is reloaded or the bot crashes.
+		"""
+		# The module was reloaded, and the new one has the table now.
+		if var.Token.Cancelled:
+			return
+
+		if self.GameState == BlackjackStates.NoGame:
+			var.Checkpoints.Save((var.Room, self.Number), None)
 		else:
-			return ""
-
-	def Payout(self, bet, dealerHand):
-		points = self.GetPoints()
-		dealerPoints = dealerHand.GetPoints()
-
-		if self.State in (HandStates.Surrender, HandStates.Bust):
-			return -bet
-
-		if dealerHand.State == HandStates.Bust:
-			dealerPoints = 0
-
-		# Dealer wins with more points except on 8-card Charlies
-		if dealerPoints > points and self.State != HandStates.Charlie:
-			return -bet
-
-		if dealerPoints == points:
-			# Lose on un-natural 21 vs natural 21
-			if dealerHand.State == HandStates.Blackjack and self.State != HandStates.Blackjack:
-				return -bet
-			# Win on natural 21 vs un-natural 21
-			elif self.State == HandStates.Blackjack and not dealerHand.State == HandStates.Blackjack:
-				return int(bet * 3./2)
-			# Otherwise, push
-			else:
-				return 0
+			var.Checkpoints.Save((var.Room, self.Number),
+				blackjacksave.Encode(self, self.GameState.value))
+
+	def GetRoundKey(self, what):
+		"""
+			Gets the Bank transfer key for part of the round, so it can't be
+			paid twice if the round is played again after a crash.
+		"""
+		return _getRoundKey(var.Room, self.Number, self.Deck.Seed, self.Round, what)
+
+	def Resume(self, saved):
+		"""
+			Picks a round back up from a blackjacksave.SavedTable.
+		"""
+		self.GameState = BlackjackStates(saved.State)
+		self.CanInsure = saved.CanInsure
+		self.Deck.SetState(saved.Seed, saved.Shuffles, saved.Shoe, saved.CardIndex,
+			saved.Discards)
+		self.RoundStart = saved.RoundStart
+		self.Round = saved.Round
+		self.DealerHand = saved.DealerHand
+
+		for key, player in saved.Players.iteritems():
+			self.Players[SteamKit2.SteamID(key)] = player
+
+		for key, player in saved.WaitingQueue.iteritems():
+			self.WaitingQueue[SteamKit2.SteamID(key)] = player
+
+		for steamID in self.Players.keys() + self.WaitingQueue.keys():
+			var.Seats[steamID] = self
+
+		self.Say("Blackjack is back!")
+
+		if self.GameState == BlackjackStates.Waiting:
+			self._startCountdown(max(10, int(saved.Remaining)))
+		elif self.GameState == BlackjackStates.Dealing:
+			# Deal the round again from the start.
+			for player in self.Players.itervalues():
+				self._discard(player.Hands)
+				del player.Hands[:]
+
+			self._discard([self.DealerHand])
+			self.DealerHand = Hand()
+			self.SetState(BlackjackStates.Dealing)
+		elif self.GameState == BlackjackStates.PlayerTurn:
+			for steamID, player in self.Players.iteritems():
+				self.Say("{} [Bet: {}]:\n{}".format(
+					SteamNerd.GetName(steamID), player.Bet, player))
+
+			self.CheckPlayersDone()
+		elif self.GameState == BlackjackStates.DealerTurn:
+			self._dealerNext()
+		elif self.GameState == BlackjackStates.Payout:
+			# Everyone was paid, but the next round hadn't started.
+			self.SetState(BlackjackStates.Waiting)
+
+		self.Checkpoint()
+
+	def Join(self, chatter, bet):
+		name = SteamNerd.GetName(chatter)
+		var.Seats[chatter] = self
+
+		if not self.GameState in (BlackjackStates.NoGame, BlackjackStates.Waiting):
+			self.WaitingQueue[chatter] = Player(bet)
+			self.Say("{} is in the waiting queue.".format(name))
+		else:
+			self.Players[chatter] = Player(bet)
+			self.Say("{} has joined blackjack!".format(name))
 
-		if self.State == HandStates.DoubleDown:
-			return bet * 2
+			# Bets are taken when the table starts waiting, so anyone who sits
+			# down after that pays now.
+			if self.GameState == BlackjackStates.Waiting:
+				var.Bank.Transfer([(chatter, -bet)])
 
-		if self.State == HandStates.Blackjack:
-			return int(bet * (3./2))
+				# Give them time to change their bet.
+				remaining = self.Countdown.remaining()
 
-		if self.State == HandStates.Charlie:
-			# Lose on charlie vs natural 21
-			if dealerHand.State == HandStates.Blackjack:
-				return 0
-			else:
-				return bet
+				if remaining < var.JoinGrace:
+					self.Countdown.extend(var.JoinGrace - remaining)
+					self.Say("Waiting {} more seconds.".format(var.JoinGrace))
 
-		if self.State == HandStates.Surrender:
-			return -bet / 2
+		if self.GameState == BlackjackStates.NoGame:
+			self.SetState(BlackjackStates.Waiting)
+		else:
+			self.Checkpoint()
+
+	def Waiting(self):
+		for steamID in self.WaitingQueue:
+			player = self.WaitingQueue[steamID]
+			self.Players[steamID] = player
+
+		self.WaitingQueue.clear()
+		self.Round += 1
+
+		# Take everyone's bets in one transaction. This runs on the scheduler
+		# after a payout, so it doesn't wait for the bank.
+		var.Bank.TransferLater(
+			[(steamID, -player.Bet) for steamID, player in self.Players.iteritems()],
+			None, self.GetRoundKey("bets"))
+
+		self._startCountdown(30)
+
+	def _startCountdown(self, seconds):
+		self.Say(("Blackjack is starting in {1} seconds.\n" + \
+		"Join with {0}blackjack [bet amount] or {0}bj [bet amount].\n" + \
+		"Change your bet with 'bet [amount]'.")
+		.format(SteamNerd.CommandChar, seconds))
+
+		self.Countdown = countdown.Countdown(
+			seconds,
+			3,
+			lambda: self.SetState(BlackjackStates.Dealing),
+			self.Say,
+			self.Token
+		)
+		self.Countdown.start()
+
+	def Dealing(self):
+		del self.Skippers[:]
+
+		# Kept with the round so its cards can be dealt again with deck.Replay().
+		self.RoundStart = self.Deck.GetPosition()
+		self._dealerDeal()
+		self._playerDeal()
+
+		done = all(player.CheckDone() for player in self.Players.values())
+
+		if not done:
+			self.SetState(BlackjackStates.PlayerTurn)
+		else:
+			self.SetState(BlackjackStates.DealerTurn)
 
-		return bet
+	def _dealerDeal(self):
+		self.DealerHand.Deal(self.Deck.GetCards(2))
+		self.DealerHand.Hide(1)
+		self.Say("Dealer:\n{}".format(self.DealerHand))
 
-# Code
-Module.Name = "Blackjack"
-Module.Description = "Hey you. Yeah, you. Come and play some Blackjack."
+		if self.DealerHand.Cards[0].Rank == deck.Ranks.Ace:
+			self.Say("Dealer has an Ace! Use 'insure' to buy insurance.")
+			self.CanInsure = True
+		else:
+			self.CanInsure = False
+
+	def _playerDeal(self):
+		for steamID in self.Players:
+			player = self.Players[steamID]
+			name = SteamNerd.GetName(steamID)
+			hand = Hand()
+			hand.Deal(self.Deck.GetCards(2))
+			player.Hands.append(hand)
+			self.Say("{} [Bet: {}]:\n{}".format(name, player.Bet, player))
+
+	def DealerTurn(self):
+		self.DealerHand.Show(1)
+		self._dealerNext()
+
+	def _dealerNext(self):
+		hand = self.DealerHand
+		points = hand.GetPoints()
 
-var.WaitingQueue = {}
-var.Players = {}
-var.CanInsure = False
-var.GameState = BlackjackStates.NoGame
-var.Skippers = []
-var.Usage = "Usage: {0}blackjack [bet amount] or {0}bj [bet amount]".format(SteamNerd.CommandChar)
-var.DealerHand = Hand()
+		if hand.State == HandStates.None and \
+			(points < 17 or (points == 17 and hand.Soft)):
+			self._dealerSchedule(var.DealerDelay, self._dealerHit)
+		else:
+			self._dealerSchedule(var.PayoutDelay, self._dealerDone)
+
+	def _dealerSchedule(self, delay, step):
+		# The token is cancelled when the dealer's turn ends, so steps left
+		# over from an earlier game don't run.
+		self.DealerTimer = scheduler.Schedule(delay, step, self.Token)
+
+	def _dealerHit(self):
+		hand = self.DealerHand
+		self.Say("Dealer:\n{} {}".format(hand, hand.GetPoints()))
+		hand.Deal(self.Deck.GetCards())
+		self.Checkpoint()
+		self._dealerNext()
+
+	def _dealerDone(self):
+		hand = self.DealerHand
+		self.Say("Dealer:\n{} {}".format(hand, hand.GetPoints()))
+		self.SetState(BlackjackStates.Payout)
+
+	def Payout(self):
+		temp = {}
+		payouts = []
+		round = blackjackhistory.Round(self.Number, self.DealerHand)
+		round.Seed = self.Deck.Seed
+		round.Shuffle, round.Position = self.RoundStart
+
+		for steamID in self.Players:
+			player = self.Players[steamID]
+			name = SteamNerd.GetName(steamID)
+			temp[steamID] = Player(player.Bet)
+			message = "{} [Bet: {}]:\n".format(name, player.Bet)
+			total = 0
+			played = blackjackhistory.RoundPlayer(GetKey(steamID), player.Bet)
+
+			for hand in player.Hands:
+				payout = hand.Payout(player.Bet, self.DealerHand)
+				message += "{} [{}]\n".format(hand, payout)
+				total += payout
+				played.Hands.append((hand, payout))
+
+			returned = player.GetStake()
+
+			# Insurance was paid for when it was bought.
+			if player.HasInsurance:
+				insurancePay = InsurancePayout(player.Bet, self.DealerHand)
+				message += "Insurance [{}]\n".format(insurancePay)
+				total += insurancePay
+				returned += player.Bet / 2
+				played.Insured = True
+				played.Insurance = insurancePay
+
+			payouts.append((steamID, returned + total))
+			round.Players.append(played)
+
+			message += ("Total: (${})" if total < 0 else "Total: ${}").format(abs(total))
+			self.Say(message)
+
+		# Settle the whole round in one transaction, without holding up the
+		# scheduler (and every other table) until the bank commits it. The
+		# round's key means a round that's played again after a crash isn't
+		# paid (or recorded) twice.
+		var.Bank.TransferLater(payouts, None, self.GetRoundKey("settle")).Then(
+			lambda transaction: transaction.Result and _record(round))
+
+		for player in self.Players.itervalues():
+			self._discard(player.Hands)
+
+		self._discard([self.DealerHand])
+		self.Players = temp
+		self.DealerHand = Hand()
+
+		if self.Deck.NeedsShuffle():
+			self.Deck.Shuffle()
+			self.Say("Shuffling the shoe.")
+
+		self.SetState(BlackjackStates.Waiting)
+
+	def _discard(self, hands):
+		self.Deck.Discard(card for hand in hands for card in hand.Cards)
+
+	def OnChatMessage(self, callback, args):
+		chatter = callback.ChatterID
+		command = args[0].lower()
+
+		if not chatter in self.Players:
+			return
+
+		player = self.Players[chatter]
+
+		if self.GameState == BlackjackStates.PlayerTurn:
+			if command in ("hit", "twist"):
+				self._hit(callback, args, player)
+			elif command in ("stand", "stay", "stick"):
+				self._stand(callback, args, player)
+			elif command == "surrender":
+				self._surrender(callback, args, player)
+			elif command == "double":
+				self._double(callback, args, player)
+			elif command == "split":
+				self._split(callback, args, player)
+			elif command == "insure":
+				self._insure(chatter, player)
+			elif command == "hint":
+				self._hint(callback, args, player)
+
+			self.CheckPlayersDone()
+		elif self.GameState == BlackjackStates.Waiting:
+			if command == "bet":
+				self._bet(callback, args, player)
+			elif command == "skip":
+				self._skip(chatter)
+
+		self.Checkpoint()
+
+	def CheckPlayersDone(self):
+		if all(player.CheckDone() for player in self.Players.values()):
+			self.SetState(BlackjackStates.DealerTurn)
+
+	def _hit(self, callback, args, player):
+		name = SteamNerd.GetName(callback.ChatterID)
+		handNum = GetHandIndex(args, player)
+
+		if handNum < 0:
+			self.Say("Invalid hand number!")
+			return
 
-def Start():
-	var.Bank = Module.GetModule('Bank')
-	var.Deck = deck.Deck()
-	
-def SetState(state):
-	if var.GameState == BlackjackStates.NoGame and state != BlackjackStates.Waiting:
-		return
+		hand = player.Hands[handNum]
+
+		if not hand.State in (HandStates.None, HandStates.Split):
+			self.Say("Cannot hit on {}.".format(hand.StateString()))
+			return
 
-	var.GameState = state
-	
-	if state == BlackjackStates.NoGame:
-		pass
-	elif state == BlackjackStates.Waiting:
-		Waiting()
-	elif state == BlackjackStates.Dealing:
-		Dealing()
-	elif state == BlackjackStates.PlayerTurn:
-		pass
-	elif state == BlackjackStates.DealerTurn:
-		DealerTurn()
-	elif state == BlackjackStates.Payout:
-		Payout()
+		hand.Deal(self.Deck.GetCards())
+		self.Say("{} [Bet: {}]:\n{}".format(name, player.Bet, str(player)))
 
-def JoinBlackjack(callback, args):
-	chatter = callback.ChatterID 
-	name = SteamNerd.GetName(chatter) 
-	
-	if chatter in var.WaitingQueue or chatter in var.Players:
-		return
-	
-	if len(args) < 2:
-		Say(var.Usage) 
-		return
-	
-	bet = 0 
-	
-	try:
-		bet = int(args[1])
-	except ValueError:
-		Say(var.Usage)
-		return
-	
-	if bet <= 0:
-		Say("You must bet more than $0!")
-		return
-	
-	if var.Bank.GetMoney(chatter) < bet:
-		Say("You don't have ${}!".format(bet))
-		return
-		
-	if not var.GameState in (BlackjackStates.NoGame, BlackjackStates.Waiting):
-		var.WaitingQueue[chatter] = Player(bet)
-		Say("{} is in the waiting queue.".format(name))
-	else:
-		var.Players[chatter] = Player(bet)
-		Say("{} has joined blackjack!".format(name))
-
-	if var.GameState == BlackjackStates.NoGame:
-		SetState(BlackjackStates.Waiting)
-	
-def Waiting():
-	for steamID in var.WaitingQueue:
-		player = var.WaitingQueue[steamID]
-		var.Players[steamID] = player
-		
-	var.WaitingQueue.clear()
-	
-	for steamID in var.Players:
-		player = var.Players[steamID]
-		var.Bank.GiveMoney(steamID, -player.Bet)
-
-	Say(("Blackjack is starting in 30 seconds.\n" + \
-	"Join with {0}blackjack [bet amount] or {0}bj [bet amount].\n" + \
-	"Change your bet with 'bet [amount]'.")
-	.format(SteamNerd.CommandChar))
-	
-	var.Countdown = countdown.Countdown(
-		30, 
-		3, 
-		lambda: SetState(BlackjackStates.Dealing), 
-		Say
-	)
-	var.Countdown.start()
-	
-def Dealing():
-	del var.Skippers[:]
-	_dealerDeal()
-	_playerDeal()
-
-	done = all(player.CheckDone() for player in var.Players.values())
-
-	if not done:
-		SetState(BlackjackStates.PlayerTurn)
-	else:
-		SetState(BlackjackStates.DealerTurn)
-	
-def _dealerDeal():
-	var.DealerHand.Deal(var.Deck.GetCards(2))
-	var.DealerHand.Cards[1].FaceDown = True
-	Say("Dealer:\n{}".format(var.DealerHand))
-
-	if var.DealerHand.Cards[0].Rank == deck.Ranks.Ace:
-		Say("Dealer has an Ace! Use 'insure' to buy insurance.")
-		var.CanInsure = True
-	else:
-		var.CanInsure = False
-	
-def _playerDeal():
-	for steamID in var.Players:
-		player = var.Players[steamID]
-		name = SteamNerd.GetName(steamID)
-		hand = Hand()
-		hand.Deal(var.Deck.GetCards(2))
-		player.Hands.append(hand)
-		Say("{} [Bet: {}]:\n{}".format(name, player.Bet, player))
-
-def DealerTurn():
-	hand = var.DealerHand
-	hand.Cards[1].FaceDown = False
-	points = hand.GetPoints()
-
-	while points < 17 or (points == 17 and hand.Soft):
-		time.sleep(2)
-		Say("Dealer:\n{} {}".format(hand, points))
-		hand.Deal(var.Deck.GetCards())
-		points = hand.GetPoints()
+	def _stand(self, callback, args, player):
+		name = SteamNerd.GetName(callback.ChatterID)
+		handNum = GetHandIndex(args, player)
 
-		if hand.State != HandStates.None:
-			break
+		if handNum < 0:
+			self.Say("Invalid hand number!")
+			return
 
-	time.sleep(5)		
-	Say("Dealer:\n{} {}".format(hand, points))
-	SetState(BlackjackStates.Payout)
+		hand = player.Hands[handNum]
 
-def Payout():
-	temp = {}
+		if not hand.State in (HandStates.None, HandStates.Split):
+			self.Say("Cannot stand on {}.".format(hand.StateString()))
+			return
 
-	for steamID in var.Players:
-		player = var.Players[steamID]
-		name = SteamNerd.GetName(steamID)
-		temp[steamID] = Player(player.Bet)
-		message = "{} [Bet: {}]:\n".format(name, player.Bet)
-		total = 0
+		hand.SetState(HandStates.Stand)
+		self.Say("{} [Bet: {}]:\n{}".format(name, player.Bet, str(player)))
 
-		for hand in player.Hands:
-			payout = hand.Payout(player.Bet, var.DealerHand)
-			message += "{} [{}]\n".format(hand, payout)
-			total += payout
+	def _surrender(self, callback, args, player):
+		name = SteamNerd.GetName(callback.ChatterID)
+		handNum = GetHandIndex(args, player)
 
-		if var.CanInsure:
-			insurancePay = 0
+		if handNum < 0:
+			self.Say("Invalid hand number!")
+			return
 
-			if var.DealerHand.State == HandStates.Blackjack:
-				insurancePay = (player.Bet / 2) * 2
-			else:
-				insurancePay = -player.Bet / 2
+		hand = player.Hands[handNum]
 
-			message += "Insurance [{}]".format(insurancePay)
+		if not hand.State in (HandStates.None, HandStates.Split):
+			self.Say("Cannot surrender on {}.".format(hand.StateString()))
+			return
 
-		var.Bank.GiveMoney(steamID, player.Bet + total)
+		hand.SetState(HandStates.Surrender)
+		self.Say("{} [Bet: {}]:\n{}".format(name, player.Bet, str(player)))
 
-		message += ("Total: (${})" if total < 0 else "Total: ${}").format(abs(total))
-		Say(message)
+	def _double(self, callback, args, player):
+		name = SteamNerd.GetName(callback.ChatterID)
+		handNum = GetHandIndex(args, player)
 
+		if handNum < 0:
+			self.Say("Invalid hand number!")
+			return
 
-	var.Players = temp
-	var.DealerHand = Hand()
-	SetState(BlackjackStates.Waiting)
+		hand = player.Hands[handNum]
 
-def OnChatLeave(callback):
-	_quit(callback.StateChangeInfo.ChatterActedOn)
+		if not hand.State in (HandStates.None, HandStates.Split):
+			self.Say("Cannot double down on {}.".format(hand.StateString()))
+			return
 
-def OnChatMessage(callback, args):
-	chatter = callback.ChatterID
-	command = args[0].lower()
+		if len(hand.Cards) > 2:
+			self.Say("Cannot double down after hitting!")
+			return
 
-	if command == "quit":
-		_quit(chatter)
-		return
+		if not var.Bank.Transfer([(callback.ChatterID, -player.Bet)], 0):
+			self.Say("You don't have enough money to double down!")
+			return
 
-	if not chatter in var.Players:
-		return
+		hand.Double(self.Deck.GetCards())
+		self.Say("{} [Bet: {}]:\n{}".format(name, player.Bet, str(player)))
 
-	player = var.Players[chatter]
-
-	if var.GameState == BlackjackStates.PlayerTurn:
-		if command in ("hit", "twist"):
-			_hit(callback, args, player)
-		elif command in ("stand", "stay", "stick"):
-			_stand(callback, args, player)
-		elif command == "surrender":
-			_surrender(callback, args, player)
-		elif command == "double":
-			_double(callback, args, player)
-		elif command == "split":
-			_split(callback, args, player)
-		elif command == "insure":
-			_insure(chatter, player)
-
-		CheckPlayersDone()
-	elif var.GameState == BlackjackStates.Waiting:
-		if command == "bet":
-			_bet(callback, args, player)
-		elif command == "skip":
-			_skip(chatter)
-
-def CheckPlayersDone():
-	if all(player.CheckDone() for player in var.Players.values()):
-		SetState(BlackjackStates.DealerTurn)
-
-def _hit(callback, args, player):
-	name = SteamNerd.GetName(callback.ChatterID)
-	handNum = GetHandIndex(args, player)
-
-	if handNum < 0:
-		Say("Invalid hand number!")
-		return
+	def _split(self, callback, args, player):
+		name = SteamNerd.GetName(callback.ChatterID)
+		handNum = GetHandIndex(args, player)
 
-	hand = player.Hands[handNum]
+		if handNum < 0:
+			self.Say("Invalid hand number!")
+			return
 
-	if not hand.State in (HandStates.None, HandStates.Split):
-		Say("Cannot hit on {}.".format(hand.StateString()))
-		return
+		hand = player.Hands[handNum]
 
-	hand.Deal(var.Deck.GetCards())
-	Say("{} [Bet: {}]:\n{}".format(name, player.Bet, str(player)))
+		if hand.Cards[0].Rank != hand.Cards[1].Rank:
+			self.Say("Cannot split on unequal cards!")
+			return
 
-def _stand(callback, args, player):
-	name = SteamNerd.GetName(callback.ChatterID)
-	handNum = GetHandIndex(args, player)
+		if len(hand.Cards) > 2:
+			self.Say("Cannot split after hitting!")
+			return
 
-	if handNum < 0:
-		Say("Invalid hand number!")
-		return
+		if any(plHand.State == HandStates.AceSplit for plHand in player.Hands):
+			self.Say("Cannot split on aces twice!")
+			return
 
-	hand = player.Hands[handNum]
+		# The new hand has its own bet.
+		if not var.Bank.Transfer([(callback.ChatterID, -player.Bet)], 0):
+			self.Say("You don't have enough money to split!")
+			return
 
-	if not hand.State in (HandStates.None, HandStates.Split):
-		Say("Cannot stand on {}.".format(hand.StateString()))
-		return
+		card = hand.Pop()
+		newHand = Hand()
+		newHand.Deal([card])
 
-	hand.SetState(HandStates.Stand)
-	Say("{} [Bet: {}]:\n{}".format(name, player.Bet, str(player)))
+		if card.Rank == deck.Ranks.Ace:
+			newHand.State = HandStates.AceSplit
+			hand.State = HandStates.AceSplit
+		else:
+			newHand.State = HandStates.Split
+			hand.State = HandStates.Split
 
-def _surrender(callback, args, player):
-	name = SteamNerd.GetName(callback.ChatterID)
-	handNum = GetHandIndex(args, player)
+		hand.Deal(self.Deck.GetCards())
+		newHand.Deal(self.Deck.GetCards())
+		player.Hands.append(newHand)
+		self.Say("{} [Bet: {}]:\n{}".format(name, player.Bet, str(player)))
 
-	if handNum < 0:
-		Say("Invalid hand number!")
-		return
+	def _hint(self, callback, args, player):
+		name = SteamNerd.GetName(callback.ChatterID)
+		handNum = GetHandIndex(args, player)
 
-	hand = player.Hands[handNum]
+		if handNum < 0:
+			self.Say("Invalid hand number!")
+			return
 
-	if not hand.State in (HandStates.None, HandStates.Split):
-		Say("Cannot surrender on {}.".format(hand.StateString()))
-		return
+		hand = player.Hands[handNum]
 
-	hand.SetState(HandStates.Surrender)
-	Say("{} [Bet: {}]:\n{}".format(name, player.Bet, str(player)))
+		if not hand.State in (HandStates.None, HandStates.Split):
+			self.Say("Nothing to do on {}.".format(hand.StateString()))
+			return
 
-def _double(callback, args, player):
-	name = SteamNerd.GetName(callback.ChatterID)
-	handNum = GetHandIndex(args, player)
+		action, evs = var.Strategy.GetHint(hand, self.DealerHand.Cards[0])
 
-	if handNum < 0:
-		Say("Invalid hand number!")
-		return
+		if action == None:
+			return
 
-	hand = player.Hands[handNum]
+		others = ", ".join("{} {:+.2f}".format(other, evs[other])
+			for other in sorted(evs, key = evs.get, reverse = True) if other != action)
+		self.Say("{}: {} ({:+.2f} bets). {}".format(
+			name, action.capitalize(), evs[action], others))
 
-	if not hand.State in (HandStates.None, HandStates.Split):
-		Say("Cannot double down on {}.".format(hand.StateString()))
-		return
+	def _insure(self, steamID, player):
+		if not self.CanInsure:
+			return
 
-	if len(hand.Cards) > 2:
-		Say("Cannot double down after hitting!")
-		return
+		insurance = player.Bet / 2
 
-	hand.Deal(var.Deck.GetCards())
-	hand.SetState(HandStates.DoubleDown)
-	Say("{} [Bet: {}]:\n{}".format(name, player.Bet, str(player)))
+		if not var.Bank.Transfer([(steamID, -insurance)], 0):
+			self.Say("You don't have enough money to insure!")
+			return
 
-def _split(callback, args, player):
-	name = SteamNerd.GetName(callback.ChatterID)
-	handNum = GetHandIndex(args, player)
+		player.HasInsurance = True
 
-	if handNum < 0:
-		Say("Invalid hand number!")
-		return
+	def _bet(self, callback, args, player):
+		chatter = callback.ChatterID
+		name = SteamNerd.GetName(chatter)
 
-	hand = player.Hands[handNum]
+		if len(args) < 2:
+			self.Say("Usage: bet [amount]")
 
-	if hand.Cards[0].Rank != hand.Cards[1].Rank:
-		Say("Cannot split on unequal cards!")
-		return
+		bet = 0
 
-	if len(hand.Cards) > 2:
-		Say("Cannot split after hitting!")
-		return
+		try:
+			bet = int(args[1])
+		except ValueError:
+			self.Say("That's not a number!")
+			return
 
-	if any(plHand.State == HandStates.AceSplit for plHand in player.Hands):
-		Say("Cannot split on aces twice!")
+		if bet <= 0:
+			self.Say("You must bet more than $0!")
+			return
 
-	card = hand.Cards.pop()
-	newHand = Hand()
-	newHand.Deal(card)
+		if bet > var.Bank.GetMoney(chatter):
+			self.Say("You don't have ${}!".format(bet))
+			return
 
-	if card.Rank == deck.Ranks.Ace:
-		newHand.State = HandStates.AceSplit
-		hand.State = HandStates.AceSplit
-	else:
-		newHand.State = HandStates.Split
-		hand.State = HandStates.Split
+		var.Bank.Transfer([(chatter, player.Bet - bet)])
+		player.Bet = bet
 
-	hand.Deal(var.Deck.GetCards())
-	newHand.Deal(var.Deck.GetCards())
-	player.Hands.append(newHand)
-	Say("{} [Bet: {}]:\n{}".format(name, player.Bet, str(player)))
+		self.Say("{} changed their bet to ${}!".format(name, bet))
 
-def GetHandIndex(args, player):
-	if len(args) > 1:
-		try:
-			return int(args[1]) - 1
-		except ValueError:
-			return 0
+	def _skip(self, player):
+		name = SteamNerd.GetName(player)
 
-		if handNum < 0 or handNum >= len(player.Hands):
-			return -1
+		if player in self.Skippers:
+			return
 
-	return 0
+		self.Skippers.append(player)
 
-def _insure(steamID, player):
-	if not CanInsure:
-		return
+		if len(self.Skippers) != len(self.Players):
+			self.Say("{} voted to skip. ({}/{})".format(
+				name, len(self.Skippers), len(self.Players)))
+		else:
+			self.Say("Starting the game!")
+			self.Countdown.fire()
+
+	def Quit(self, steamID):
+		if steamID in self.WaitingQueue:
+			del self.WaitingQueue[steamID]
+			del var.Seats[steamID]
+
+			self.Say("{} is quitting the game!".format(SteamNerd.GetName(steamID)))
+		elif steamID in self.Players:
+			player = self.Players[steamID]
 
-	insurance = player.Bet / 2
+			if self.GameState == BlackjackStates.Waiting:
+				var.Bank.GiveMoney(steamID, player.Bet)
 
-	if var.Bank.GetMoney(steamID) < insurance:
-		Say("You don't have enough money to insure!")
+			self._discard(player.Hands)
+			del self.Players[steamID]
+			del var.Seats[steamID]
+
+			self.Say("{} is quitting the game!".format(SteamNerd.GetName(steamID)))
+
+			if len(self.Players) > 0 and self.GameState == BlackjackStates.PlayerTurn:
+				self.CheckPlayersDone()
+
+			self.CheckEnd()
+
+		self.Checkpoint()
+
+	def CheckEnd(self):
+		if len(self.Players) == 0:
+			if self.Countdown:
+				self.Countdown.stop()
+
+			if self.DealerTimer:
+				self.DealerTimer.Cancel()
+
+			self._discard([self.DealerHand])
+			self.DealerHand = Hand()
+			self.SetState(BlackjackStates.NoGame)
+			self.Say("Blackjack... is OVER!")
+
+			# Anyone still waiting for this table gets their own game.
+			waiting = self.WaitingQueue.items()
+			self.WaitingQueue.clear()
+
+			if waiting:
+				for steamID, player in waiting:
+					self.Join(steamID, player.Bet)
+			else:
+				var.Tables.remove(self)
+
+# Code
+Module.Name = "Blackjack"
+Module.Description = "Hey you. Yeah, you. Come and play some Blackjack."
+
+var.Usage = "Usage: {0}blackjack [bet amount] or {0}bj [bet amount]".format(SteamNerd.CommandChar)
+
+# Each table seats TableSize players, and new tables are opened for people
+# who would otherwise have to wait for a round to finish.
+var.Tables = []
+var.Seats = {}
+var.TableSize = 6
+var.MaxTables = 4
+
+# The hint command's strategy tables are worked out once and kept here.
+var.StrategyFile = "Blackjack.strategy"
+var.StrategyPath = os.path.join(os.getenv('APPDATA'), "SteamNerd", var.StrategyFile)
+var.Strategy = None
+
+# Rounds are checkpointed here on every change, and picked back up in Start()
+# unless ResumeRounds is off, in which case everyone's bets are refunded.
+var.CheckpointFile = "Blackjack.checkpoint"
+var.CheckpointPath = os.path.join(os.getenv('APPDATA'), "SteamNerd", var.CheckpointFile)
+var.Checkpoints = blackjacksave.GetCheckpointer(var.CheckpointPath)
+var.ResumeRounds = True
+
+# Every table's calls are scheduled with a token made from Token, which is
+# cancelled when the module is reloaded so the old tables stop playing.
+var.Token = CancelToken()
+var.Room = None
+
+# Every round is added to the history, and everyone's stats are kept up to date
+# as they are. Every chatroom shares them.
+var.HistoryFile = "Blackjack.history"
+var.HistoryPath = os.path.join(os.getenv('APPDATA'), "SteamNerd", var.HistoryFile)
+var.StatsFile = "BlackjackStats.log"
+var.StatsPath = os.path.join(os.getenv('APPDATA'), "SteamNerd", var.StatsFile)
+var.History = blackjackhistory.GetHistory(var.HistoryPath, var.StatsPath)
+
+# Every table deals from a shoe of Decks decks, which is shuffled between
+# rounds once Penetration of it has been dealt.
+var.Decks = 6
+var.Penetration = 0.75
+
+# The dealer's turn is played out on timers so it doesn't block chat.
+var.DealerDelay = 2
+var.PayoutDelay = 5
+
+# Anyone who joins with less than JoinGrace seconds to go holds the round for
+# JoinGrace seconds.
+var.JoinGrace = 10
+
+def Start():
+	var.Bank = Module.GetModule('Bank')
+	var.Room = GetKey(Module.Chatroom)
+	var.Strategy = blackjackstrategy.Load(var.StrategyPath)
+	var.History.Load()
+	scheduler.TakeOver(("Blackjack", var.Room), var.Token)
+	_resume()
+
+def _resume():
+	for number, saved in _getSaved(var.Room):
+		if var.ResumeRounds:
+			table = Table(saved.Number)
+			var.Tables.append(table)
+			table.Resume(saved)
+		else:
+			_refund(saved)
+			var.Checkpoints.Save((var.Room, number), None)
+
+def _getSaved(room):
+	"""
+		Gets (table number, blackjacksave.SavedTable) for each of a room's
+		checkpoints.
+	"""
+	saved = []
+
+	for number, record in var.Checkpoints.GetRecords(room).iteritems():
+		try:
+			saved.append((number, blackjacksave.Decode(record)))
+		except (struct.error, IndexError, ValueError):
+			# There's nothing to pick up from a checkpoint that can't be read.
+			var.Checkpoints.Save((room, number), None)
+
+	return saved
+
+def _getRoundKey(room, number, seed, round, what):
+	return "blackjack:{}:{}:{}:{}:{}".format(room, number, seed, round, what)
+
+def _record(round):
+	try:
+		var.History.Append(round)
+	except IOError:
+		pass
+
+def _refund(saved):
+	# Bets are taken when a table starts waiting and paid back in Payout.
+	if not BlackjackStates(saved.State) in (BlackjackStates.Waiting,
+		BlackjackStates.Dealing, BlackjackStates.PlayerTurn,
+		BlackjackStates.DealerTurn):
 		return
 
-	var.Bank.GiveMoney(steamID, -insurance)
-	player.HasInsurance = True
+	# A round that was paid out before the crash isn't refunded too.
+	var.Bank.Transfer([
+		(SteamKit2.SteamID(key),
+			player.GetStake() + (player.Bet / 2 if player.HasInsurance else 0))
+		for key, player in saved.Players.iteritems()
+	], None, _getRoundKey(var.Room, saved.Number, saved.Seed, saved.Round, "settle"))
 
-def _bet(callback, args, player):
+def JoinBlackjack(callback, args):
 	chatter = callback.ChatterID
-	name = SteamNerd.GetName(chatter)
+
+	if chatter in var.Seats:
+		return
 
 	if len(args) < 2:
-		Say("Usage: bet [amount]")
+		Say(var.Usage)
+		return
 
 	bet = 0
 
 	try:
 		bet = int(args[1])
 	except ValueError:
-		Say("That's not a number!")
+		Say(var.Usage)
 		return
 
 	if bet <= 0:
 		Say("You must bet more than $0!")
 		return
 
-	if bet > var.Bank.GetMoney(chatter):
+	if var.Bank.GetMoney(chatter) < bet:
 		Say("You don't have ${}!".format(bet))
 		return
 
-	var.Bank.GiveMoney(chatter, player.Bet)
-	var.Bank.GiveMoney(chatter, -bet)
-	player.Bet = bet
+	table = _findTable()
 
-	Say("{} changed their bet to ${}!".format(name, bet))
+	if table == None:
+		Say("Every table is full!")
+		return
 
-def _skip(player):
-	name = SteamNerd.GetName(player)
+	table.Join(chatter, bet)
 
-	if player in var.Skippers:
+def _findTable():
+	"""
+		Gets a table to seat someone at: one that hasn't started its round,
+		else a new table, else the emptiest table's waiting queue.
+	"""
+	free = [table for table in var.Tables if table.GetSeats() < var.TableSize]
+
+	for table in free:
+		if table.GameState in (BlackjackStates.NoGame, BlackjackStates.Waiting):
+			return table
+
+	if len(var.Tables) < var.MaxTables:
+		numbers = set(table.Number for table in var.Tables)
+		number = next(i for i in xrange(1, len(var.Tables) + 2) if not i in numbers)
+		table = Table(number)
+		var.Tables.append(table)
+		return table
+
+	if free:
+		return min(free, key = lambda table: table.GetSeats())
+
+	return None
+
+def ShowStats(callback, args):
+	chatter = callback.ChatterID
+
+	if len(args) > 1:
+		matches = var.Bank.GetNames().Find(' '.join(args[1:]))
+
+		if len(matches) == 0:
+			Say("{} not found!".format(' '.join(args[1:])))
+			return
+
+		if len(matches) > 1:
+			Say("{} could be {}. Who did you mean?".format(
+				' '.join(args[1:]),
+				', '.join(sorted(SteamNerd.GetName(match) for match in matches))
+			))
+			return
+
+		chatter = matches[0]
+
+	name = SteamNerd.GetName(chatter)
+	stats = var.History.GetStats(GetKey(chatter))
+
+	if stats == None:
+		Say("{} hasn't played any blackjack.".format(name))
 		return
 
-	var.Skippers.append(player)
+	Say(("{}: {} rounds, {} hands. Won {:.0%} ({}-{}-{}). " + \
+		"{} blackjacks. Net {}. Biggest win ${}.").format(
+		name, stats.Rounds, stats.Hands, stats.GetWinRate(),
+		stats.Wins, stats.Losses, stats.Pushes, stats.Blackjacks,
+		("(${})" if stats.Net < 0 else "${}").format(abs(stats.Net)),
+		stats.BiggestWin))
+
+def GetHandIndex(args, player):
+	if len(args) > 1:
+		try:
+			return int(args[1]) - 1
+		except ValueError:
+			return 0
 
-	if len(var.Skippers) != len(var.Players):
-		Say("{} voted to skip. ({}/{})", name, len(var.Skippers), len(var.Players))
-	else:
-		Say("Starting the game!")
-		var.Countdown.stop()
-		SetState(BlackjackStates.Dealing)
+		if handNum < 0 or handNum >= len(player.Hands):
+			return -1
 
-def _quit(steamID):
-	if steamID in var.WaitingQueue:
-		del var.WaitingQueue[steamID]
+	return 0
 
-		Say("{} is quitting the game!".format(SteamNerd.GetName(steamID)))
-	elif steamID in var.Players:
-		player = var.Players[steamID]
+def OnChatLeave(callback):
+	_quit(callback.StateChangeInfo.ChatterActedOn)
 
-		if var.GameState == BlackjackStates.Waiting:
-			var.Bank.GiveMoney(steamID, player.Bet)
+def OnChatMessage(callback, args):
+	chatter = callback.ChatterID
+	command = args[0].lower()
 
-		del var.Players[steamID]
+	if command == "quit":
+		_quit(chatter)
+		return
 
-		Say("{} is quitting the game!".format(SteamNerd.GetName(steamID)))
-		
-		if len(var.Players) > 0:
-			CheckPlayersDone()
+	# Send the message to the table the chatter is sitting at.
+	table = var.Seats.get(chatter)
 
-		CheckEnd()
+	if table:
+		table.OnChatMessage(callback, args)
 
-def CheckEnd():
-	if len(var.Players) == 0:
-		if var.Countdown:
-			var.Countdown.stop()
+def _quit(steamID):
+	table = var.Seats.get(steamID)
 
-		var.DealerHand = Hand()
-		SetState(BlackjackStates.NoGame)
-		Say("Blackjack... is OVER!")
+	if table:
+		table.Quit(steamID)
 
 
 Module.AddCommand(
-	"blackjack", 
-	"Play blackjack. " + var.Usage, 
+	"blackjack",
+	"Play blackjack. " + var.Usage,
 	JoinBlackjack
 )
 
 Module.AddCommand(
-	"bj", 
-	"", 
+	"bj",
+	"",
 	JoinBlackjack
-) 
+)
+
+Module.AddCommand(
+	"bjstats",
+	"Shows a chatter's blackjack stats. Usage: {}bjstats [chatter]".format(SteamNerd.CommandChar),
+	ShowStats
+)
@@ -0,0 +1,220 @@
+import deck
+from enum import Enum
+
+# Enums
+HandStates = Enum('HandStates', 'None Stand DoubleDown Surrender ' + \
+	'Blackjack Bust Split AceSplit Charlie')
+
+# Classes
+class Player:
+	def __init__(self, bet):
+		self.Bet = bet
+		self.Hands = []
+		self.HasInsurance = False
+		
+	def __str__(self):
+		if len(self.Hands) == 1:
+			return str(self.Hands[0])
+		elif len(self.Hands) > 1:
+			return ''.join(['%d. %s' % (i, hand) for i, hand in enumerate(self.Hands)])
+		
+		return ""
+
+	def CheckDone(self):
+		return all(hand.Done for hand in self.Hands)
+
+	def GetStake(self):
+		"""
+			Gets how much the player has bet on their hands, counting splits
+			and doubles.
+		"""
+		if not self.Hands:
+			return self.Bet
+
+		return sum(hand.GetStake(self.Bet) for hand in self.Hands)
+
+def InsurancePayout(bet, dealerHand):
+	if dealerHand.State == HandStates.Blackjack:
+		return (bet / 2) * 2
+	else:
+		return -bet / 2
+
+def _rankValue(rank):
+	if rank == deck.Ranks.Ace:
+		return 11
+	elif rank in (deck.Ranks.Jack, deck.Ranks.Queen, deck.Ranks.King): 
+		return 10
+	else:
+		return rank.value
+
+# Cards are scored a lot, so look their values up instead of comparing enums.
+_values = dict((rank, _rankValue(rank)) for rank in deck.Ranks)
+
+def GetValue(card):
+	return _values[card.Rank]
+
+_stateStrings = {
+	HandStates.Stand: "Stand",
+	HandStates.DoubleDown: "Double Down",
+	HandStates.Surrender: "Surrender",
+	HandStates.Blackjack: "Blackjack",
+	HandStates.Bust: "Bust",
+	HandStates.Charlie: "8-card Charlie",
+}
+
+class Hand:
+	"""
+		The hard total (every ace counted as 1) and the number of aces are
+		kept up to date as cards are dealt and popped, so the points don't
+		have to be added up again every time they're needed. Change the cards
+		with Deal() and Pop() so they stay right.
+
+		FaceDown holds the positions of the cards that are face down. The
+		cards' text is joined once and kept until the cards change.
+	"""
+	def __init__(self):
+		self.Cards = []
+		self.FaceDown = set()
+		self.State = HandStates.None
+		self.Soft = False
+		self.Done = False
+		self.Doubled = False
+		self._hard = 0
+		self._aces = 0
+		self._points = 0
+		self._text = None
+
+	def __str__(self):
+		if self._text == None:
+			self._text = ' '.join([deck.FaceDownText if i in self.FaceDown else card.Text
+				for i, card in enumerate(self.Cards)])
+
+		return self._text + ' ' + self.StateString()
+
+	def Hide(self, index):
+		self.FaceDown.add(index)
+		self._text = None
+
+	def Show(self, index):
+		self.FaceDown.discard(index)
+		self._text = None
+
+	def GetPoints(self):
+		return self._points
+
+	def _score(self):
+		# At most one ace can count as 11 without going over 21.
+		self.Soft = self._aces > 0 and self._hard + 10 <= 21
+		self._points = self._hard + 10 if self.Soft else self._hard
+
+	def _count(self, card, sign):
+		value = _values[card.Rank]
+
+		if value == 11:
+			self._aces += sign
+			value = 1
+
+		self._hard += sign * value
+	
+	def Deal(self, cards):
+		for card in cards:
+			self.Cards.append(card)
+			self._count(card, 1)
+
+		self._text = None
+		self._score()
+		self.CheckState()
+
+	def Pop(self):
+		"""
+			Takes the last card off of the hand, for splits.
+		"""
+		card = self.Cards.pop()
+		self.FaceDown.discard(len(self.Cards))
+		self._text = None
+		self._count(card, -1)
+		self._score()
+		return card
+			
+	def Double(self, cards):
+		"""
+			Doubles the bet on the hand and deals it its last card.
+		"""
+		self.Doubled = True
+		self.Deal(cards)
+
+		if self.State != HandStates.Bust:
+			self.SetState(HandStates.DoubleDown)
+
+	def GetStake(self, bet):
+		return bet * 2 if self.Doubled else bet
+			
+	def SetState(self, state):
+		self.State = state
+
+		if not state in (HandStates.None, HandStates.Split):
+			self.Done = True
+		
+	def CheckState(self):
+		points = self.GetPoints()
+		
+		if points > 21:
+			self.SetState(HandStates.Bust)
+		elif len(self.Cards) == 2 and points == 21 and \
+			 self.State == HandStates.None:
+			self.SetState(HandStates.Blackjack)
+		elif points == 21:
+			self.SetState(HandStates.Stand)
+		elif len(self.Cards) >= 8:
+			self.SetState(HandStates.Charlie)
+	
+	def StateString(self):
+		if self.FaceDown:
+			return ""
+
+		return _stateStrings.get(self.State, "")
+
+	def Payout(self, bet, dealerHand):
+		"""
+			Gets what the hand wins or loses against the dealer's hand when bet
+			is the player's bet. A doubled hand wins or loses twice that.
+		"""
+		points = self.GetPoints()
+		dealerPoints = dealerHand.GetPoints()
+		bet = self.GetStake(bet)
+
+		if self.State in (HandStates.Surrender, HandStates.Bust):
+			return -bet
+
+		if dealerHand.State == HandStates.Bust:
+			dealerPoints = 0
+
+		# Dealer wins with more points except on 8-card Charlies
+		if dealerPoints > points and self.State != HandStates.Charlie:
+			return -bet
+
+		if dealerPoints == points:
+			# Lose on un-natural 21 vs natural 21
+			if dealerHand.State == HandStates.Blackjack and self.State != HandStates.Blackjack:
+				return -bet
+			# Win on natural 21 vs un-natural 21
+			elif self.State == HandStates.Blackjack and not dealerHand.State == HandStates.Blackjack:
+				return int(bet * 3./2)
+			# Otherwise, push
+			else:
+				return 0
+
+		if self.State == HandStates.Blackjack:
+			return int(bet * (3./2))
+
+		if self.State == HandStates.Charlie:
+			# Lose on charlie vs natural 21
+			if dealerHand.State == HandStates.Blackjack:
+				return 0
+			else:
+				return bet
+
+		if self.State == HandStates.Surrender:
+			return -bet / 2
+
+		return bet
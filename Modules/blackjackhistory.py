@@ -0,0 +1,321 @@
+import os
+import time
+import struct
+import safefile
+from threading import Lock
+from blackjackhand import HandStates
+from blackjacksave import EncodeHand, DecodeHand
+
+# Every round is a length followed by its record, so a reader can step
+# through the file one round at a time.
+_length = struct.Struct('<I')
+_roundHeader = struct.Struct('<dBH')
+_playerHeader = struct.Struct('<QIBiB')
+_payout = struct.Struct('<i')
+
+# Where the round's cards came from: the deck's seed, the shuffle and how far
+# into it the round started. Rounds written before this was kept don't have it.
+_deal = struct.Struct('<QIH')
+
+# The stats file is a log of how far into the history it goes, followed by
+# the new stats of each player in the rounds up to there.
+_statsHeader = struct.Struct('<QI')
+_playerStats = struct.Struct('<QIIIIIIqq')
+
+class RoundPlayer(object):
+	"""
+		One player's part of a round. Hands is a list of (Hand, payout).
+	"""
+	def __init__(self, steamID, bet, insured = False, insurance = 0):
+		self.SteamID = steamID
+		self.Bet = bet
+		self.Insured = insured
+		self.Insurance = insurance
+		self.Hands = []
+
+	def GetNet(self):
+		return sum(payout for hand, payout in self.Hands) + self.Insurance
+
+class Round(object):
+	"""
+		A settled round. Players is a list of RoundPlayers keyed by 64-bit
+		Steam IDs, and End is where the round ends in the history file.
+
+		Seed, Shuffle and Position say where in deck.Replay(Seed, Shuffle)
+		the round's cards were dealt from. Seed is None if it isn't known.
+	"""
+	def __init__(self, table, dealerHand, when = None):
+		self.Time = time.time() if when == None else when
+		self.Table = table
+		self.DealerHand = dealerHand
+		self.Players = []
+		self.Seed = None
+		self.Shuffle = 0
+		self.Position = 0
+		self.End = None
+
+def EncodeRound(round):
+	data = bytearray(_roundHeader.pack(round.Time, round.Table, len(round.Players)))
+	EncodeHand(round.DealerHand, data)
+
+	for player in round.Players:
+		data += _playerHeader.pack(player.SteamID, player.Bet, player.Insured,
+			player.Insurance, len(player.Hands))
+
+		for hand, payout in player.Hands:
+			EncodeHand(hand, data)
+			data += _payout.pack(payout)
+
+	if round.Seed != None:
+		data += _deal.pack(round.Seed, round.Shuffle, round.Position)
+
+	return data
+
+def DecodeRound(data):
+	when, table, count = _roundHeader.unpack_from(data)
+	dealerHand, offset = DecodeHand(data, _roundHeader.size)
+	round = Round(table, dealerHand, when)
+
+	for i in xrange(count):
+		steamID, bet, insured, insurance, hands = _playerHeader.unpack_from(data, offset)
+		offset += _playerHeader.size
+		player = RoundPlayer(steamID, bet, bool(insured), insurance)
+
+		for j in xrange(hands):
+			hand, offset = DecodeHand(data, offset)
+			payout, = _payout.unpack_from(data, offset)
+			offset += _payout.size
+			player.Hands.append((hand, payout))
+
+		round.Players.append(player)
+
+	if len(data) >= offset + _deal.size:
+		round.Seed, round.Shuffle, round.Position = _deal.unpack_from(data, offset)
+
+	return round
+
+def ReadRounds(path, offset = 0):
+	"""
+		Yields every round in a history file from an offset, reading one
+		round at a time. Stops at a round that was only partly written.
+	"""
+	try:
+		file = open(path, 'rb')
+	except IOError:
+		return
+
+	with file:
+		file.seek(offset)
+
+		while True:
+			header = file.read(_length.size)
+
+			if len(header) < _length.size:
+				return
+
+			length, = _length.unpack(header)
+			data = file.read(length)
+
+			if len(data) < length:
+				return
+
+			round = DecodeRound(bytearray(data))
+			offset += _length.size + length
+			round.End = offset
+			yield round
+
+class PlayerStats(object):
+	__slots__ = ('Rounds', 'Hands', 'Wins', 'Losses', 'Pushes', 'Blackjacks',
+		'Net', 'BiggestWin')
+
+	def __init__(self):
+		self.Rounds = 0
+		self.Hands = 0
+		self.Wins = 0
+		self.Losses = 0
+		self.Pushes = 0
+		self.Blackjacks = 0
+		self.Net = 0
+		self.BiggestWin = 0
+
+	def Add(self, player):
+		"""
+			Counts a RoundPlayer's round.
+		"""
+		self.Rounds += 1
+
+		for hand, payout in player.Hands:
+			self.Hands += 1
+
+			if payout > 0:
+				self.Wins += 1
+			elif payout < 0:
+				self.Losses += 1
+			else:
+				self.Pushes += 1
+
+			if hand.State == HandStates.Blackjack:
+				self.Blackjacks += 1
+
+		net = player.GetNet()
+		self.Net += net
+		self.BiggestWin = max(self.BiggestWin, net)
+
+	def GetWinRate(self):
+		return self.Wins / float(self.Hands) if self.Hands else 0.0
+
+class History(object):
+	"""
+		Appends every settled round to a history file and keeps each player's
+		stats up to date as rounds are added. Each round's players' new stats
+		are appended to a stats log along with how far into the history they
+		go, so loading the stats only has to read the rounds after that.
+		Once the log passes CompactSize bytes more than it started with, it's
+		replaced with just everyone's latest stats.
+
+		Every chatroom's Blackjack adds to the same files, so use GetHistory()
+		to share one History for them.
+	"""
+	def __init__(self, path, statsPath, compactSize = 256 * 1024):
+		self.Path = path
+		self.StatsPath = statsPath
+		self.CompactSize = compactSize
+		self.Stats = {}
+		self._offset = 0
+		self._statsSize = 0
+		self._compactedSize = 0
+		self._loaded = False
+		self._lock = Lock()
+
+	def Load(self):
+		"""
+			Reads the stats and catches up on the history, the first time it's
+			called.
+		"""
+		with self._lock:
+			if self._loaded:
+				return
+
+			self._loaded = True
+			self._offset, self.Stats, self._statsSize = self._readStats()
+			caughtUp = False
+
+			# Catch up on rounds that were written after the stats were saved.
+			for round in ReadRounds(self.Path, self._offset):
+				self._count(round)
+				self._offset = round.End
+				caughtUp = True
+
+			# Cut off a round that was only partly written, so the next one
+			# starts in the right place.
+			if os.path.exists(self.Path) and os.path.getsize(self.Path) > self._offset:
+				with open(self.Path, 'r+b') as file:
+					file.truncate(self._offset)
+
+			if caughtUp:
+				self._compact()
+			else:
+				self._compactedSize = self._statsSize
+
+	def Append(self, round):
+		data = EncodeRound(round)
+
+		with self._lock:
+			with open(self.Path, 'ab') as file:
+				file.write(_length.pack(len(data)))
+				file.write(data)
+
+			self._offset += _length.size + len(data)
+			round.End = self._offset
+			self._count(round)
+
+			if self._statsSize > self._compactedSize + self.CompactSize:
+				self._compact()
+			else:
+				record = self._encodeStats(
+					set(player.SteamID for player in round.Players))
+
+				with open(self.StatsPath, 'ab') as file:
+					file.write(record)
+
+				self._statsSize += len(record)
+
+	def GetStats(self, steamID):
+		return self.Stats.get(steamID)
+
+	def _count(self, round):
+		for player in round.Players:
+			stats = self.Stats.get(player.SteamID)
+
+			if stats == None:
+				stats = self.Stats[player.SteamID] = PlayerStats()
+
+			stats.Add(player)
+
+	def _encodeStats(self, steamIDs):
+		"""
+			Packs the stats of some players as a record for the stats log.
+		"""
+		data = bytearray(_statsHeader.pack(self._offset, len(steamIDs)))
+
+		for steamID in steamIDs:
+			stats = self.Stats[steamID]
+			data += _playerStats.pack(steamID, stats.Rounds, stats.Hands,
+				stats.Wins, stats.Losses, stats.Pushes, stats.Blackjacks,
+				stats.Net, stats.BiggestWin)
+
+		return _length.pack(len(data)) + data
+
+	def _readStats(self):
+		"""
+			Replays the stats log, cutting off a record that was only partly
+			written. Returns the offset into the history, the stats and the
+			log's size.
+		"""
+		data = safefile.Load(self.StatsPath, lambda file: bytearray(file.read()))
+		offset, stats = 0, {}
+		end = 0
+
+		while data and end + _length.size <= len(data):
+			length, = _length.unpack_from(data, end)
+			start = end + _length.size
+
+			if start + length > len(data):
+				break
+
+			offset, count = _statsHeader.unpack_from(data, start)
+			start += _statsHeader.size
+
+			for i in xrange(count):
+				row = _playerStats.unpack_from(data, start + i * _playerStats.size)
+				player = stats[row[0]] = PlayerStats()
+				player.Rounds, player.Hands, player.Wins, player.Losses, \
+					player.Pushes, player.Blackjacks, player.Net, \
+					player.BiggestWin = row[1:]
+
+			end += _length.size + length
+
+		if data and end < len(data):
+			with open(self.StatsPath, 'r+b') as file:
+				file.truncate(end)
+
+		return offset, stats, end
+
+	def _compact(self):
+		data = self._encodeStats(self.Stats.keys())
+		safefile.Replace(self.StatsPath, lambda file: file.write(data))
+		self._statsSize = self._compactedSize = len(data)
+
+_histories = {}
+_historiesLock = Lock()
+
+def GetHistory(path, statsPath):
+	"""
+		Gets the History for a history file, shared by everyone who adds to
+		it.
+	"""
+	with _historiesLock:
+		if not path in _histories:
+			_histories[path] = History(path, statsPath)
+
+		return _histories[path]
@@ -0,0 +1,286 @@
+import struct
+import deck
+import safefile
+from bankstore import GetKey
+from threading import Thread, Condition, Lock
+from blackjackhand import HandStates, Player, Hand
+
+_magic = 'BJCP'
+_version = 4
+_fileHeader = struct.Struct('<4sHH')
+_count = struct.Struct('<I')
+_recordHeader = struct.Struct('<QII')
+_tableHeader = struct.Struct('<BBBfQIHIHI')
+_playerHeader = struct.Struct('<QIBB')
+_handHeader = struct.Struct('<BBB')
+
+# Cards are saved as their deck code, with the top bit set if they're face
+# down. The shoe is already kept as codes, so it's saved as it is.
+_faceDown = 0x80
+_handStates = list(HandStates)
+
+def _packCodes(codes, data):
+	data += _count.pack(len(codes))
+	data += codes
+
+def _unpackCodes(data, offset):
+	count, = _count.unpack_from(data, offset)
+	offset += _count.size
+	return bytearray(data[offset:offset + count]), offset + count
+
+def EncodeHand(hand, data):
+	"""
+		Packs a hand's state and cards onto the end of a bytearray.
+	"""
+	flags = (1 if hand.Done else 0) | (2 if hand.Doubled else 0)
+	data += _handHeader.pack(_handStates.index(hand.State), flags, len(hand.Cards))
+	data += bytearray(card.Code | _faceDown if i in hand.FaceDown else card.Code
+		for i, card in enumerate(hand.Cards))
+
+def DecodeHand(data, offset):
+	"""
+		Reads a hand packed by EncodeHand() and returns it and the offset
+		after it.
+	"""
+	state, flags, count = _handHeader.unpack_from(data, offset)
+	offset += _handHeader.size
+	hand = Hand()
+	codes = data[offset:offset + count]
+	hand.Deal([deck.GetCard(code & ~_faceDown) for code in codes])
+
+	for i, code in enumerate(codes):
+		if code & _faceDown:
+			hand.Hide(i)
+
+	# Deal() works out a state, so put back the one that was saved.
+	hand.State = _handStates[state]
+	hand.Done = bool(flags & 1)
+	hand.Doubled = bool(flags & 2)
+	return hand, offset + count
+
+class SavedTable(object):
+	"""
+		A Blackjack table read back from a checkpoint. State is the value of
+		its BlackjackStates, and Players and WaitingQueue map 64-bit Steam IDs
+		to Players.
+	"""
+	def __init__(self):
+		self.Number = 0
+		self.Round = 0
+		self.State = 0
+		self.CanInsure = False
+		self.Remaining = 0.0
+		self.Seed = 0
+		self.Shuffles = 0
+		self.Shoe = bytearray()
+		self.CardIndex = 0
+		self.Discards = bytearray()
+		self.RoundStart = (0, 0)
+		self.DealerHand = None
+		self.Players = {}
+		self.WaitingQueue = {}
+
+def Encode(table, state):
+	"""
+		Packs a table into a few hundred bytes. state is the value of the
+		table's BlackjackStates.
+	"""
+	data = bytearray()
+	remaining = table.Countdown.remaining() if table.Countdown else 0.0
+	players = [(player, False) for player in table.Players.iteritems()] + \
+		[(player, True) for player in table.WaitingQueue.iteritems()]
+
+	seed, shuffles, shoe, cardIndex, discards = table.Deck.GetState()
+
+	data += _tableHeader.pack(table.Number, state, table.CanInsure, remaining,
+		seed, shuffles, cardIndex, table.RoundStart[0], table.RoundStart[1],
+		table.Round)
+	_packCodes(shoe, data)
+	_packCodes(discards, data)
+	EncodeHand(table.DealerHand, data)
+	data += _count.pack(len(players))
+
+	for (steamID, player), waiting in players:
+		flags = (1 if player.HasInsurance else 0) | (2 if waiting else 0)
+		data += _playerHeader.pack(GetKey(steamID), player.Bet, flags, len(player.Hands))
+
+		for hand in player.Hands:
+			EncodeHand(hand, data)
+
+	return data
+
+def Decode(data):
+	"""
+		Reads a table packed by Encode().
+	"""
+	saved = SavedTable()
+	header = _tableHeader.unpack_from(data, 0)
+	offset = _tableHeader.size
+
+	saved.Number, saved.State, canInsure, saved.Remaining, saved.Seed, \
+		saved.Shuffles, saved.CardIndex, roundShuffle, roundIndex, \
+		saved.Round = header
+	saved.RoundStart = (roundShuffle, roundIndex)
+	saved.CanInsure = bool(canInsure)
+
+	saved.Shoe, offset = _unpackCodes(data, offset)
+	saved.Discards, offset = _unpackCodes(data, offset)
+	saved.DealerHand, offset = DecodeHand(data, offset)
+
+	count, = _count.unpack_from(data, offset)
+	offset += _count.size
+
+	for i in xrange(count):
+		key, bet, flags, hands = _playerHeader.unpack_from(data, offset)
+		offset += _playerHeader.size
+		player = Player(bet)
+		player.HasInsurance = bool(flags & 1)
+
+		for j in xrange(hands):
+			hand, offset = DecodeHand(data, offset)
+			player.Hands.append(hand)
+
+		if flags & 2:
+			saved.WaitingQueue[key] = player
+		else:
+			saved.Players[key] = player
+
+	return saved
+
+class Checkpointer(object):
+	"""
+		Keeps the latest checkpoint of every chatroom's tables in a file,
+		keyed by (room, table number). Save() only hands the record to a
+		writer thread, which writes whatever is newest, so saving often
+		doesn't slow down whoever saves.
+
+		Every chatroom's Blackjack shares the file, so use GetCheckpointer()
+		to share one Checkpointer for it too.
+	"""
+	def __init__(self, path):
+		self.Path = path
+		self._records = None
+		self._pending = {}
+		self._saved = 0
+		self._written = 0
+		self._condition = Condition()
+		self._thread = None
+
+	def Save(self, key, record):
+		"""
+			Queues a record to replace a key's checkpoint. A record of None
+			removes it.
+		"""
+		with self._condition:
+			# The file has to be read before it's written over.
+			self._load()
+			self._pending[key] = record
+			self._saved += 1
+
+			if self._thread == None:
+				self._thread = Thread(target = self._run, name = "Checkpointer")
+				self._thread.daemon = True
+				self._thread.start()
+
+			self._condition.notify_all()
+
+	def Flush(self):
+		"""
+			Waits for everything saved so far to be written.
+		"""
+		with self._condition:
+			saved = self._saved
+
+			while self._written < saved:
+				self._condition.wait()
+
+	def GetRecords(self, room):
+		"""
+			Gets a room's checkpoints, including any that haven't been written
+			yet, as a {table number: record} dict.
+		"""
+		with self._condition:
+			self._load()
+			records = dict(self._records)
+			records.update(self._pending)
+
+		return dict((table, record) for (key, table), record in records.iteritems()
+			if key == room and record != None)
+
+	def _load(self):
+		"""
+			Reads the file the first time it's needed.
+		"""
+		if self._records != None:
+			return
+
+		self._records = {}
+		data = safefile.Load(self.Path, lambda file: bytearray(file.read()))
+
+		if not data:
+			return
+
+		magic, version, count = _fileHeader.unpack_from(data)
+
+		if magic != _magic or version != _version:
+			return
+
+		offset = _fileHeader.size
+
+		try:
+			for i in xrange(count):
+				room, table, length = _recordHeader.unpack_from(data, offset)
+				offset += _recordHeader.size
+
+				self._records[room, table] = data[offset:offset + length]
+				offset += length
+		except struct.error:
+			# Keep what was written before the file was cut off.
+			pass
+
+	def _run(self):
+		while True:
+			with self._condition:
+				while not self._pending:
+					self._condition.wait()
+
+				for key, record in self._pending.iteritems():
+					if record == None:
+						self._records.pop(key, None)
+					else:
+						self._records[key] = record
+
+				self._pending = {}
+				records = dict(self._records)
+				saved = self._saved
+
+			try:
+				self._write(records)
+			except (IOError, OSError):
+				pass
+
+			with self._condition:
+				self._written = saved
+				self._condition.notify_all()
+
+	def _write(self, records):
+		data = bytearray(_fileHeader.pack(_magic, _version, len(records)))
+
+		for (room, table), record in records.iteritems():
+			data += _recordHeader.pack(room, table, len(record))
+			data += record
+
+		safefile.Replace(self.Path, lambda file: file.write(data))
+
+_checkpointers = {}
+_checkpointersLock = Lock()
+
+def GetCheckpointer(path):
+	"""
+		Gets the Checkpointer for a file, shared by everyone who saves to it.
+	"""
+	with _checkpointersLock:
+		if not path in _checkpointers:
+			_checkpointers[path] = Checkpointer(path)
+
+		return _checkpointers[path]
@@ -0,0 +1,329 @@
+import struct
+import zlib
+from array import array
+from blackjackhand import HandStates, Hand, GetValue
+
+# Bump this when the tables are worked out differently, so old files get
+# rebuilt.
+Version = 2
+_magic = 'BJST'
+_header = struct.Struct('<4sII')
+
+# Each card value and how likely it is to be drawn. Tables deal from a
+# multi-deck shoe, so which cards are left hardly changes one round, and the
+# tables are worked out as if from an endless shoe.
+_draws = [(value, 1 / 13.) for value in xrange(2, 10)] + [(10, 4 / 13.), (11, 1 / 13.)]
+
+Actions = ('stand', 'hit', 'double', 'surrender', 'split')
+_actionIndexes = dict((action, i) for i, action in enumerate(Actions))
+
+# Tables cover dealer up cards 2-11 (11 is an ace), 0-21 points, hard and
+# soft hands, and 2-7 cards (a hand is done at 8 with an 8-card Charlie).
+_ups = range(2, 12)
+_points = 22
+_cards = range(2, 8)
+_nan = float('nan')
+
+# Payouts are worked out on a big bet so rounding them to whole dollars
+# doesn't matter, then scaled to one bet.
+_bet = 1000
+
+def _add(points, soft, value):
+	"""
+		Gets the points and softness after a card is added to a hand, the
+		same way Hand scores its cards.
+	"""
+	hard = (points - 10 if soft else points) + (1 if value == 11 else value)
+
+	# A hard hand with an ace has 12+ points, so the ace can't count as 11
+	# again.
+	if (soft or value == 11) and hard + 10 <= 21:
+		return hard + 10, True
+
+	return hard, False
+
+def _hand(points, state, doubled = False):
+	# Payout() only looks at the points, state and bet of a hand.
+	hand = Hand()
+	hand._points = points
+	hand.State = state
+	hand.Doubled = doubled
+	return hand
+
+def _checkState(points, cards, split):
+	"""
+		Gets the state Hand.CheckState() would give a hand, or None if it
+		can still be played.
+	"""
+	if points > 21:
+		return HandStates.Bust
+	elif cards == 2 and points == 21 and not split:
+		return HandStates.Blackjack
+	elif points == 21:
+		return HandStates.Stand
+	elif cards >= 8:
+		return HandStates.Charlie
+
+	return None
+
+def DealerOutcomes(up):
+	"""
+		Gets the chance of every way the dealer's hand can end up when they
+		show an up card, as a {(points, state): chance} dict. The dealer hits
+		soft 17 and doesn't check for blackjack first, like in DealerTurn.
+	"""
+	outcomes = {}
+	memo = {}
+
+	def play(points, soft, cards):
+		key = (points, soft, cards)
+
+		if key in memo:
+			return memo[key]
+
+		state = _checkState(points, cards, False)
+
+		if state == HandStates.Bust:
+			# Busted points don't matter.
+			result = {(22, state): 1.0}
+		elif state != None:
+			result = {(points, state): 1.0}
+		elif points < 17 or (points == 17 and soft):
+			result = {}
+
+			for value, chance in _draws:
+				newPoints, newSoft = _add(points, soft, value)
+
+				for outcome, outcomeChance in play(newPoints, newSoft, cards + 1).iteritems():
+					result[outcome] = result.get(outcome, 0.0) + chance * outcomeChance
+		else:
+			result = {(points, HandStates.None): 1.0}
+
+		memo[key] = result
+		return result
+
+	upPoints, upSoft = _add(0, False, up)
+
+	for value, chance in _draws:
+		points, soft = _add(upPoints, upSoft, value)
+
+		for outcome, outcomeChance in play(points, soft, 2).iteritems():
+			outcomes[outcome] = outcomes.get(outcome, 0.0) + chance * outcomeChance
+
+	return outcomes
+
+class _Solver(object):
+	"""
+		Works out the expected value of every play against one dealer up card,
+		in bets, using Hand.Payout() to settle hands.
+	"""
+	def __init__(self, up):
+		self._dealer = [(_hand(points, state), chance)
+			for (points, state), chance in DealerOutcomes(up).iteritems()]
+		self._payouts = {}
+		self._evs = {}
+
+	def Payout(self, points, state, doubled = False):
+		key = (points, state, doubled)
+
+		if not key in self._payouts:
+			hand = _hand(points, state, doubled)
+			self._payouts[key] = sum(chance * hand.Payout(_bet, dealerHand)
+				for dealerHand, chance in self._dealer) / _bet
+
+		return self._payouts[key]
+
+	def After(self, points, soft, cards, split = False):
+		"""
+			Gets the value of a hand that was just dealt a card.
+		"""
+		state = _checkState(points, cards, split)
+
+		if state != None:
+			return self.Payout(points, state)
+
+		return max(self.GetEVs(points, soft, cards).itervalues())
+
+	def GetEVs(self, points, soft, cards):
+		"""
+			Gets the {action: EV} of every action but split.
+		"""
+		key = (points, soft, cards)
+
+		if key in self._evs:
+			return self._evs[key]
+
+		evs = {
+			'stand': self.Payout(points, HandStates.Stand),
+			'surrender': self.Payout(points, HandStates.Surrender),
+		}
+
+		hit = 0.0
+
+		for value, chance in _draws:
+			newPoints, newSoft = _add(points, soft, value)
+			hit += chance * self.After(newPoints, newSoft, cards + 1)
+
+		evs['hit'] = hit
+
+		if cards == 2:
+			evs['double'] = sum(chance * self._double(points, soft, value)
+				for value, chance in _draws)
+
+		self._evs[key] = evs
+		return evs
+
+	def _double(self, points, soft, value):
+		# Hand.Double() keeps a bust, and stands on anything else.
+		points = _add(points, soft, value)[0]
+		state = HandStates.Bust if points > 21 else HandStates.DoubleDown
+		return self.Payout(points, state, True)
+
+	def Split(self, value):
+		"""
+			Gets the value of splitting a pair. Each hand has its own bet.
+		"""
+		points, soft = _add(0, False, value)
+		total = 0.0
+
+		for card, chance in _draws:
+			newPoints, newSoft = _add(points, soft, card)
+			total += chance * self.After(newPoints, newSoft, 2, True)
+
+		return 2 * total
+
+def _signature():
+	"""
+		Gets a checksum of the rules the tables are worked out from, so that
+		changing Hand.Payout() rebuilds them.
+	"""
+	states = (HandStates.None, HandStates.Stand, HandStates.DoubleDown,
+		HandStates.Surrender, HandStates.Blackjack, HandStates.Bust,
+		HandStates.Charlie)
+	payouts = array('i', [Version])
+
+	for points in xrange(4, 27):
+		for state in states:
+			for doubled in (False, True):
+				hand = _hand(points, state, doubled)
+
+				for dealerPoints in xrange(17, 23):
+					for dealerState in states:
+						payouts.append(hand.Payout(2, _hand(dealerPoints, dealerState)))
+
+	return zlib.crc32(payouts.tostring()) & 0xffffffff
+
+def _handIndex(points, soft, cards, up):
+	return ((((cards - 2) * 2 + soft) * _points + points) * len(_ups) + up - 2) * len(Actions)
+
+def _pairIndex(value, up):
+	return (value - 2) * len(_ups) + up - 2
+
+class StrategyTable(object):
+	"""
+		The EV of every action for every hand against every dealer up card,
+		packed into float arrays. Actions that can't be taken are NaN.
+	"""
+	def __init__(self, hands, pairs, signature):
+		self._hands = hands
+		self._pairs = pairs
+		self.Signature = signature
+
+	def GetEVs(self, points, soft, cards, up, pair = None):
+		"""
+			Gets an {action: EV} dict for a hand. pair is the value of the
+			cards if the hand is a pair that can be split.
+		"""
+		if points >= _points or not cards in _cards:
+			return {}
+
+		index = _handIndex(points, soft, cards, up)
+		evs = {}
+
+		for i, action in enumerate(Actions):
+			ev = self._hands[index + i]
+
+			if ev == ev:
+				evs[action] = ev
+
+		if pair != None:
+			ev = self._pairs[_pairIndex(pair, up)]
+
+			if ev == ev:
+				evs['split'] = ev
+
+		return evs
+
+	def GetHint(self, hand, upCard):
+		"""
+			Gets the best action for a Hand and the EVs of every action.
+		"""
+		cards = hand.Cards
+		pair = None
+
+		if len(cards) == 2 and cards[0].Rank == cards[1].Rank:
+			pair = GetValue(cards[0])
+
+		evs = self.GetEVs(hand.GetPoints(), int(hand.Soft), len(cards),
+			GetValue(upCard), pair)
+
+		if not evs:
+			return None, evs
+
+		return max(evs, key = evs.get), evs
+
+	def Save(self, path):
+		with open(path, 'wb') as file:
+			file.write(_header.pack(_magic, Version, self.Signature))
+			self._hands.tofile(file)
+			self._pairs.tofile(file)
+
+def Build():
+	hands = array('f', [_nan]) * (_handIndex(0, 0, _cards[-1] + 1, 2))
+	pairs = array('f', [_nan]) * (len(_ups) * len(_ups))
+
+	for up in _ups:
+		solver = _Solver(up)
+
+		for cards in _cards:
+			for soft in (0, 1):
+				for points in xrange(12 if soft else 2, _points):
+					index = _handIndex(points, soft, cards, up)
+
+					for action, ev in solver.GetEVs(points, bool(soft), cards).iteritems():
+						hands[index + _actionIndexes[action]] = ev
+
+		# Split aces can't be finished in the module, so they're left out.
+		for value in xrange(2, 11):
+			pairs[_pairIndex(value, up)] = solver.Split(value)
+
+	return StrategyTable(hands, pairs, _signature())
+
+def Load(path):
+	"""
+		Loads the tables from a file, building them and saving them there if
+		the file is missing or was built for other rules.
+	"""
+	signature = _signature()
+
+	try:
+		with open(path, 'rb') as file:
+			magic, version, fileSignature = _header.unpack(file.read(_header.size))
+
+			if (magic, version, fileSignature) == (_magic, Version, signature):
+				hands = array('f')
+				pairs = array('f')
+				hands.fromfile(file, _handIndex(0, 0, _cards[-1] + 1, 2))
+				pairs.fromfile(file, len(_ups) * len(_ups))
+				return StrategyTable(hands, pairs, signature)
+	except (IOError, EOFError, struct.error):
+		pass
+
+	table = Build()
+
+	try:
+		table.Save(path)
+	except IOError:
+		pass
+
+	return table
@@ -0,0 +1,448 @@
+from bisect import bisect_left, bisect_right, insort
+
+class _BlockList(object):
+	"""
+		A list that's split into blocks of about Load items each. Inserting or
+		deleting only shifts the items of one block, and a Fenwick tree over
+		the block lengths finds an item's position in O(log n).
+	"""
+	def __init__(self, load = 500):
+		self.Load = load
+		self._blocks = []
+		self._len = 0
+		self._tree = None
+		self._step = 0
+
+	def __len__(self):
+		return self._len
+
+	def __iter__(self):
+		for block in self._blocks:
+			for item in block:
+				yield item
+
+	def __getitem__(self, index):
+		block, i = self._locate(index)
+		return self._blocks[block][i]
+
+	def Slice(self, start, stop = None):
+		"""
+			Yields the items from start up to (but not including) stop.
+		"""
+		if stop == None or stop > self._len:
+			stop = self._len
+
+		if start < 0:
+			start = 0
+
+		if start >= stop:
+			return
+
+		block, i = self._locate(start)
+		count = stop - start
+
+		while count > 0:
+			items = self._blocks[block][i:i + count]
+
+			for item in items:
+				yield item
+
+			count -= len(items)
+			block += 1
+			i = 0
+
+	def _locate(self, index):
+		"""
+			Turns an index into a (block, index in block) pair.
+		"""
+		if index < 0:
+			index += self._len
+
+		if index < 0 or index >= self._len:
+			raise IndexError("BlockList index out of range")
+
+		tree = self._getTree()
+		size = len(tree)
+		step = self._step
+		block = 0
+
+		# Walk down the Fenwick tree to find the block holding index.
+		while step:
+			next = block + step
+
+			if next <= size and tree[next - 1] <= index:
+				block = next
+				index -= tree[next - 1]
+
+			step >>= 1
+
+		return block, index
+
+	def _offset(self, block):
+		"""
+			Gets how many items come before a block.
+		"""
+		tree = self._getTree()
+		total = 0
+
+		while block > 0:
+			total += tree[block - 1]
+			block &= block - 1
+
+		return total
+
+	def _getTree(self):
+		if self._tree == None:
+			tree = [len(block) for block in self._blocks]
+
+			for i in xrange(len(tree)):
+				parent = i | (i + 1)
+
+				if parent < len(tree):
+					tree[parent] += tree[i]
+
+			# The biggest power of two that fits, where _locate() starts.
+			step = 1 if tree else 0
+
+			while step * 2 <= len(tree):
+				step *= 2
+
+			self._tree = tree
+			self._step = step
+
+		return self._tree
+
+	def _resize(self, block, delta):
+		"""
+			Updates the Fenwick tree after a block grew or shrank by delta.
+		"""
+		self._len += delta
+
+		if self._tree == None:
+			return
+
+		tree = self._tree
+		size = len(tree)
+		i = block
+
+		while i < size:
+			tree[i] += delta
+			i |= i + 1
+
+	def _split(self, block):
+		"""
+			Splits a block in half once it gets too big. Returns True if the
+			blocks changed.
+		"""
+		items = self._blocks[block]
+
+		if len(items) <= self.Load * 2:
+			return False
+
+		self._blocks.insert(block + 1, items[self.Load:])
+		del items[self.Load:]
+		self._tree = None
+		return True
+
+class BlockList(_BlockList):
+	"""
+		A list that's quick to insert into and delete from anywhere. Getting,
+		inserting and deleting an item at a position are all O(log n) plus
+		the size of a block. Shifting a block is one quick memmove, while
+		walking the tree runs Python code for every level, so its blocks are
+		bigger than SortedList's.
+	"""
+	def __init__(self, items = (), load = 1000):
+		_BlockList.__init__(self, load)
+		self.Insert(0, items)
+
+	def Insert(self, index, items):
+		"""
+			Inserts items before index, like list[index:index] = items.
+		"""
+		items = list(items)
+
+		if len(items) == 0:
+			return
+
+		if index < 0:
+			index = max(0, index + self._len)
+
+		if len(self._blocks) == 0:
+			self._blocks.append(items)
+			block = 0
+			self._len = len(items)
+			self._tree = None
+		else:
+			if index >= self._len:
+				block = len(self._blocks) - 1
+				i = len(self._blocks[block])
+			else:
+				block, i = self._locate(index)
+
+			self._blocks[block][i:i] = items
+			self._resize(block, len(items))
+
+		blockItems = self._blocks[block]
+		stop = block + 1
+
+		# Lots of items at once are cut into blocks all together.
+		if len(blockItems) > self.Load * 2:
+			chunks = [blockItems[i:i + self.Load]
+				for i in xrange(0, len(blockItems), self.Load)]
+			self._blocks[block:block + 1] = chunks
+			stop = block + len(chunks)
+			self._tree = None
+
+		self._placed(block, stop, items)
+
+	def _placed(self, start, stop, items):
+		"""
+			Called after Insert() put items into the blocks from start up to
+			stop. If there's more than one, the blocks were cut up and all
+			of their items moved.
+		"""
+		pass
+
+	def Append(self, item):
+		self.Insert(self._len, (item,))
+
+	def Pop(self, index = -1):
+		"""
+			Removes and returns the item at index.
+		"""
+		block, i = self._locate(index)
+		items = self._blocks[block]
+		item = items.pop(i)
+
+		if len(items) == 0:
+			del self._blocks[block]
+			self._len -= 1
+			self._tree = None
+		else:
+			self._resize(block, -1)
+
+		return item
+
+	def Clear(self):
+		del self._blocks[:]
+		self._len = 0
+		self._tree = None
+
+class IndexedBlockList(BlockList):
+	"""
+		A BlockList of distinct, hashable items that can also find an item's
+		position in O(log n) plus the size of a block. It remembers which
+		block every item is in, rather than its position, so an edit doesn't
+		change what's stored for the items after it.
+	"""
+	def __init__(self, items = (), load = 1000):
+		self._where = {}
+		self._numbers = None
+		BlockList.__init__(self, items, load)
+
+	def __contains__(self, item):
+		return item in self._where
+
+	def _placed(self, start, stop, items):
+		if stop - start == 1:
+			block = self._blocks[start]
+
+			for item in items:
+				self._where[item] = block
+		else:
+			for block in self._blocks[start:stop]:
+				for item in block:
+					self._where[item] = block
+
+	def Pop(self, index = -1):
+		item = BlockList.Pop(self, index)
+		del self._where[item]
+		return item
+
+	def Clear(self):
+		BlockList.Clear(self)
+		self._where.clear()
+
+	def Index(self, item):
+		"""
+			Gets the position of an item.
+		"""
+		return self.Indexes((item,))[item]
+
+	def Indexes(self, items):
+		"""
+			Gets {item: position} for many items, going through each block
+			they're in only once.
+		"""
+		wanted = {}
+
+		for item in items:
+			block = self._where.get(item)
+
+			if block == None:
+				raise ValueError("{} is not in the list".format(item))
+
+			wanted.setdefault(id(block), (block, set()))[1].add(item)
+
+		self._getTree()
+
+		# Blocks are numbered again only after they're split or removed.
+		if self._numbers == None:
+			self._numbers = dict((id(block), i) for i, block in enumerate(self._blocks))
+
+		positions = {}
+
+		for key, (block, found) in wanted.iteritems():
+			offset = self._offset(self._numbers[key])
+
+			for i, item in enumerate(block):
+				if item in found:
+					positions[item] = offset + i
+
+		return positions
+
+	def _getTree(self):
+		if self._tree == None:
+			self._numbers = None
+
+		return BlockList._getTree(self)
+
+class SortedList(_BlockList):
+	"""
+		A list that keeps its items sorted.
+	"""
+	def __init__(self, items = (), load = 500):
+		_BlockList.__init__(self, load)
+		self._maxes = []
+
+		items = sorted(items)
+
+		for i in xrange(0, len(items), load):
+			self._blocks.append(items[i:i + load])
+			self._maxes.append(items[min(i + load, len(items)) - 1])
+
+		self._len = len(items)
+
+	def __contains__(self, item):
+		block = bisect_left(self._maxes, item)
+
+		if block == len(self._maxes):
+			return False
+
+		items = self._blocks[block]
+		i = bisect_left(items, item)
+		return items[i] == item
+
+	def Add(self, item):
+		if len(self._blocks) == 0:
+			self._blocks.append([item])
+			self._maxes.append(item)
+			self._len = 1
+			self._tree = None
+			return
+
+		block = bisect_right(self._maxes, item)
+
+		if block == len(self._maxes):
+			block -= 1
+			self._blocks[block].append(item)
+			self._maxes[block] = item
+		else:
+			insort(self._blocks[block], item)
+
+		self._resize(block, 1)
+
+		if self._split(block):
+			self._maxes.insert(block + 1, self._blocks[block + 1][-1])
+			self._maxes[block] = self._blocks[block][-1]
+
+	def Remove(self, item):
+		block = bisect_left(self._maxes, item)
+
+		if block == len(self._maxes):
+			raise ValueError("{} is not in the list".format(item))
+
+		items = self._blocks[block]
+		i = bisect_left(items, item)
+
+		if items[i] != item:
+			raise ValueError("{} is not in the list".format(item))
+
+		del items[i]
+
+		if len(items) == 0:
+			del self._blocks[block]
+			del self._maxes[block]
+			self._len -= 1
+			self._tree = None
+		else:
+			self._maxes[block] = items[-1]
+			self._resize(block, -1)
+
+	def Index(self, item):
+		"""
+			Gets the position of an item in O(log n).
+		"""
+		block = bisect_left(self._maxes, item)
+
+		if block == len(self._maxes):
+			raise ValueError("{} is not in the list".format(item))
+
+		items = self._blocks[block]
+		i = bisect_left(items, item)
+
+		if items[i] != item:
+			raise ValueError("{} is not in the list".format(item))
+
+		return self._offset(block) + i
+
+class Ranking(object):
+	"""
+		Ranks keys by score, highest score first. Changing a score, getting the
+		top k and looking up a key's rank are all logarithmic.
+	"""
+	def __init__(self, scores = ()):
+		self._scores = dict(scores)
+		self._order = SortedList((-score, key) for key, score in self._scores.iteritems())
+
+	def __len__(self):
+		return len(self._scores)
+
+	def __contains__(self, key):
+		return key in self._scores
+
+	def Set(self, key, score):
+		old = self._scores.get(key)
+
+		if old == score:
+			return
+
+		if old != None:
+			self._order.Remove((-old, key))
+
+		self._scores[key] = score
+		self._order.Add((-score, key))
+
+	def Remove(self, key):
+		old = self._scores.pop(key, None)
+
+		if old != None:
+			self._order.Remove((-old, key))
+
+	def Top(self, count):
+		"""
+			Returns a list of (key, score) for the count highest scores.
+		"""
+		return [(key, -score) for score, key in self._order.Slice(0, count)]
+
+	def Rank(self, key):
+		"""
+			Gets a key's 1-based rank, or None if it isn't ranked.
+		"""
+		score = self._scores.get(key)
+
+		if score == None:
+			return None
+
+		return self._order.Index((-score, key)) + 1
@@ -1,27 +1,151 @@
-from threading import Timer
+import time
+from threading import Lock
+from scheduler import CancelToken, LoopScheduler, GetScheduler
 
 class Countdown(object):
-	def __init__(self, interval, start, callback, say):
+	"""
+		Calls Callback after Interval seconds, saying how many seconds are
+		left for the last Start seconds. Everything is run by a scheduler (the
+		shared one by default), so a countdown doesn't start any threads.
+
+		A countdown can be paused, resumed, extended and fired early. Its
+		calls are cancelled with a CancelToken whenever they're rescheduled
+		or stopped, so a stopped countdown's callback never runs. Pass a
+		token to cancel the countdown along with something else, like the
+		state of a game.
+	"""
+	def __init__(self, interval, start, callback, say, token = None, scheduler = None):
 		self.Interval = interval
 		self.Start = start
 		self.Callback = callback
 		self.Say = say
-		self.Timers = []
-		
+		self.Token = token
+		self.Scheduler = GetScheduler() if scheduler == None else scheduler
+		self.StartTime = None
+		self.Paused = False
+		self.Done = False
+		self._deadline = None
+		self._remaining = interval
+		self._calls = None
+		self._lock = Lock()
+
 	def start(self):
-		self.Timers.append(Timer(self.Interval, self.Callback))
-		
+		self.StartTime = time.time()
+		self.Paused = False
+		self.Done = False
+		self._schedule(self.Interval)
+
+	def stop(self):
+		self._cancel()
+
+	def pause(self):
+		if self.Paused or self.Done or self._calls == None:
+			return
+
+		self._remaining = self.remaining()
+		self.Paused = True
+		self._cancel()
+
+	def resume(self):
+		if not self.Paused:
+			return
+
+		self.Paused = False
+		self._schedule(self._remaining)
+
+	def extend(self, seconds):
+		"""
+			Adds seconds to the countdown, and starts counting down the last
+			seconds again if it's already into them.
+		"""
+		self.Interval += seconds
+
+		if self.Paused:
+			self._remaining += seconds
+		elif self._calls != None and not self._calls.Cancelled:
+			self._schedule(self.remaining() + seconds)
+
+	def fire(self):
+		"""
+			Calls Callback now instead of waiting.
+		"""
+		self._cancel()
+		self._finish()
+
+	def remaining(self):
+		if self.Done:
+			return 0
+		elif self.Paused:
+			return self._remaining
+		elif self._deadline == None:
+			return self.Interval
+
+		return max(0, self._deadline - time.time())
+
+	def _schedule(self, seconds):
+		self._cancel()
+		self._calls = CancelToken(self.Token)
+		self._deadline = time.time() + seconds
+		calls = self._calls
+		self.Scheduler.Schedule(seconds, lambda: self._finish(calls), calls)
+
 		for i in xrange(1, self.Start + 1):
-			if self.Interval - i < 0:
+			if seconds - i < 0:
 				break
-				
+
 			count = "{}...".format(i)
-			self.Timers.append(Timer(self.Interval - i, lambda count=count: self.Say(count)))
-		
-		for timer in self.Timers:
-			timer.start()
-			
+			self.Scheduler.Schedule(seconds - i, lambda count=count: self.Say(count),
+				self._calls)
+
+	def _cancel(self):
+		with self._lock:
+			if self._calls != None:
+				self._calls.Cancel()
+
+	def _finish(self, calls = None):
+		# The scheduler and fire() can get here at the same time, and the
+		# scheduler's call can start just before it's cancelled, so it checks
+		# its calls weren't cancelled under the same lock that cancels them.
+		with self._lock:
+			if self.Done or (calls != None and calls.Cancelled) or \
+				(self.Token != None and self.Token.Cancelled):
+				return
+
+			self.Done = True
+
+		self._cancel()
+		self.Callback()
+
+class AsyncioCountdown(Countdown):
+	"""
+		A Countdown run by an event loop instead of the shared scheduler's
+		thread, for a host that runs one. The loop needs asyncio's
+		call_later() and create_future(). Use it from the loop's thread.
+		Wait() gives a future that's done when the countdown fires.
+	"""
+	def __init__(self, interval, start, callback, say, loop, token = None):
+		Countdown.__init__(self, interval, start, callback, say, token,
+			LoopScheduler(loop))
+		self._loop = loop
+		self._future = None
+
+	def Wait(self):
+		if self._future == None:
+			self._future = self._loop.create_future()
+
+			if self.Done:
+				self._future.set_result(None)
+
+		return self._future
+
 	def stop(self):
-		for timer in self.Timers:
-			timer.cancel()
-	
\ No newline at end of file
+		Countdown.stop(self)
+
+		if self._future != None and not self._future.done():
+			self._future.cancel()
+
+	def _finish(self, calls = None):
+		Countdown._finish(self, calls)
+
+		if self.Done and self._future != None and not self._future.done():
+			self._future.set_result(None)
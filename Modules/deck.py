@@ -1,6 +1,8 @@
  # -*- coding: utf-8 -*-
 from enum import Enum
 import random
+import struct
+import hashlib
 
 class Suits(Enum):
 	Clubs = u'♣'
@@ -23,39 +25,184 @@ class Ranks(Enum):
 	Queen = 'Q'
 	King = 'K'
 
+# Shoes keep cards as one-byte codes: suit * 13 + rank.
+_suits = list(Suits)
+_ranks = list(Ranks)
+CardsPerDeck = len(_suits) * len(_ranks)
+
+FaceDownText = u'🂠'
+
 class Card(object):
-	def __init__(self, suit, rank):
-		self.Suit = suit
-		self.Rank = rank
-		self.FaceDown = False
-		
+	"""
+		There's only one of each card, so Card(suit, rank) gives back the same
+		Card every time and cards can't be changed. Whether a card is face
+		down belongs to the hand it's in.
+	"""
+	__slots__ = ('Suit', 'Rank', 'Code', 'Text')
+	_cards = {}
+
+	def __new__(cls, suit, rank):
+		card = cls._cards.get((suit, rank))
+
+		if card == None:
+			card = object.__new__(cls)
+			object.__setattr__(card, 'Suit', suit)
+			object.__setattr__(card, 'Rank', rank)
+			object.__setattr__(card, 'Code',
+				_suits.index(suit) * len(_ranks) + _ranks.index(rank))
+			object.__setattr__(card, 'Text', suit.value + str(rank.value))
+			cls._cards[(suit, rank)] = card
+
+		return card
+
+	def __setattr__(self, name, value):
+		raise AttributeError("Cards can't be changed.")
+
+	def __reduce__(self):
+		return Card, (self.Suit, self.Rank)
+
 	def __str__(self):
-		return u'🂠' if self.FaceDown else self.Suit.value + str(self.Rank.value)
+		return self.Text
+
+_cards = [Card(suit, rank) for suit in _suits for rank in _ranks]
+
+def GetCode(card):
+	return card.Code
+
+def GetCard(code):
+	return _cards[code]
+
+# Every shuffle and every spawned seed gets its own seed, hashed from the
+# deck's seed, what it's for and its number, so no two share a stream.
+_seedKey = struct.Struct('<QQB')
+_seed = struct.Struct('<Q')
+_shuffleStream = 0
+_spawnStream = 1
+
+def _mix(seed, number, stream):
+	return _seed.unpack(hashlib.sha1(_seedKey.pack(seed, number, stream)).digest()[:8])[0]
+
+def NewSeed():
+	return random.getrandbits(64)
+
+def SpawnSeeds(seed, count):
+	"""
+		Gets count seeds for decks that won't deal the same cards as each
+		other or as a deck with seed, for simulations played in parallel.
+	"""
+	return [_mix(seed, i, _spawnStream) for i in xrange(count)]
+
+def _freshShoe(decks):
+	return bytearray(range(CardsPerDeck)) * max(1, decks)
+
+def GetShuffleSeed(seed, shuffles):
+	"""
+		Gets the seed a deck with seed shuffles with on a shuffle.
+	"""
+	return _mix(seed, shuffles, _shuffleStream)
+
+def _shuffle(cards, rng, seed, shuffles):
+	rng.seed(GetShuffleSeed(seed, shuffles))
+	cards = list(cards)
+	rng.shuffle(cards)
+	return bytearray(cards)
+
+def ReplayCodes(seed, shuffles, decks = 1):
+	"""
+		Gets the order a Deck with seed put its shoe in on a shuffle, as a
+		bytearray of card codes. Shuffles that start with every card back in
+		the shoe, like the ones between rounds, come out the same every time.
+	"""
+	return _shuffle(_freshShoe(decks), random.Random(), seed, shuffles)
+
+def Replay(seed, shuffles, decks = 1):
+	"""
+		Gets the order from ReplayCodes() as a list of Cards.
+	"""
+	return [_cards[code] for code in ReplayCodes(seed, shuffles, decks)]
 
 class Deck(object):
-	def __init__(self, decks = 1):
-		self.Cards = []
+	"""
+		A shoe of one or more decks, stored as a bytearray of card codes.
+		Codes are only looked up as Cards when they're dealt.
+
+		When dealing passes the cut card (Penetration of the way through the
+		shoe), NeedsShuffle() turns True so the game can shuffle between
+		rounds. Only cards that were Discard()ed go back into the shoe, so
+		cards still on the table are never shuffled back in.
+
+		Each deck shuffles with its own random stream from Seed, so the same
+		seed deals the same cards. See Replay().
+	"""
+	def __init__(self, decks = 1, penetration = 0.75, seed = None):
+		self.Decks = decks
+		self.Penetration = penetration
+		self.Seed = NewSeed() if seed == None else seed
+		self.Shuffles = 0
+		self._random = random.Random()
+		self._fresh = _freshShoe(decks)
+		self._cards = bytearray()
 		self._cardIndex = 0
-		self._buildDeck(decks)
+		self._discards = bytearray()
 		self.Shuffle()
-		
-	def _buildDeck(self, decks):
-		for suit in Suits:
-			for rank in Ranks:
-				self.Cards.append(Card(suit, rank))
-		
+
 	def Shuffle(self):
-		random.shuffle(self.Cards)
+		"""
+			Shuffles the discards back in with the cards that haven't been
+			dealt.
+		"""
+		cards = self._cards[self._cardIndex:] + self._discards
+
+		# When every card is back, start from a fresh shoe so the order only
+		# depends on the seed and the shuffle. When every card is on the
+		# table, start a fresh shoe anyway.
+		if len(cards) in (0, len(self._fresh)):
+			cards = self._fresh
+
+		self.Shuffles += 1
+		self._cards = _shuffle(cards, self._random, self.Seed, self.Shuffles)
+		self._cardIndex = 0
+		self._discards = bytearray()
+
+	def NeedsShuffle(self):
+		return self._cardIndex >= len(self._cards) * self.Penetration
+
+	def Discard(self, cards):
+		self._discards.extend(card.Code for card in cards)
+
+	def GetCodes(self, n = 1):
+		"""
+			Deals n card codes.
+		"""
+		if self._cardIndex + n > len(self._cards):
+			codes = self._cards[self._cardIndex:]
+			self._cardIndex = len(self._cards)
+			self.Shuffle()
+			return codes + self.GetCodes(n - len(codes))
+
+		codes = self._cards[self._cardIndex:self._cardIndex + n]
+		self._cardIndex += n
+		return codes
 
 	def GetCards(self, n = 1):
-		cards = []
-		
-		for i in xrange(n):
-			if self._cardIndex >= len(self.Cards):
-				self.Shuffle()
-				self._cardIndex = 0
-			
-			cards.append(self.Cards[self._cardIndex])
-			self._cardIndex += 1
-			
-		return cards
\ No newline at end of file
+		return [_cards[code] for code in self.GetCodes(n)]
+
+	def GetPosition(self):
+		"""
+			Gets which shuffle is being dealt and how far into it dealing is.
+		"""
+		return self.Shuffles, self._cardIndex
+
+	def GetState(self):
+		"""
+			Gets the seed, the shuffle, the shoe, how far into it dealing is
+			and the discards, for checkpoints.
+		"""
+		return self.Seed, self.Shuffles, self._cards, self._cardIndex, self._discards
+
+	def SetState(self, seed, shuffles, cards, cardIndex, discards):
+		self.Seed = seed
+		self.Shuffles = shuffles
+		self._cards = bytearray(cards)
+		self._cardIndex = cardIndex
+		self._discards = bytearray(discards)
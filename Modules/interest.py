@@ -0,0 +1,111 @@
+import math
+import time
+from array import array
+from loans import SecondsPerDay
+
+# NumPy isn't available everywhere (IronPython doesn't have it), so fall back
+# to plain Python when it's missing.
+try:
+	import numpy
+except ImportError:
+	numpy = None
+
+class LoanBatch(object):
+	"""
+		Packs a lot of loans into arrays so that their balances can be worked
+		out in one pass instead of one loan at a time.
+
+		rows is an iterable of (owner, current amount, interest, start) where
+		start is in seconds since the epoch.
+	"""
+	def __init__(self, rows):
+		owners = []
+		ownerIndexes = {}
+		indexes = array('l')
+		principals = array('d')
+		rates = array('d')
+		starts = array('d')
+
+		for owner, current, interest, start in rows:
+			index = ownerIndexes.get(owner)
+
+			if index == None:
+				index = ownerIndexes[owner] = len(owners)
+				owners.append(owner)
+
+			indexes.append(index)
+			principals.append(current)
+			rates.append(interest)
+			starts.append(start)
+
+		# Each owner appears once in Owners, and _owners maps each loan to
+		# its owner's position in Owners.
+		self.Owners = owners
+		self._owners = indexes
+		self._principals = principals
+		self._rates = rates
+		self._starts = starts
+
+		if numpy:
+			self._owners = numpy.array(indexes, dtype = numpy.intp)
+			self._principals = numpy.frombuffer(principals, dtype = numpy.float64)
+			self._rates = numpy.frombuffer(rates, dtype = numpy.float64)
+			self._starts = numpy.frombuffer(starts, dtype = numpy.float64)
+
+	def __len__(self):
+		return len(self._principals)
+
+	def Balances(self, when = None):
+		"""
+			Gets the balance of every loan at a time (now by default), in the
+			order the loans were given.
+		"""
+		if when == None:
+			when = time.time()
+
+		if numpy:
+			days = numpy.maximum(when - self._starts, 0) / SecondsPerDay
+			return self._principals * numpy.exp(self._rates * days)
+
+		exp = math.exp
+		return [
+			principal * exp(rate * max(when - start, 0) / SecondsPerDay)
+			for principal, rate, start in
+			zip(self._principals, self._rates, self._starts)
+		]
+
+	def Total(self, when = None):
+		"""
+			Gets the total of every loan at a time (now by default).
+		"""
+		if numpy:
+			return int(self.Balances(when).sum())
+
+		return int(math.fsum(self.Balances(when)))
+
+	def Project(self, days, now = None):
+		"""
+			Gets the total of every loan after each number of days.
+		"""
+		if now == None:
+			now = time.time()
+
+		return [self.Total(now + day * SecondsPerDay) for day in days]
+
+	def Totals(self, when = None):
+		"""
+			Gets a {owner: balance} dict of each owner's loans at a time.
+		"""
+		balances = self.Balances(when)
+
+		if numpy:
+			sums = numpy.bincount(
+				self._owners, weights = balances, minlength = len(self.Owners))
+			return dict(zip(self.Owners, sums.tolist()))
+
+		sums = [0] * len(self.Owners)
+
+		for owner, balance in zip(self._owners, balances):
+			sums[owner] += balance
+
+		return dict(zip(self.Owners, sums))
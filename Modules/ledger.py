@@ -0,0 +1,181 @@
+import sys
+import Queue
+from threading import Thread, Event, Lock, current_thread
+
+class Transaction(object):
+	"""
+		A function waiting to be run by a Ledger.
+	"""
+	def __init__(self, function, args):
+		self.Function = function
+		self.Args = args
+		self.Result = None
+		self._error = None
+		self._done = Event()
+		self._then = []
+		self._lock = Lock()
+
+	def Wait(self):
+		"""
+			Waits for the transaction to be applied and committed, and returns
+			what the function returned. Raises whatever the function raised.
+		"""
+		self._done.wait()
+
+		if self._error:
+			raise self._error[0], self._error[1], self._error[2]
+
+		return self.Result
+
+	def Then(self, callback):
+		"""
+			Calls callback(transaction) once the transaction is committed, so
+			that Wait() returns straight away. The callback runs on the writer
+			thread, or on this thread if the transaction is already done.
+		"""
+		with self._lock:
+			if not self._done.is_set():
+				self._then.append(callback)
+				return self
+
+		callback(self)
+		return self
+
+	def _finish(self):
+		with self._lock:
+			self._done.set()
+			then = self._then
+			self._then = []
+
+		for callback in then:
+			try:
+				callback(self)
+			except:
+				sys.excepthook(*sys.exc_info())
+
+# The ledger last opened under each name.
+_opened = {}
+_openedLock = Lock()
+
+def Open(name, commit = None):
+	"""
+		Starts a Ledger for name, and stops the one that was opened for it
+		before, once it has committed what was queued on it. A module opens
+		its ledger this way so that reloading it doesn't leave the old writer
+		thread running.
+	"""
+	with _openedLock:
+		old = _opened.get(name)
+		opened = _opened[name] = Ledger(commit, name = name)
+
+	if old:
+		old.Stop()
+
+	return opened
+
+class Ledger(object):
+	"""
+		Runs every change to some shared state on a single writer thread, in
+		the order they were submitted. Whatever is queued up while the writer
+		is busy is applied as one batch and committed once.
+	"""
+	def __init__(self, commit = None, batchSize = 256, name = "Ledger"):
+		self.Commit = commit
+		self.BatchSize = batchSize
+		self.Stopped = False
+		self._queue = Queue.Queue()
+		self._lock = Lock()
+		self._writing = Lock()
+		self._thread = Thread(target = self._run, name = name)
+		self._thread.daemon = True
+		self._thread.start()
+
+	def Stop(self):
+		"""
+			Stops the writer thread once it has committed everything already
+			queued. Anything submitted after that is applied and committed on
+			the submitting thread.
+		"""
+		with self._lock:
+			if not self.Stopped:
+				self.Stopped = True
+				self._queue.put(None)
+
+	def Post(self, function, *args):
+		"""
+			Queues a function to run on the writer thread and returns its
+			Transaction without waiting for it.
+		"""
+		transaction = Transaction(function, args)
+
+		# A transaction that submits another one can't wait for the writer,
+		# since it is the writer.
+		if current_thread() is self._thread:
+			self._apply(transaction)
+			transaction._finish()
+			return transaction
+
+		with self._lock:
+			if not self.Stopped:
+				self._queue.put(transaction)
+				return transaction
+
+		with self._writing:
+			self._apply(transaction)
+			self._commit([transaction])
+
+		transaction._finish()
+		return transaction
+
+	def Submit(self, function, *args):
+		"""
+			Runs a function on the writer thread, waits for it to be committed
+			and returns its result.
+		"""
+		return self.Post(function, *args).Wait()
+
+	def _apply(self, transaction):
+		try:
+			transaction.Result = transaction.Function(*transaction.Args)
+		except:
+			transaction._error = sys.exc_info()
+
+	def _commit(self, batch):
+		try:
+			if self.Commit:
+				self.Commit()
+		except:
+			error = sys.exc_info()
+
+			for transaction in batch:
+				if not transaction._error:
+					transaction._error = error
+
+	def _run(self):
+		stopped = False
+
+		while not stopped:
+			batch = [self._queue.get()]
+
+			while len(batch) < self.BatchSize:
+				try:
+					batch.append(self._queue.get_nowait())
+				except Queue.Empty:
+					break
+
+			# Nothing is queued after the stop.
+			if batch[-1] == None:
+				batch.pop()
+				stopped = True
+
+				if len(batch) == 0:
+					break
+
+			with self._writing:
+				for transaction in batch:
+					self._apply(transaction)
+
+				self._commit(batch)
+
+			for transaction in batch:
+				transaction._finish()
@@ -0,0 +1,200 @@
+import math
+import time
+
+SecondsPerDay = 24 * 60 * 60.
+
+# Interest is accrued from one timestamp per tick.
+TickLength = 1.0
+_now = [0.0]
+
+"""
+	Gets the current time in seconds. It only changes once per tick, so
+	everything that's computed during a tick uses the same time.
+"""
+def GetTime():
+	now = time.time()
+
+	if now - _now[0] >= TickLength:
+		_now[0] = now
+
+	return _now[0]
+
+
+class LoanType(object):
+	__slots__ = ('Amount', 'Interest', 'Fee')
+
+	def __init__(self, amount, interest, fee):
+		self.Amount = amount
+		self.Interest = interest
+		self.Fee = fee
+
+
+	def __getstate__(self):
+		return (self.Amount, self.Interest, self.Fee)
+
+
+	def __setstate__(self, state):
+		self.Amount, self.Interest, self.Fee = state
+
+
+LoanTypes = [LoanType(100, 0.10, 10), LoanType(500, 0.15, 50), LoanType(1000, 0.20, 100)]
+
+
+"""
+	Gets the loan type with these terms, making a new one if none of the
+	standard loan types match.
+"""
+def GetLoanType(amount, interest, fee):
+	for loanType in LoanTypes:
+		if (loanType.Amount, loanType.Interest, loanType.Fee) == \
+			(amount, interest, fee):
+			return loanType
+
+	return LoanType(amount, interest, fee)
+
+
+"""
+	Loans only store how much is left, when interest started (in seconds since
+	the epoch) and a reference to their loan type, since there can be a lot of
+	them.
+"""
+class Loan(object):
+	__slots__ = ('Type', '_currentAmount', 'InterestStart', 'Id')
+
+	def __init__(self, loanType = None):
+		self.Type = loanType
+		self._currentAmount = loanType.Amount if loanType else 0
+		self.InterestStart = time.time()
+		self.Id = None
+
+
+	@property
+	def Amount(self):
+		return self.Type.Amount
+
+
+	@property
+	def Interest(self):
+		return self.Type.Interest
+
+
+	@property
+	def Fee(self):
+		return self.Type.Fee
+
+
+	def __getstate__(self):
+		return (self.Type, self._currentAmount, self.InterestStart)
+
+
+	"""
+		Loads a pickled loan. Old loans were pickled as a dict with their
+		terms copied into them and a datetime for the interest start.
+	"""
+	def __setstate__(self, state):
+		self.Id = None
+
+		if isinstance(state, dict):
+			self.Type = GetLoanType(state['Amount'], state['Interest'], state['Fee'])
+			self._currentAmount = state['_currentAmount']
+			start = state['InterestStart']
+			self.InterestStart = time.mktime(start.timetuple()) + \
+				start.microsecond / 1e6
+		else:
+			self.Type, self._currentAmount, self.InterestStart = state
+
+
+	"""
+		Gets the amount of the loan + interest.
+	"""
+	def GetAmount(self):
+		# Divide the difference in seconds by the seconds in a day to get the
+		# time in fractional days.
+		interestTime = (time.time() - self.InterestStart) / SecondsPerDay
+
+		# Use the continuous interest formula to FUCK PEOPLE OVER EVEN MORE.
+		amount = self._currentAmount * math.e ** (self.Type.Interest * interestTime)
+		return int(amount)
+
+
+	"""
+		Pays off the loan and resets the amount.
+		Returns True if the loan was totally paid off, else False.
+	"""
+	def Payoff(self, amount):
+		difference = self.GetAmount() - amount
+
+		if difference <= 0:
+			self._currentAmount = 0
+			return True
+
+		# Reset the interest start time.
+		self.InterestStart = time.time()
+		self._currentAmount = difference
+
+
+class Debt(object):
+	"""
+		Keeps a running total of a chatter's loans. Loans with the same
+		interest rate are summed together, so accruing interest only takes one
+		exponent per rate instead of one per loan. The total is only accrued
+		when it's asked for, and at most once per tick.
+	"""
+	def __init__(self, loans):
+		self.Loans = loans
+		self._time = GetTime()
+		self._groups = {}
+
+		for interest in set(loan.Interest for loan in loans):
+			self._rebuild(interest)
+
+
+	"""
+		Recomputes the total of every loan with this interest rate at the
+		time of the last accrual.
+	"""
+	def _rebuild(self, interest):
+		total = 0
+		count = 0
+
+		for loan in self.Loans:
+			if loan.Interest == interest:
+				# The tick can be a little older than a brand new loan.
+				interestTime = max(0, self._time - loan.InterestStart) / SecondsPerDay
+				total += loan._currentAmount * math.e ** (interest * interestTime)
+				count += 1
+
+		if count > 0:
+			self._groups[interest] = total
+		elif interest in self._groups:
+			del self._groups[interest]
+
+
+	def _accrue(self):
+		now = GetTime()
+
+		if now == self._time:
+			return
+
+		interestTime = (now - self._time) / SecondsPerDay
+
+		for interest in self._groups:
+			self._groups[interest] *= math.e ** (interest * interestTime)
+
+		self._time = now
+
+
+	"""
+		Gets the amount of every loan + interest.
+	"""
+	def GetAmount(self):
+		self._accrue()
+		return int(sum(self._groups.itervalues()))
+
+
+	"""
+		Updates the total after a loan was added, paid off or removed.
+	"""
+	def Update(self, loan):
+		self._accrue()
+		self._rebuild(loan.Interest)
@@ -0,0 +1,129 @@
+class _Node(object):
+	__slots__ = ('Children', 'IDs')
+
+	def __init__(self):
+		self.Children = {}
+		self.IDs = set()
+
+def _fold(name):
+	return name.lower()
+
+class NameIndex(object):
+	"""
+		Finds chatters by their name. Names are case-folded and put into a
+		prefix trie, and every suffix of every name is put into a second trie
+		so that substring searches are a walk down the trie instead of a scan
+		over every chatter.
+	"""
+	def __init__(self):
+		self.Names = {}
+		self._exact = {}
+		self._prefixes = _Node()
+		self._substrings = _Node()
+
+	def __len__(self):
+		return len(self.Names)
+
+	def __contains__(self, steamID):
+		return steamID in self.Names
+
+	def Add(self, steamID, name):
+		"""
+			Adds a chatter or updates their name.
+		"""
+		folded = _fold(name)
+
+		if self.Names.get(steamID) == folded:
+			return
+
+		self.Remove(steamID)
+		self.Names[steamID] = folded
+		self._exact.setdefault(folded, set()).add(steamID)
+		self._insert(self._prefixes, folded, steamID)
+
+		for i in xrange(1, len(folded)):
+			self._insert(self._substrings, folded[i:], steamID)
+
+	def Remove(self, steamID):
+		folded = self.Names.pop(steamID, None)
+
+		if folded == None:
+			return
+
+		exact = self._exact[folded]
+		exact.discard(steamID)
+
+		if len(exact) == 0:
+			del self._exact[folded]
+
+		self._delete(self._prefixes, folded, steamID)
+
+		for i in xrange(1, len(folded)):
+			self._delete(self._substrings, folded[i:], steamID)
+
+	def Find(self, query):
+		"""
+			Returns a list of chatters matching the query. Exact names beat
+			names starting with the query, which beat names containing it.
+			More than one chatter in the list means the query is ambiguous.
+		"""
+		folded = _fold(query)
+
+		if len(folded) == 0:
+			return []
+
+		if folded in self._exact:
+			return list(self._exact[folded])
+
+		node = self._walk(self._prefixes, folded)
+
+		if node != None and len(node.IDs) > 0:
+			return list(node.IDs)
+
+		node = self._walk(self._substrings, folded)
+
+		if node != None:
+			return list(node.IDs)
+
+		return []
+
+	def _walk(self, root, key):
+		node = root
+
+		for char in key:
+			node = node.Children.get(char)
+
+			if node == None:
+				return None
+
+		return node
+
+	def _insert(self, root, key, steamID):
+		node = root
+
+		for char in key:
+			child = node.Children.get(char)
+
+			if child == None:
+				child = node.Children[char] = _Node()
+
+			child.IDs.add(steamID)
+			node = child
+
+	def _delete(self, root, key, steamID):
+		node = root
+
+		for char in key:
+			child = node.Children.get(char)
+
+			if child == None:
+				return
+
+			child.IDs.discard(steamID)
+
+			# Nothing below an empty node can hold this chatter either.
+			if len(child.IDs) == 0:
+				del node.Children[char]
+				return
+
+			node = child
@@ -0,0 +1,47 @@
+import os
+
+def Sync(file):
+	"""
+		Makes sure what's been written to a file is on the disk.
+	"""
+	file.flush()
+
+	# IronPython might not have fsync.
+	if hasattr(os, 'fsync'):
+		os.fsync(file.fileno())
+
+def Replace(path, write):
+	"""
+		Replaces a file with whatever write(file) writes. It's written to
+		path.tmp first, so a crash never leaves the file half written.
+	"""
+	temp = path + '.tmp'
+
+	with open(temp, 'wb') as file:
+		write(file)
+		Sync(file)
+
+	# Windows can't rename over a file.
+	if os.path.exists(path):
+		os.remove(path)
+
+	os.rename(temp, path)
+
+def Load(path, read, errors = ()):
+	"""
+		Returns read(file) for a file written with Replace(), or None if it
+		can't be read. errors are the exceptions read raises for a bad file.
+	"""
+	temp = path + '.tmp'
+
+	# The new file is complete once the old one is removed, so finish a
+	# Replace() that was cut off before the rename. Anything appended to the
+	# file then goes to the right place.
+	if not os.path.exists(path) and os.path.exists(temp):
+		os.rename(temp, path)
+
+	try:
+		with open(path, 'rb') as file:
+			return read(file)
+	except (IOError,) + tuple(errors):
+		return None
@@ -0,0 +1,261 @@
+import time
+import heapq
+import traceback
+from itertools import count
+from threading import Thread, Condition, Lock
+
+# Held while a call is checked and claimed to run, and while anything is
+# cancelled, so a cancel either lands before the check or after the call has
+# started. It's never held while a callback runs.
+_claiming = Lock()
+
+class CancelToken(object):
+	"""
+		Cancels every call scheduled with it at once. A call is checked
+		against its token right before it runs, so once Cancel() returns none
+		of them will start, though one that had already started may still be
+		running. A token made with a parent is cancelled along with it.
+	"""
+	__slots__ = ('_cancelled', '_parent')
+
+	def __init__(self, parent = None):
+		self._cancelled = False
+		self._parent = parent
+
+	@property
+	def Cancelled(self):
+		return self._cancelled or (self._parent != None and self._parent.Cancelled)
+
+	def Cancel(self):
+		with _claiming:
+			self._cancelled = True
+
+class Call(object):
+	"""
+		A callback waiting to be run by a Scheduler. Cancel() only marks it,
+		and the scheduler drops it when it comes up.
+	"""
+	__slots__ = ('When', 'Interval', 'Callback', 'Token', 'Cancelled', '_queued',
+		'_scheduler')
+
+	def __init__(self, scheduler, when, interval, callback, token = None):
+		self.When = when
+		self.Interval = interval
+		self.Callback = callback
+		self.Token = token
+		self.Cancelled = False
+		self._queued = False
+		self._scheduler = scheduler
+
+	def Cancel(self):
+		self._scheduler._cancel(self)
+
+	def Remaining(self):
+		return max(0, self.When - time.time())
+
+class Scheduler(object):
+	"""
+		Runs delayed and repeating callbacks on one thread, kept in a heap by
+		when they're due. Callbacks are run one at a time, so they should be
+		quick. Anything slow should be handed to its own thread.
+	"""
+	def __init__(self):
+		self._heap = []
+		self._order = count()
+		self._cancelled = 0
+		self._condition = Condition()
+		self._thread = None
+
+	def __len__(self):
+		return len(self._heap) - self._cancelled
+
+	def Schedule(self, delay, callback, token = None):
+		"""
+			Runs callback once after delay seconds, unless token is cancelled
+			first. Returns a Call that can be cancelled.
+		"""
+		return self._add(time.time() + delay, None, callback, token)
+
+	def Every(self, interval, callback, delay = None, token = None):
+		"""
+			Runs callback every interval seconds, starting after delay seconds
+			(interval by default), until the Call or token is cancelled.
+		"""
+		return self._add(time.time() + (interval if delay == None else delay),
+			interval, callback, token)
+
+	def _add(self, when, interval, callback, token):
+		call = Call(self, when, interval, callback, token)
+
+		with self._condition:
+			self._push(call)
+
+			if self._thread == None:
+				self._thread = Thread(target = self._run, name = "Scheduler")
+				self._thread.daemon = True
+				self._thread.start()
+
+			self._condition.notify()
+
+		return call
+
+	def _push(self, call):
+		heapq.heappush(self._heap, (call.When, next(self._order), call))
+		call._queued = True
+
+	def _pop(self):
+		call = heapq.heappop(self._heap)[2]
+		call._queued = False
+		return call
+
+	def _cancel(self, call):
+		with self._condition:
+			if call.Cancelled:
+				return
+
+			with _claiming:
+				call.Cancelled = True
+
+			if not call._queued:
+				return
+
+			self._cancelled += 1
+
+			# Cancelled calls are left in the heap until they come up, so clear
+			# them out if they're most of it.
+			if self._cancelled > 64 and self._cancelled * 2 > len(self._heap):
+				for entry in self._heap:
+					if entry[2].Cancelled:
+						entry[2]._queued = False
+
+				self._heap = [entry for entry in self._heap if not entry[2].Cancelled]
+				heapq.heapify(self._heap)
+				self._cancelled = 0
+
+	def _next(self):
+		"""
+			Waits for the next call that's due and takes it off the heap.
+		"""
+		with self._condition:
+			while True:
+				if not self._heap:
+					self._condition.wait()
+					continue
+
+				when, order, call = self._heap[0]
+
+				if call.Cancelled:
+					self._pop()
+					self._cancelled -= 1
+					continue
+
+				if call.Token != None and call.Token.Cancelled:
+					self._pop()
+					call.Cancelled = True
+					continue
+
+				wait = when - time.time()
+
+				if wait > 0:
+					self._condition.wait(wait)
+					continue
+
+				self._pop()
+
+				if call.Interval != None:
+					call.When += call.Interval
+					self._push(call)
+
+				return call
+
+	def _run(self):
+		while True:
+			call = self._next()
+
+			# The call or its token might have been cancelled while it was
+			# taken off.
+			with _claiming:
+				if call.Cancelled or (call.Token != None and call.Token.Cancelled):
+					continue
+
+			try:
+				call.Callback()
+			except Exception:
+				traceback.print_exc()
+
+class _LoopCall(object):
+	__slots__ = ('Token', 'Cancelled', '_handle')
+
+	def __init__(self, token):
+		self.Token = token
+		self.Cancelled = False
+		self._handle = None
+
+	def Cancel(self):
+		self.Cancelled = True
+
+		if self._handle != None:
+			self._handle.cancel()
+
+	def _live(self):
+		return not self.Cancelled and not (self.Token != None and self.Token.Cancelled)
+
+class LoopScheduler(object):
+	"""
+		Schedules calls with an event loop's call_later(), like an asyncio
+		loop's, for a host that runs one instead of threads. Calls run on the
+		loop, so it should only be used from the loop's thread.
+	"""
+	def __init__(self, loop):
+		self._loop = loop
+
+	def Schedule(self, delay, callback, token = None):
+		call = _LoopCall(token)
+
+		def run():
+			if call._live():
+				callback()
+
+		call._handle = self._loop.call_later(delay, run)
+		return call
+
+	def Every(self, interval, callback, delay = None, token = None):
+		call = _LoopCall(token)
+
+		def run():
+			if call._live():
+				call._handle = self._loop.call_later(interval, run)
+				callback()
+
+		call._handle = self._loop.call_later(interval if delay == None else delay, run)
+		return call
+
+_scheduler = Scheduler()
+
+def GetScheduler():
+	"""
+		Gets the scheduler every module shares.
+	"""
+	return _scheduler
+
+def Schedule(delay, callback, token = None):
+	return _scheduler.Schedule(delay, callback, token)
+
+def Every(interval, callback, delay = None, token = None):
+	return _scheduler.Every(interval, callback, delay, token)
+
+_owners = {}
+_ownersLock = Lock()
+
+def TakeOver(name, token):
+	"""
+		Registers token under name and cancels the token that was registered
+		under it before. A module that's reloaded keeps running whatever it
+		scheduled, so the new one takes over from it with this.
+	"""
+	with _ownersLock:
+		old = _owners.get(name)
+		_owners[name] = token
+
+	if old != None and old is not token:
+		old.Cancel()
@@ -0,0 +1,98 @@
+import re
+import math
+from itertools import count
+from blocklist import IndexedBlockList
+
+_word = re.compile(r'\w+', re.UNICODE)
+
+def _tokenize(text):
+	return set(_word.findall(text.lower()))
+
+class TodoIndex(object):
+	"""
+		An inverted index from the words in a list's items to the items that
+		have them. Items get an ID that doesn't change when the list is edited,
+		and the index keeps the IDs in list order next to the list, so an edit
+		only touches the words of the items it adds or removes.
+
+		Positions aren't stored. A search looks up where the items it shows
+		are in the IDs, so an edit never has to count the items after it.
+	"""
+	def __init__(self):
+		self._ids = IndexedBlockList()
+		self._next = count()
+		self._words = {}
+		self._postings = {}
+
+	def __len__(self):
+		return len(self._ids)
+
+	def Build(self, items):
+		self.__init__()
+		self.Insert(0, items)
+
+	def Insert(self, index, items):
+		ids = []
+
+		for item in items:
+			id = next(self._next)
+			words = _tokenize(item)
+			self._words[id] = words
+
+			for word in words:
+				self._postings.setdefault(word, set()).add(id)
+
+			ids.append(id)
+
+		self._ids.Insert(index, ids)
+
+	def Remove(self, index):
+		id = self._ids.Pop(index)
+
+		for word in self._words.pop(id):
+			ids = self._postings[word]
+			ids.discard(id)
+
+			if len(ids) == 0:
+				del self._postings[word]
+
+	def Search(self, query, limit = None):
+		"""
+			Returns a list of (position, score) for the items with any of the
+			words in query. Items with more of the words come first, then items
+			with rarer words, then earlier items.
+		"""
+		scores = {}
+		matched = {}
+
+		for word in _tokenize(query):
+			ids = self._postings.get(word)
+
+			if ids == None:
+				continue
+
+			weight = math.log(1.0 + float(len(self._ids)) / len(ids))
+
+			for id in ids:
+				matched[id] = matched.get(id, 0) + 1
+				scores[id] = scores.get(id, 0.0) + weight
+
+		if len(matched) == 0:
+			return []
+
+		rank = lambda id: (-matched[id], -scores[id])
+		ids = sorted(matched, key = rank)
+
+		# Only items that rank as well as the last one shown need their
+		# positions, to break ties.
+		if limit != None and len(ids) > limit:
+			last = rank(ids[limit - 1])
+			ids = [id for id in ids if rank(id) <= last]
+
+		positions = self._ids.Indexes(ids)
+		found = sorted(rank(id) + (positions[id],) for id in ids)
+
+		if limit != None:
+			found = found[:limit]
+
+		return [(position, -score) for matches, score, position in found]
\ No newline at end of file
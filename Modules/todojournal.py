@@ -0,0 +1,258 @@
+import os
+import time
+import struct
+import cPickle as pickle
+import safefile
+from threading import Thread, Condition, Lock
+from blocklist import BlockList
+
+# Every change is a length followed by its record, so a change that was only
+# partly written can be told apart from a whole one.
+_length = struct.Struct('<I')
+_change = struct.Struct('<BIH')
+_itemLength = struct.Struct('<H')
+_insert = 0
+_remove = 1
+
+def _encodeItem(item):
+	if isinstance(item, unicode):
+		item = item.encode('utf-8')
+
+	return _itemLength.pack(len(item)) + item
+
+def _encode(op, index, items = ()):
+	data = _change.pack(op, index, len(items)) + ''.join(_encodeItem(item) for item in items)
+	return _length.pack(len(data)) + data
+
+def _apply(items, data):
+	op, index, count = _change.unpack_from(data)
+	offset = _change.size
+
+	if op == _remove:
+		items.Pop(index)
+		return
+
+	new = []
+
+	for i in xrange(count):
+		length, = _itemLength.unpack_from(data, offset)
+		offset += _itemLength.size
+		new.append(data[offset:offset + length].decode('utf-8'))
+		offset += length
+
+	items.Insert(index, new)
+
+class Journal(object):
+	"""
+		Keeps a list of items in a snapshot file plus journals of every change
+		made since, so a change only appends a few bytes. Journals are synced
+		to disk every SyncDelay seconds at most, and once they pass
+		CompactSize bytes they're folded into a new snapshot in the
+		background. Items is a BlockList, so changes anywhere in a long list
+		are quick.
+
+		Snapshots and journals are numbered. Snapshot N holds everything up to
+		journal N, so loading reads the snapshot and replays journal N and any
+		after it, and a crash partway through compacting loses nothing.
+	"""
+	def __init__(self, path, compactSize = 256 * 1024, syncDelay = 1.0):
+		self.Path = path
+		self.CompactSize = compactSize
+		self.SyncDelay = syncDelay
+		self.Items = BlockList()
+		self._generation = 0
+		self._file = None
+		self._size = 0
+		self._written = 0
+		self._synced = 0
+		self._compact = False
+		self._hurry = False
+		self._condition = Condition()
+		self._thread = None
+		self._loaded = False
+
+	def _journalPath(self, generation):
+		return "{}.{}.journal".format(self.Path, generation)
+
+	def Load(self):
+		"""
+			Reads the snapshot and replays the journals after it, the first
+			time it's called. Returns Items.
+		"""
+		with self._condition:
+			if not self._loaded:
+				self._load()
+				self._loaded = True
+
+		return self.Items
+
+	def _load(self):
+		snapshot = safefile.Load(self.Path, pickle.load,
+			(EOFError, pickle.UnpicklingError)) or []
+
+		# Snapshots from before there were journals are just the list.
+		if isinstance(snapshot, list):
+			generation, items = 0, snapshot
+		else:
+			generation, items = snapshot
+
+		items = BlockList(items)
+
+		# Journals from before the snapshot were folded into it.
+		old = generation - 1
+
+		while os.path.exists(self._journalPath(old)):
+			os.remove(self._journalPath(old))
+			old -= 1
+
+		size = 0
+
+		while True:
+			size = self._replay(self._journalPath(generation), items)
+
+			if not os.path.exists(self._journalPath(generation + 1)):
+				break
+
+			generation += 1
+
+		self.Items.Insert(0, items)
+		self._generation = generation
+		self._file = open(self._journalPath(generation), 'ab')
+		self._size = size
+		self._thread = Thread(target = self._run, name = "TodoJournal")
+		self._thread.daemon = True
+		self._thread.start()
+
+	def _replay(self, path, items):
+		"""
+			Applies every change in a journal to items, cuts off a change that
+			was only partly written and returns the journal's size.
+		"""
+		try:
+			with open(path, 'rb') as file:
+				data = file.read()
+		except IOError:
+			return 0
+
+		offset = 0
+
+		while offset + _length.size <= len(data):
+			length, = _length.unpack_from(data, offset)
+
+			if offset + _length.size + length > len(data):
+				break
+
+			_apply(items, data[offset + _length.size:offset + _length.size + length])
+			offset += _length.size + length
+
+		if offset < len(data):
+			with open(path, 'r+b') as file:
+				file.truncate(offset)
+
+		return offset
+
+	def Insert(self, index, items):
+		with self._condition:
+			self.Items.Insert(index, items)
+			self._append(_encode(_insert, index, items))
+
+	def Append(self, items):
+		with self._condition:
+			self.Insert(len(self.Items), items)
+
+	def Remove(self, index):
+		with self._condition:
+			self.Items.Pop(index)
+			self._append(_encode(_remove, index))
+
+	def _append(self, data):
+		self._file.write(data)
+		self._file.flush()
+		self._size += len(data)
+		self._written += 1
+
+		if self._size >= self.CompactSize:
+			self._compact = True
+
+		self._condition.notify_all()
+
+	def Compact(self):
+		"""
+			Folds the journal into a new snapshot in the background.
+		"""
+		with self._condition:
+			self._compact = True
+			self._condition.notify_all()
+
+	def Flush(self):
+		"""
+			Waits for every change so far to be synced to disk.
+		"""
+		with self._condition:
+			written = self._written
+			self._hurry = True
+			self._condition.notify_all()
+
+			while self._synced < written:
+				self._condition.wait()
+
+	def _run(self):
+		while True:
+			with self._condition:
+				while self._synced == self._written and not self._compact:
+					self._condition.wait()
+
+				# Wait a moment so changes made close together are synced at
+				# once, unless someone's waiting for them.
+				deadline = time.time() + self.SyncDelay
+
+				while not (self._compact or self._hurry) and time.time() < deadline:
+					self._condition.wait(deadline - time.time())
+
+				written = self._written
+				file = self._file
+				compact = self._compact
+				self._compact = False
+				self._hurry = False
+
+				if compact:
+					# Changes from here on go to the next journal, and the
+					# snapshot is taken from this exact point.
+					self._generation += 1
+					generation = self._generation
+					self._file = open(self._journalPath(generation), 'ab')
+					self._size = 0
+					items = list(self.Items)
+
+			try:
+				safefile.Sync(file)
+
+				if compact:
+					file.close()
+					self._snapshot(generation, items)
+			except (IOError, OSError):
+				pass
+
+			with self._condition:
+				self._synced = max(self._synced, written)
+				self._condition.notify_all()
+
+	def _snapshot(self, generation, items):
+		safefile.Replace(self.Path, lambda file:
+			pickle.dump((generation, items), file, pickle.HIGHEST_PROTOCOL))
+		os.remove(self._journalPath(generation - 1))
+
+_journals = {}
+_journalsLock = Lock()
+
+def GetJournal(path):
+	"""
+		Gets the Journal for a snapshot file, shared by everyone who changes
+		it, so reloading a module doesn't start another writer for the same
+		files.
+	"""
+	with _journalsLock:
+		if not path in _journals:
+			_journals[path] = Journal(path)
+
+		return _journals[path]
@@ -0,0 +1,147 @@
+"""
+	Runs SteamNerd's Python modules without SteamNerd, so they can be tested.
+	A Host gives each module it loads its own stand-ins for the globals
+	SteamNerd sets up (Module, var, SteamNerd and Say), and SteamKit2 is
+	stood in for when it can't be imported.
+
+	Run the tests from the repo's root with:
+		python -m unittest discover -s Tests
+"""
+import os
+import sys
+import types
+import shutil
+import tempfile
+
+# IronPython's strings are unicode, and the modules format cards' suits into
+# plain strings, so CPython has to encode them as UTF-8 instead of ASCII.
+reload(sys)
+sys.setdefaultencoding('utf-8')
+
+ModulesPath = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Modules')
+sys.path.append(ModulesPath)
+
+class SteamID(object):
+	def __init__(self, id):
+		self.ID = long(id)
+
+	def ConvertToUInt64(self):
+		return self.ID
+
+	def __eq__(self, other):
+		return isinstance(other, SteamID) and other.ID == self.ID
+
+	def __ne__(self, other):
+		return not self == other
+
+	def __hash__(self):
+		return hash(self.ID)
+
+	def __repr__(self):
+		return "SteamID({})".format(self.ID)
+
+try:
+	import SteamKit2
+except ImportError:
+	SteamKit2 = types.ModuleType('SteamKit2')
+	SteamKit2.SteamID = SteamID
+	sys.modules['SteamKit2'] = SteamKit2
+
+class Command(object):
+	def __init__(self, match, description, callback):
+		self.Match = match if isinstance(match, tuple) else (match,)
+		self.Description = description
+		self.Callback = callback
+
+class HostModule(object):
+	"""
+		Stands in for SteamNerd's Module while a module is loaded.
+	"""
+	def __init__(self, host, chatroom):
+		self.Name = None
+		self.Description = None
+		self.Global = False
+		self.Chatroom = chatroom
+		self.Commands = []
+		self._host = host
+
+	def AddCommand(self, match, description, callback):
+		self.Commands.append(Command(match, description, callback))
+
+	def GetModule(self, name):
+		return self._host.GetModule(name, self.Chatroom)
+
+class Chatroom(object):
+	def __init__(self):
+		self.Chatters = []
+
+class HostSteamNerd(object):
+	"""
+		Stands in for SteamNerd. Chatters are named by Names, or "Chatter N"
+		if they aren't in it.
+	"""
+	CommandChar = '.'
+
+	def __init__(self):
+		self.Names = {}
+		self.Chatrooms = {}
+
+	def GetName(self, steamID):
+		return self.Names.get(steamID, "Chatter {}".format(steamID.ConvertToUInt64()))
+
+class Callback(object):
+	"""
+		A chat message or chat leave callback.
+	"""
+	def __init__(self, chatter, chatroom = None):
+		self.ChatterID = chatter
+		self.ChatRoomID = chatroom
+
+class Host(object):
+	"""
+		Loads modules into a temporary APPDATA folder, which Close() removes.
+		Everything the modules say is added to Said.
+	"""
+	def __init__(self):
+		self.AppData = tempfile.mkdtemp()
+		os.makedirs(os.path.join(self.AppData, "SteamNerd"))
+		os.environ['APPDATA'] = self.AppData
+		self.SteamNerd = HostSteamNerd()
+		self.Said = []
+		self._modules = {}
+
+	def Load(self, fileName, chatroom = None):
+		"""
+			Loads a module the way SteamNerd does and returns it. A module that
+			isn't Global is loaded into a chatroom.
+		"""
+		module = types.ModuleType(os.path.splitext(fileName)[0])
+		hostModule = HostModule(self, chatroom)
+
+		class var:
+			pass
+
+		module.__dict__.update({
+			'Module': hostModule,
+			'var': var,
+			'SteamNerd': self.SteamNerd,
+			'Say': lambda message, receiver = None: self.Said.append(message),
+		})
+
+		execfile(os.path.join(ModulesPath, fileName), module.__dict__)
+
+		if chatroom != None:
+			self.SteamNerd.Chatrooms.setdefault(chatroom, Chatroom())
+
+		self._modules[hostModule.Name, None if hostModule.Global else chatroom] = module
+		return module
+
+	def Start(self, module):
+		if hasattr(module, 'Start'):
+			module.Start()
+
+	def GetModule(self, name, chatroom = None):
+		return self._modules.get((name, None)) or self._modules.get((name, chatroom))
+
+	def Close(self):
+		shutil.rmtree(self.AppData, True)
@@ -0,0 +1,63 @@
+import unittest
+
+import modulehost
+from modulehost import SteamID, Callback
+
+class RankingTest(unittest.TestCase):
+	def setUp(self):
+		self.host = modulehost.Host()
+		self.room = SteamID(100)
+		self.host.SteamNerd.Names.update({SteamID(1): "Alice", SteamID(2): "Bob",
+			SteamID(3): "Carol"})
+		self.bank = self.host.Load('Bank.py', self.room)
+		self.host.Start(self.bank)
+
+		for chatter, amount in ((1, 0), (2, 50), (3, -20)):
+			self.bank.GiveMoney(SteamID(chatter), amount)
+
+	def tearDown(self):
+		self.bank.var.Ledger.Stop()
+		self.host.Close()
+
+	def Leaderboard(self, chatter = 1):
+		self.bank.Leaderboard(Callback(SteamID(chatter), self.room), ['leaderboard'])
+		return self.host.Said[-1].split('\n')
+
+	def Debtors(self, chatter = 1):
+		self.bank.ViewDebtors(Callback(SteamID(chatter), self.room), ['debtors'])
+		return self.host.Said[-1].split('\n')
+
+	def Names(self, lines):
+		return [line.split()[1] for line in lines[1:-1]]
+
+	def testLeaderboardFollowsChanges(self):
+		lines = self.Leaderboard()
+		self.assertEqual(self.Names(lines), ["Bob", "Alice", "Carol"])
+		self.assertEqual(lines[-1], "You are #2 of 3.")
+
+		# The ranking is kept up to date once it's built.
+		self.bank.GiveMoney(SteamID(3), 100)
+		self.bank.var.Ledger.Submit(self.bank._bankrupt, SteamID(2))
+		lines = self.Leaderboard(2)
+		self.assertEqual(self.Names(lines), ["Carol", "Alice", "Bob"])
+		self.assertEqual(lines[-1], "You are #3 of 3.")
+
+	def testDebtors(self):
+		self.assertEqual(self.Debtors(), ["Nobody is in debt!"])
+
+		loanTypes = self.bank.var.LoanTypes
+		self.bank.var.Ledger.Submit(self.bank._buyLoan, SteamID(2), loanTypes[1])
+		self.bank.var.Ledger.Submit(self.bank._buyLoan, SteamID(1), loanTypes[0])
+		lines = self.Debtors()
+		self.assertEqual(self.Names(lines), ["Bob", "Alice"])
+		self.assertEqual(lines[-1], "You are #2 of 2.")
+
+		# Paying off a loan takes the chatter off the ranking.
+		loan = self.bank.GetLoans(SteamID(1))[0]
+		self.bank.var.Ledger.Submit(self.bank._payback, SteamID(1), loan, loan.GetAmount())
+		lines = self.Debtors()
+		self.assertEqual(self.Names(lines), ["Bob"])
+		self.assertFalse(lines[-1].startswith("You are"))
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,177 @@
+import os
+import shutil
+import tempfile
+import unittest
+import cPickle as pickle
+
+import modulehost
+import bankstore
+from modulehost import SteamID
+from loans import Loan, LoanTypes
+
+def WritePickles(moneyPath, loanPath):
+	"""
+		Writes Money.p and Loans.p the way the Bank does, with two chatters,
+		one of them with a loan.
+	"""
+	loan = Loan(LoanTypes[1])
+	loan._currentAmount = 420
+	loan.InterestStart = 1500000000.123456
+
+	with open(moneyPath, 'wb') as file:
+		pickle.dump({SteamID(1): 200, SteamID(2): -50}, file)
+
+	with open(loanPath, 'wb') as file:
+		pickle.dump({SteamID(2): [loan]}, file)
+
+class ExportTest(unittest.TestCase):
+	def setUp(self):
+		self.folder = tempfile.mkdtemp()
+		self.moneyPath = os.path.join(self.folder, "Money.p")
+		self.loanPath = os.path.join(self.folder, "Loans.p")
+		WritePickles(self.moneyPath, self.loanPath)
+
+	def tearDown(self):
+		shutil.rmtree(self.folder, True)
+
+	def Accounts(self, store):
+		return list(store.IterAccounts())
+
+	def testRoundTripsThePickleFiles(self):
+		store = bankstore.PickleStore(self.moneyPath, self.loanPath)
+		accounts = self.Accounts(store)
+		self.assertEqual(accounts, [
+			(1, 200, []),
+			(2, -50, [(500, 420, 0.15, 1500000000.123456, 50)]),
+		])
+
+		for name in ("accounts.csv", "accounts.jsonl"):
+			path = os.path.join(self.folder, name)
+			self.assertEqual(bankstore.Export(store, path), 2)
+
+			moneyPath = os.path.join(self.folder, name + ".Money.p")
+			loanPath = os.path.join(self.folder, name + ".Loans.p")
+			imported = bankstore.PickleStore(moneyPath, loanPath)
+			self.assertEqual(bankstore.Import(imported, path), 2)
+
+			# The float columns come back exactly, and the files are keyed by
+			# SteamID like the Bank's.
+			self.assertEqual(self.Accounts(bankstore.PickleStore(moneyPath, loanPath)), accounts)
+
+			with open(moneyPath, 'rb') as file:
+				self.assertEqual(pickle.load(file), {SteamID(1): 200, SteamID(2): -50})
+
+	def testImportReplacesAccounts(self):
+		path = os.path.join(self.folder, "accounts.jsonl")
+
+		with open(path, 'wb') as file:
+			file.write('{"steamid": 2, "money": 75, "loans": []}\n')
+			file.write('{"steamid": 3, "money": 10, "loans": []}\n')
+
+		store = bankstore.PickleStore(self.moneyPath, self.loanPath)
+		bankstore.Import(store, path)
+
+		store = bankstore.PickleStore(self.moneyPath, self.loanPath)
+		self.assertEqual(self.Accounts(store), [(1, 200, []), (2, 75, []), (3, 10, [])])
+
+class SQLiteStoreTest(unittest.TestCase):
+	def setUp(self):
+		self.folder = tempfile.mkdtemp()
+		self.path = os.path.join(self.folder, "Bank.db")
+		self.store = bankstore.SQLiteStore(self.path)
+
+	def tearDown(self):
+		self.store.Close()
+		shutil.rmtree(self.folder, True)
+
+	def Reopen(self):
+		"""
+			Opens the database again, which only sees what was committed.
+		"""
+		store = bankstore.SQLiteStore(self.path)
+		self.addCleanup(store.Close)
+		return store
+
+	def testMigratesThePickleFiles(self):
+		moneyPath = os.path.join(self.folder, "Money.p")
+		loanPath = os.path.join(self.folder, "Loans.p")
+		WritePickles(moneyPath, loanPath)
+
+		self.assertTrue(self.store.IsEmpty())
+		self.assertEqual(self.store.Migrate(moneyPath, loanPath, bankstore.LoanToRow), 2)
+
+		store = self.Reopen()
+		self.assertFalse(store.IsEmpty())
+		self.assertEqual(store.GetAccount(SteamID(1)), (200, []))
+
+		money, loans = store.GetAccount(SteamID(2))
+		self.assertEqual(money, -50)
+		self.assertEqual([loan[1:] for loan in loans],
+			[(500, 420, 0.15, 1500000000.123456, 50)])
+
+	def testMigrationNeedsMoneyFile(self):
+		self.assertEqual(self.store.Migrate(os.path.join(self.folder, "Money.p"),
+			os.path.join(self.folder, "Loans.p"), bankstore.LoanToRow), 0)
+		self.assertTrue(self.store.IsEmpty())
+
+	def testWritesOneRowAtATime(self):
+		for key in xrange(1, 101):
+			self.store.SetMoney(SteamID(key), 200)
+
+		self.store.Commit()
+		connection = self.store._connection
+		changes = connection.total_changes
+
+		self.store.SetMoney(SteamID(5), 75)
+		loanID = self.store.AddLoan(SteamID(5), 100, 100, 0.1, 1000.5, 10)
+		self.store.UpdateLoan(loanID, 60, 2000.25)
+		self.assertEqual(connection.total_changes - changes, 3)
+
+		# Nothing is saved until it's committed.
+		self.assertEqual(self.Reopen().GetAccount(SteamID(5)), (200, []))
+		self.store.Commit()
+		self.assertEqual(self.Reopen().GetAccount(SteamID(5)),
+			(75, [(loanID, 100, 60, 0.1, 2000.25, 10)]))
+
+		self.store.RemoveLoan(loanID)
+		self.store.Commit()
+		self.assertEqual(self.Reopen().GetAccount(SteamID(5)), (75, []))
+		self.assertEqual(self.Reopen().GetAccount(SteamID(500)), None)
+
+class BankDatabaseTest(unittest.TestCase):
+	def setUp(self):
+		self.host = modulehost.Host()
+		self.bank = self.host.Load('Bank.py', SteamID(100))
+		self.bank.var.UseDatabase = True
+		WritePickles(self.bank.var.MoneyPath, self.bank.var.LoanPath)
+		self.host.Start(self.bank)
+
+	def tearDown(self):
+		self.bank.var.Ledger.Stop()
+		self.bank.var.Store.Close()
+		self.host.Close()
+
+	def testLoadsAccountsWhenTheyreNeeded(self):
+		# Starting migrates the pickle files, but doesn't load any accounts.
+		self.assertEqual(self.bank.var.PlayerMoney, {})
+
+		self.assertEqual(self.bank.GetMoney(SteamID(2)), -50)
+		self.assertEqual(self.bank.var.PlayerMoney.keys(), [SteamID(2)])
+		loans = self.bank.GetLoans(SteamID(2))
+		self.assertEqual([bankstore.LoanToRow(loan) for loan in loans],
+			[(500, 420, 0.15, 1500000000.123456, 50)])
+		self.assertNotEqual(loans[0].Id, None)
+
+		# New chatters get an account.
+		self.assertEqual(self.bank.GetMoney(SteamID(3)), 200)
+
+	def testSavesChangesToTheDatabase(self):
+		self.bank.GiveMoney(SteamID(1), 25)
+		self.bank.var.Ledger.Submit(lambda: None)
+
+		store = bankstore.SQLiteStore(self.bank.var.DatabasePath)
+		self.addCleanup(store.Close)
+		self.assertEqual(store.GetAccount(SteamID(1)), (225, []))
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,175 @@
+import time
+import unittest
+
+import modulehost
+from modulehost import SteamID, Callback
+
+class BlackjackTest(unittest.TestCase):
+	def setUp(self):
+		self.host = modulehost.Host()
+		self.room = SteamID(100)
+		self.banks = {}
+		self.games = []
+		self.blackjack = self.Load(self.room)
+		self.bank = self.banks[self.room]
+
+	def tearDown(self):
+		for game in self.games:
+			# Stop the tables of modules that were reloaded too.
+			game.var.Token.Cancel()
+
+		self.host.Close()
+
+	def Load(self, room, resume = True):
+		"""
+			Loads and starts Blackjack in a chatroom, the way a reload does.
+			The chatroom gets a Bank the first time.
+		"""
+		if not room in self.banks:
+			self.banks[room] = self.host.Load('Bank.py', room)
+			self.host.Start(self.banks[room])
+
+		blackjack = self.host.Load('blackjack.py', room)
+		blackjack.var.DealerDelay = 0.2
+		blackjack.var.PayoutDelay = 0.2
+		blackjack.var.ResumeRounds = resume
+		self.host.Start(blackjack)
+		self.games.append(blackjack)
+		return blackjack
+
+	def GetMoney(self, chatter, room = None):
+		bank = self.banks[room or self.room]
+
+		# Wait for anything queued to be committed first.
+		bank.var.Ledger.Submit(lambda: None)
+		return bank.GetMoney(chatter)
+
+	def Deal(self, chatter, bet = 10):
+		"""
+			Seats a chatter and deals until they have a hand to play. Returns
+			their table.
+		"""
+		callback = Callback(chatter, self.room)
+		states = self.blackjack.BlackjackStates
+
+		for i in xrange(20):
+			self.blackjack.JoinBlackjack(callback, ['bj', str(bet)])
+			table = self.blackjack.var.Seats[chatter]
+			table.Countdown.fire()
+
+			if table.GameState == states.PlayerTurn:
+				return table
+
+			# They were dealt a blackjack, so there's nothing to play. Quitting
+			# loses the bet, so give it back for the next deal.
+			self.blackjack.OnChatMessage(callback, ['quit'])
+			self.bank.GiveMoney(chatter, bet)
+
+		self.fail("Never dealt a hand to play.")
+
+	def WaitFor(self, check, timeout = 5):
+		deadline = time.time() + timeout
+
+		while not check():
+			if time.time() > deadline:
+				self.fail("Timed out.")
+
+			time.sleep(0.01)
+
+	def testStandReturnsWhileDealerPlays(self):
+		chatter = SteamID(1)
+		table = self.Deal(chatter)
+
+		start = time.time()
+		self.blackjack.OnChatMessage(Callback(chatter, self.room), ['stand'])
+		elapsed = time.time() - start
+
+		self.assertEqual(table.GameState, self.blackjack.BlackjackStates.DealerTurn)
+		self.assertLess(elapsed, 0.005)
+
+		# The dealer still finishes the round on the scheduler.
+		self.WaitFor(lambda: any("Total:" in message for message in self.host.Said))
+
+	def testDoubleTakesAnotherBet(self):
+		chatter = SteamID(1)
+		callback = Callback(chatter, self.room)
+		table = self.Deal(chatter, 100)
+		self.assertEqual(self.GetMoney(chatter), 100)
+
+		self.blackjack.OnChatMessage(callback, ['double'])
+		self.assertTrue(table.Players[chatter].Hands[0].Doubled)
+		self.assertEqual(self.GetMoney(chatter), 0)
+
+	def testDoubleNeedsTheMoney(self):
+		chatter = SteamID(1)
+		table = self.Deal(chatter, 150)
+
+		self.blackjack.OnChatMessage(Callback(chatter, self.room), ['double'])
+		self.assertFalse(table.Players[chatter].Hands[0].Doubled)
+		self.assertEqual(self.GetMoney(chatter), 50)
+
+	def JoinTwoRooms(self):
+		"""
+			Seats chatter 1 at table 1 in this room and chatter 2 at table 1 in
+			another room. Returns the other room.
+		"""
+		other = SteamID(200)
+		self.Load(other).JoinBlackjack(Callback(SteamID(2), other), ['bj', '30'])
+		self.blackjack.JoinBlackjack(Callback(SteamID(1), self.room), ['bj', '50'])
+		self.blackjack.var.Checkpoints.Flush()
+
+		self.assertEqual(self.GetMoney(SteamID(1)), 150)
+		self.assertEqual(self.GetMoney(SteamID(2), other), 170)
+		return other
+
+	def testRoomsRefundOnlyTheirOwnTables(self):
+		other = self.JoinTwoRooms()
+		old = list(self.games)
+
+		self.Load(self.room, False)
+		self.Load(other, False)
+
+		self.assertEqual(self.GetMoney(SteamID(1)), 200)
+		self.assertEqual(self.GetMoney(SteamID(2), other), 200)
+
+		for game in old:
+			self.assertTrue(game.var.Token.Cancelled)
+
+	def testRoomsResumeOnlyTheirOwnTables(self):
+		other = self.JoinTwoRooms()
+		old = self.blackjack.var.Tables[0]
+
+		blackjack = self.Load(self.room)
+
+		self.assertEqual(blackjack.var.Seats.keys(), [SteamID(1)])
+		self.assertTrue(old.Token.Cancelled)
+		self.assertEqual(self.blackjack.var.Checkpoints.GetRecords(
+			other.ConvertToUInt64()).keys(), [1])
+
+	def testResumedRoundIsOnlyPaidOnce(self):
+		chatter = SteamID(1)
+		self.Deal(chatter)
+		self.blackjack.OnChatMessage(Callback(chatter, self.room), ['stand'])
+		key = (self.room.ConvertToUInt64(), 1)
+		checkpoints = self.blackjack.var.Checkpoints
+		record = checkpoints.GetRecords(key[0])[1]
+
+		# The next round's bet is taken before its checkpoint is saved.
+		waiting = self.blackjack.BlackjackStates.Waiting.value
+		isWaiting = lambda: self.blackjack.blackjacksave.Decode(
+			checkpoints.GetRecords(key[0])[1]).State == waiting
+
+		self.WaitFor(isWaiting)
+		money = self.GetMoney(chatter)
+
+		# The bot crashed before the payout's checkpoint was written.
+		checkpoints.Save(key, record)
+		blackjack = self.Load(self.room)
+		self.assertEqual(blackjack.var.Tables[0].GameState,
+			blackjack.BlackjackStates.DealerTurn)
+
+		self.WaitFor(isWaiting)
+		self.assertEqual(self.GetMoney(chatter), money)
+
+if __name__ == '__main__':
+	unittest.main()
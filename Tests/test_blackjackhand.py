@@ -0,0 +1,124 @@
+import unittest
+
+import modulehost
+import deck
+from blackjackhand import Hand, Player, HandStates
+
+def OldGetPoints(cards):
+	"""
+		Scores cards the way Hand.GetPoints() did before it kept running
+		totals. Returns the points and whether the hand is soft.
+	"""
+	points = 0
+	soft = False
+
+	for card in cards:
+		if card.Rank == deck.Ranks.Ace:
+			points += 11
+		elif card.Rank in (deck.Ranks.Jack, deck.Ranks.Queen, deck.Ranks.King):
+			points += 10
+		else:
+			points += card.Rank.value
+
+	for card in cards:
+		if card.Rank == deck.Ranks.Ace:
+			if points > 21:
+				soft = False
+				points -= 10
+			else:
+				soft = True
+				break
+
+	return points, soft
+
+# Tens, jacks, queens and kings score the same, so one of each value is enough
+# to cover every combination.
+_ranks = [deck.Ranks.Ace, deck.Ranks.Two, deck.Ranks.Three, deck.Ranks.Four,
+	deck.Ranks.Five, deck.Ranks.Six, deck.Ranks.Seven, deck.Ranks.Eight,
+	deck.Ranks.Nine, deck.Ranks.Ten, deck.Ranks.King]
+
+class HandPointsTest(unittest.TestCase):
+	"""
+		Checks the running totals against the old algorithm for every
+		combination of up to 8 cards (the 8-card Charlie limit), dealt all at
+		once, one card at a time and with the last card popped off again.
+	"""
+	def setUp(self):
+		self.cards = [deck.Card(deck.Suits.Spades, rank) for rank in _ranks]
+
+	def assertScored(self, hand, cards, how):
+		self.assertEqual((hand.GetPoints(), hand.Soft), OldGetPoints(cards),
+			"{} {}".format(how, [card.Rank.name for card in cards]))
+
+	def testEveryCombination(self):
+		hand = Hand()
+		dealt = []
+		count = self._extend(hand, dealt, 0)
+		self.assertEqual(count, 75581)
+
+	def _extend(self, hand, dealt, first):
+		"""
+			Deals every card from first on onto the hand, checks it, goes on
+			to the hands after it and pops the card off again. Returns how
+			many hands were checked.
+		"""
+		if len(dealt) == 8:
+			return 0
+
+		count = 0
+
+		for i in xrange(first, len(self.cards)):
+			dealt.append(self.cards[i])
+			hand.Deal([self.cards[i]])
+			self.assertScored(hand, dealt, "Dealt one at a time")
+
+			whole = Hand()
+			whole.Deal(dealt)
+			self.assertScored(whole, dealt, "Dealt")
+
+			count += 1 + self._extend(hand, dealt, i)
+
+			hand.Pop()
+			dealt.pop()
+			self.assertScored(hand, dealt, "Popped")
+
+		return count
+
+def MakeHand(*ranks):
+	hand = Hand()
+	hand.Deal([deck.Card(deck.Suits.Spades, rank) for rank in ranks])
+	return hand
+
+class StakeTest(unittest.TestCase):
+	def setUp(self):
+		self.dealer = MakeHand(deck.Ranks.Ten, deck.Ranks.Eight)
+
+	def testDoubleWinsAndLosesTwice(self):
+		hand = MakeHand(deck.Ranks.Six, deck.Ranks.Five)
+		hand.Double([deck.Card(deck.Suits.Hearts, deck.Ranks.Nine)])
+		self.assertEqual(hand.State, HandStates.DoubleDown)
+		self.assertEqual(hand.GetStake(10), 20)
+		self.assertEqual(hand.Payout(10, self.dealer), 20)
+
+		hand = MakeHand(deck.Ranks.Six, deck.Ranks.Five)
+		hand.Double([deck.Card(deck.Suits.Hearts, deck.Ranks.Two)])
+		self.assertEqual(hand.Payout(10, self.dealer), -20)
+
+	def testBustedDoubleStaysBust(self):
+		hand = MakeHand(deck.Ranks.Ten, deck.Ranks.Two)
+		hand.Double([deck.Card(deck.Suits.Hearts, deck.Ranks.King)])
+		self.assertEqual(hand.State, HandStates.Bust)
+		self.assertTrue(hand.Done)
+		self.assertEqual(hand.Payout(10, self.dealer), -20)
+
+	def testPlayerStake(self):
+		player = Player(10)
+		self.assertEqual(player.GetStake(), 10)
+
+		player.Hands.append(MakeHand(deck.Ranks.Eight, deck.Ranks.Two))
+		player.Hands.append(MakeHand(deck.Ranks.Eight, deck.Ranks.Three))
+		player.Hands[1].Double([deck.Card(deck.Suits.Hearts, deck.Ranks.Ten)])
+		self.assertEqual(player.GetStake(), 30)
+
+if __name__ == '__main__':
+	unittest.main()
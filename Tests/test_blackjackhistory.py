@@ -0,0 +1,118 @@
+import os
+import random
+import shutil
+import tempfile
+import unittest
+
+import modulehost
+import deck
+import blackjackhistory
+from blackjackhand import Hand
+from blackjackhistory import History, Round, RoundPlayer, ReadRounds, PlayerStats
+
+class HistoryTest(unittest.TestCase):
+	def setUp(self):
+		self.folder = tempfile.mkdtemp()
+		self.path = os.path.join(self.folder, "Blackjack.history")
+		self.statsPath = os.path.join(self.folder, "BlackjackStats.log")
+		self.random = random.Random(0)
+		self.cards = deck.Deck().GetCards(52)
+
+	def tearDown(self):
+		shutil.rmtree(self.folder, True)
+
+	def MakeRound(self):
+		round = Round(1, self.MakeHand())
+
+		for steamID in self.random.sample(xrange(1, 6), self.random.randint(1, 3)):
+			player = RoundPlayer(steamID, 10)
+
+			for i in xrange(self.random.randint(1, 2)):
+				player.Hands.append((self.MakeHand(), self.random.choice((-10, 0, 10, 15))))
+
+			round.Players.append(player)
+
+		return round
+
+	def MakeHand(self):
+		hand = Hand()
+		hand.Deal(self.random.sample(self.cards, 2))
+		return hand
+
+	def Load(self, compactSize = 256 * 1024):
+		history = History(self.path, self.statsPath, compactSize)
+		history.Load()
+		return history
+
+	def assertCounted(self, history):
+		"""
+			Checks the stats match counting every round in the history.
+		"""
+		expected = {}
+
+		for round in ReadRounds(self.path):
+			for player in round.Players:
+				expected.setdefault(player.SteamID, PlayerStats()).Add(player)
+
+		self.assertEqual(sorted(history.Stats), sorted(expected))
+
+		for steamID, stats in expected.iteritems():
+			for slot in PlayerStats.__slots__:
+				self.assertEqual(getattr(history.Stats[steamID], slot),
+					getattr(stats, slot), slot)
+
+	def testSharedByEveryone(self):
+		history = blackjackhistory.GetHistory(self.path, self.statsPath)
+		self.assertIs(blackjackhistory.GetHistory(self.path, self.statsPath), history)
+		history.Load()
+
+		for i in xrange(20):
+			history.Append(self.MakeRound())
+
+		self.assertCounted(history)
+		self.assertCounted(self.Load())
+
+	def testAppendsToTheStats(self):
+		history = self.Load()
+
+		for i in xrange(20):
+			size = os.path.getsize(self.statsPath) if i else 0
+			round = self.MakeRound()
+			history.Append(round)
+
+			# Only the round's players' stats are added.
+			self.assertEqual(os.path.getsize(self.statsPath) - size,
+				blackjackhistory._length.size + blackjackhistory._statsHeader.size +
+				blackjackhistory._playerStats.size * len(round.Players))
+
+		self.assertCounted(self.Load())
+
+	def testCompacts(self):
+		history = self.Load(512)
+
+		for i in xrange(100):
+			history.Append(self.MakeRound())
+
+		self.assertLess(os.path.getsize(self.statsPath), 1024 + 512)
+		self.assertCounted(self.Load(512))
+
+	def testCatchesUp(self):
+		history = self.Load()
+
+		for i in xrange(10):
+			history.Append(self.MakeRound())
+
+		# The last stats record was cut off, and a round never made it in.
+		with open(self.statsPath, 'r+b') as file:
+			file.truncate(os.path.getsize(self.statsPath) - 3)
+
+		data = blackjackhistory.EncodeRound(self.MakeRound())
+
+		with open(self.path, 'ab') as file:
+			file.write(blackjackhistory._length.pack(len(data)))
+			file.write(data)
+
+		self.assertCounted(self.Load())
+
+if __name__ == '__main__':
+	unittest.main()
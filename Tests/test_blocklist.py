@@ -0,0 +1,174 @@
+import random
+import unittest
+
+import modulehost
+from blocklist import BlockList, IndexedBlockList, SortedList, Ranking
+
+class BlockListTest(unittest.TestCase):
+	"""
+		Makes random edits to a BlockList and a plain list and checks they
+		always hold the same items. Small loads make the blocks split and
+		empty out often.
+	"""
+	def testRandomEdits(self):
+		for load in (1, 2, 3, 8, 500):
+			rng = random.Random(load)
+			items = BlockList(range(50), load)
+			expected = range(50)
+
+			for i in xrange(3000):
+				action = rng.random()
+
+				if action < 0.4:
+					index = rng.randint(-len(expected) - 5, len(expected) + 5)
+					added = [i] * rng.randint(0, load * 3)
+					items.Insert(index, added)
+
+					if index < 0:
+						index = max(0, index + len(expected))
+
+					expected[index:index] = added
+				elif action < 0.7 and expected:
+					index = rng.randint(-len(expected), len(expected) - 1)
+					self.assertEqual(items.Pop(index), expected.pop(index))
+				elif action < 0.8:
+					items.Append(i)
+					expected.append(i)
+				elif action < 0.805:
+					items.Clear()
+					del expected[:]
+				elif expected:
+					index = rng.randint(-len(expected), len(expected) - 1)
+					self.assertEqual(items[index], expected[index])
+
+					start = rng.randint(-2, len(expected) + 2)
+					stop = rng.choice((None, rng.randint(0, len(expected) + 2)))
+					self.assertEqual(list(items.Slice(start, stop)),
+						expected[max(start, 0):stop])
+
+				self.assertEqual(len(items), len(expected))
+
+			self.assertEqual(list(items), expected)
+
+	def testOutOfRange(self):
+		items = BlockList(range(10), 2)
+		self.assertRaises(IndexError, lambda: items[10])
+		self.assertRaises(IndexError, lambda: items[-11])
+		self.assertRaises(IndexError, BlockList().Pop)
+
+class IndexedBlockListTest(unittest.TestCase):
+	def testRandomEdits(self):
+		for load in (1, 2, 3, 8, 500):
+			rng = random.Random(load)
+			items = IndexedBlockList(range(50), load)
+			expected = range(50)
+			next = 50
+
+			for i in xrange(3000):
+				action = rng.random()
+
+				if action < 0.4:
+					index = rng.randint(0, len(expected))
+					added = range(next, next + rng.randint(0, load * 3))
+					next += len(added)
+					items.Insert(index, added)
+					expected[index:index] = added
+				elif action < 0.75 and expected:
+					index = rng.randint(-len(expected), len(expected) - 1)
+					self.assertEqual(items.Pop(index), expected.pop(index))
+				elif action < 0.755:
+					items.Clear()
+					del expected[:]
+				elif expected:
+					item = rng.choice(expected)
+					self.assertEqual(items.Index(item), expected.index(item))
+
+				self.assertRaises(ValueError, items.Index, -1)
+				self.assertEqual(len(items), len(expected))
+
+			self.assertEqual(list(items), expected)
+			self.assertEqual([items.Index(item) for item in expected], range(len(expected)))
+
+class SortedListTest(unittest.TestCase):
+	def testRandomEdits(self):
+		for load in (1, 2, 3, 8, 500):
+			rng = random.Random(load)
+			start = [rng.randrange(100) for i in xrange(50)]
+			items = SortedList(start, load)
+			expected = sorted(start)
+
+			for i in xrange(3000):
+				item = rng.randrange(100)
+
+				if rng.random() < 0.55:
+					items.Add(item)
+					expected.append(item)
+					expected.sort()
+				elif item in expected:
+					items.Remove(item)
+					expected.remove(item)
+				else:
+					self.assertRaises(ValueError, items.Remove, item)
+
+				self.assertEqual(item in items, item in expected)
+
+				if item in expected:
+					self.assertEqual(items.Index(item), expected.index(item))
+				else:
+					self.assertRaises(ValueError, items.Index, item)
+
+				start = rng.randint(0, len(expected))
+				self.assertEqual(list(items.Slice(start, start + 5)),
+					expected[start:start + 5])
+				self.assertEqual(len(items), len(expected))
+
+			self.assertEqual(list(items), expected)
+
+class RankingTest(unittest.TestCase):
+	def testRankAfterChanges(self):
+		ranking = Ranking({1: 50, 2: 80, 3: 20})
+		self.assertEqual(ranking.Top(3), [(2, 80), (1, 50), (3, 20)])
+		self.assertEqual([ranking.Rank(key) for key in (1, 2, 3)], [2, 1, 3])
+
+		# Ties go to the lower key.
+		ranking.Set(3, 80)
+		self.assertEqual(ranking.Top(2), [(2, 80), (3, 80)])
+		self.assertEqual(ranking.Rank(1), 3)
+
+		ranking.Set(1, 100)
+		self.assertEqual([ranking.Rank(key) for key in (1, 2, 3)], [1, 2, 3])
+
+		ranking.Remove(2)
+		self.assertEqual(ranking.Rank(2), None)
+		self.assertEqual(ranking.Rank(3), 2)
+		self.assertEqual(len(ranking), 2)
+		self.assertFalse(2 in ranking)
+
+		# Removing a key that isn't ranked does nothing.
+		ranking.Remove(2)
+		self.assertEqual(ranking.Top(5), [(1, 100), (3, 80)])
+
+	def testRandomScores(self):
+		rng = random.Random(0)
+		ranking = Ranking((key, rng.randrange(-50, 50)) for key in xrange(20))
+		scores = dict(ranking._scores)
+
+		for i in xrange(2000):
+			key = rng.randrange(30)
+
+			if rng.random() < 0.8:
+				score = rng.randrange(-50, 50)
+				ranking.Set(key, score)
+				scores[key] = score
+			else:
+				ranking.Remove(key)
+				scores.pop(key, None)
+
+			order = sorted(scores.iteritems(), key = lambda (key, score): (-score, key))
+			self.assertEqual(ranking.Top(5), order[:5])
+			self.assertEqual(ranking.Rank(key),
+				[k for k, score in order].index(key) + 1 if key in scores else None)
+			self.assertEqual(len(ranking), len(scores))
+
+if __name__ == '__main__':
+	unittest.main()
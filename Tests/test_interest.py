@@ -0,0 +1,100 @@
+import math
+import time
+import random
+import unittest
+
+import modulehost
+import interest
+from loans import Loan, LoanTypes, SecondsPerDay
+
+class LoanBatchTest(unittest.TestCase):
+	def setUp(self):
+		rng = random.Random(0)
+		self.now = time.time()
+		self.loans = []
+
+		for i in xrange(200):
+			loan = Loan(rng.choice(LoanTypes))
+			loan._currentAmount = rng.randint(1, 5000)
+			loan.InterestStart = self.now - rng.uniform(0, 14) * SecondsPerDay
+			self.loans.append((rng.randrange(20), loan))
+
+		self.rows = [(owner, loan._currentAmount, loan.Interest, loan.InterestStart)
+			for owner, loan in self.loans]
+
+	def Batches(self):
+		"""
+			Yields a batch made with NumPy, if it's installed, and one made
+			without it.
+		"""
+		numpy = interest.numpy
+
+		try:
+			if numpy:
+				yield interest.LoanBatch(self.rows)
+
+			interest.numpy = None
+			yield interest.LoanBatch(self.rows)
+		finally:
+			interest.numpy = numpy
+
+	def testMatchesLoanGetAmount(self):
+		for batch in self.Batches():
+			balances = list(batch.Balances(self.now))
+			self.assertEqual(len(batch), len(self.loans))
+
+			for (owner, loan), balance in zip(self.loans, balances):
+				# GetAmount() truncates and uses the time it's called at.
+				self.assertAlmostEqual(loan.GetAmount(), balance, delta = 1)
+
+	def testNumPyAndPythonAgree(self):
+		results = []
+
+		for batch in self.Batches():
+			results.append((list(batch.Balances(self.now)), batch.Totals(self.now),
+				batch.Project([0, 1, 30], self.now)))
+
+		if len(results) < 2:
+			self.skipTest("NumPy isn't installed.")
+
+		(balances, totals, projected), (pyBalances, pyTotals, pyProjected) = results
+
+		for balance, pyBalance in zip(balances, pyBalances):
+			self.assertAlmostEqual(balance, pyBalance, delta = balance * 1e-12)
+
+		self.assertEqual(sorted(totals), sorted(pyTotals))
+
+		for owner in totals:
+			self.assertAlmostEqual(totals[owner], pyTotals[owner], delta = totals[owner] * 1e-12)
+
+		# Totals are truncated, so a sum can land either side of a whole number.
+		for total, pyTotal in zip(projected, pyProjected):
+			self.assertLessEqual(abs(total - pyTotal), 1)
+
+	def testTotals(self):
+		for batch in self.Batches():
+			totals = batch.Totals(self.now)
+			expected = {}
+
+			for owner, loan in self.loans:
+				days = (self.now - loan.InterestStart) / SecondsPerDay
+				expected[owner] = expected.get(owner, 0.0) + \
+					loan._currentAmount * math.exp(loan.Interest * days)
+
+			self.assertEqual(sorted(totals), sorted(expected))
+
+			for owner in expected:
+				self.assertAlmostEqual(totals[owner], expected[owner], delta = expected[owner] * 1e-12)
+
+			self.assertLessEqual(abs(batch.Total(self.now) - int(math.fsum(expected.values()))), 1)
+
+	def testEmpty(self):
+		self.rows = []
+
+		for batch in self.Batches():
+			self.assertEqual(len(batch), 0)
+			self.assertEqual(batch.Total(self.now), 0)
+			self.assertEqual(batch.Totals(self.now), {})
+
+if __name__ == '__main__':
+	unittest.main()
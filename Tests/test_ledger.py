@@ -0,0 +1,80 @@
+import unittest
+from threading import Event, current_thread
+
+import modulehost
+import ledger
+from modulehost import SteamID
+
+class LedgerTest(unittest.TestCase):
+	def testOpenStopsTheLastLedger(self):
+		commits = []
+		old = ledger.Open("Test", lambda: commits.append("old"))
+		old.Submit(lambda: None)
+
+		new = ledger.Open("Test", lambda: commits.append("new"))
+		old._thread.join(5)
+		self.assertFalse(old._thread.is_alive())
+		self.assertTrue(new._thread.is_alive())
+		new.Stop()
+
+		# The old ledger still commits what's submitted to it.
+		self.assertEqual(old.Submit(lambda: 1), 1)
+		self.assertEqual(commits, ["old", "old"])
+
+	def testThenRunsAfterTheCommit(self):
+		release = Event()
+		committed = []
+		log = ledger.Ledger(lambda: committed.append(True))
+		log.Post(release.wait)
+
+		results = []
+		transaction = log.Post(lambda: 2).Then(
+			lambda transaction: results.append((transaction.Wait(), list(committed))))
+		self.assertEqual(results, [])
+
+		release.set()
+		transaction.Wait()
+		log.Stop()
+		log._thread.join(5)
+
+		# It's the last batch, so the callback saw every commit.
+		self.assertEqual(results, [(2, committed)])
+
+		# A transaction that's done calls back straight away.
+		transaction.Then(lambda transaction: results.append(transaction.Result))
+		self.assertEqual(results[-1], 2)
+
+	def testEveryRoomsBankHasItsOwnLedger(self):
+		host = modulehost.Host()
+
+		try:
+			banks = []
+
+			for room in (SteamID(100), SteamID(200)):
+				bank = host.Load('Bank.py', room)
+				host.Start(bank)
+				banks.append(bank)
+
+			for bank in banks:
+				self.assertFalse(bank.var.Ledger.Stopped)
+				self.assertTrue(bank.var.Ledger._thread.is_alive())
+
+				# Transactions still run on the room's writer thread.
+				thread = bank.var.Ledger.Submit(current_thread)
+				self.assertIs(thread, bank.var.Ledger._thread)
+
+			# Reloading a room's Bank only stops that room's ledger.
+			old = banks[0].var.Ledger
+			reloaded = host.Load('Bank.py', SteamID(100))
+			host.Start(reloaded)
+			old._thread.join(5)
+			self.assertTrue(old.Stopped)
+			self.assertFalse(banks[1].var.Ledger.Stopped)
+
+			for bank in (reloaded, banks[1]):
+				bank.var.Ledger.Stop()
+		finally:
+			host.Close()
+
+if __name__ == '__main__':
+	unittest.main()
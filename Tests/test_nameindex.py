@@ -0,0 +1,98 @@
+import random
+import unittest
+
+import modulehost
+from modulehost import SteamID, Callback
+from nameindex import NameIndex
+
+class NameIndexTest(unittest.TestCase):
+	def setUp(self):
+		self.names = NameIndex()
+		self.names.Add(1, "Bob")
+		self.names.Add(2, "Bobby")
+		self.names.Add(3, "Robert")
+		self.names.Add(4, "bert")
+
+	def Find(self, query):
+		return sorted(self.names.Find(query))
+
+	def testExactBeatsPrefixBeatsSubstring(self):
+		self.assertEqual(self.Find("BOB"), [1])
+		self.assertEqual(self.Find("bobb"), [2])
+		self.assertEqual(self.Find("bert"), [4])
+		self.assertEqual(self.Find("ober"), [3])
+
+	def testAmbiguous(self):
+		self.assertEqual(self.Find("bo"), [1, 2])
+		self.assertEqual(self.Find("er"), [3, 4])
+		self.assertEqual(self.Find("zed"), [])
+		self.assertEqual(self.Find(""), [])
+
+	def testRenameAndLeave(self):
+		self.names.Add(2, "Zed")
+		self.assertEqual(self.Find("bo"), [1])
+		self.assertEqual(self.Find("ze"), [2])
+
+		self.names.Remove(1)
+		self.assertEqual(self.Find("bob"), [])
+		self.assertFalse(1 in self.names)
+		self.assertEqual(len(self.names), 3)
+
+		# Removing a chatter who isn't there does nothing.
+		self.names.Remove(1)
+		self.assertEqual(len(self.names), 3)
+
+	def testMatchesAScan(self):
+		rng = random.Random(0)
+		self.names = NameIndex()
+		names = {}
+
+		for i in xrange(2000):
+			steamID = rng.randrange(50)
+
+			if rng.random() < 0.7:
+				name = ''.join(rng.choice("abcAB") for j in xrange(rng.randint(1, 6)))
+				self.names.Add(steamID, name)
+				names[steamID] = name.lower()
+			else:
+				self.names.Remove(steamID)
+				names.pop(steamID, None)
+
+			query = ''.join(rng.choice("abc") for j in xrange(rng.randint(1, 3)))
+			expected = [id for id, name in names.iteritems() if name == query] or \
+				[id for id, name in names.iteritems() if name.startswith(query)] or \
+				[id for id, name in names.iteritems() if query in name]
+			self.assertEqual(sorted(self.names.Find(query)), sorted(expected))
+
+class GiveTest(unittest.TestCase):
+	def setUp(self):
+		self.host = modulehost.Host()
+		self.room = SteamID(100)
+		self.host.SteamNerd.Names.update({SteamID(1): "Alice", SteamID(2): "Bob",
+			SteamID(3): "Bobby"})
+		self.bank = self.host.Load('Bank.py', self.room)
+		self.host.SteamNerd.Chatrooms[self.room].Chatters.extend(
+			[SteamID(1), SteamID(2), SteamID(3)])
+		self.host.Start(self.bank)
+
+	def tearDown(self):
+		self.bank.var.Ledger.Stop()
+		self.host.Close()
+
+	def Give(self, name, amount):
+		self.bank.Give(Callback(SteamID(1), self.room), ['give', name, str(amount)])
+		return self.host.Said[-1]
+
+	def testGivesByName(self):
+		self.assertEqual(self.Give("bob", 10), "Alice gave Bob $10!")
+		self.assertEqual(self.Give("bobb", 5), "Alice gave Bobby $5!")
+		self.assertEqual(self.bank.GetMoney(SteamID(2)), 210)
+		self.assertEqual(self.bank.GetMoney(SteamID(1)), 185)
+
+	def testAsksWhoWasMeant(self):
+		self.assertEqual(self.Give("b", 10), "b could be Bob, Bobby. Who did you mean?")
+		self.assertEqual(self.Give("carol", 10), "carol not found!")
+		self.assertEqual(self.bank.GetMoney(SteamID(1)), 200)
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,47 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import modulehost
+import safefile
+
+class SafeFileTest(unittest.TestCase):
+	def setUp(self):
+		self.folder = tempfile.mkdtemp()
+		self.path = os.path.join(self.folder, "file")
+
+	def tearDown(self):
+		shutil.rmtree(self.folder, True)
+
+	def Read(self, file):
+		return file.read()
+
+	def testReplace(self):
+		self.assertEqual(safefile.Load(self.path, self.Read), None)
+
+		safefile.Replace(self.path, lambda file: file.write("one"))
+		safefile.Replace(self.path, lambda file: file.write("two"))
+		self.assertEqual(safefile.Load(self.path, self.Read), "two")
+		self.assertFalse(os.path.exists(self.path + '.tmp'))
+
+	def testLoadFinishesTheReplace(self):
+		# A crash after the old file was removed but before the new one was
+		# renamed.
+		with open(self.path + '.tmp', 'wb') as file:
+			file.write("new")
+
+		self.assertEqual(safefile.Load(self.path, self.Read), "new")
+		self.assertFalse(os.path.exists(self.path + '.tmp'))
+
+	def testLoadSkipsFilesThatCantBeRead(self):
+		with open(self.path, 'wb') as file:
+			file.write("bad")
+
+		def read(file):
+			raise ValueError()
+
+		self.assertEqual(safefile.Load(self.path, read, (ValueError,)), None)
+
+if __name__ == '__main__':
+	unittest.main()
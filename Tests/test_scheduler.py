@@ -0,0 +1,71 @@
+import time
+import unittest
+from threading import Event
+
+import modulehost
+import scheduler
+from countdown import Countdown
+
+class SchedulerTest(unittest.TestCase):
+	def setUp(self):
+		self.scheduler = scheduler.Scheduler()
+
+	def Drain(self):
+		# Calls run in order, so this one runs after everything before it.
+		done = Event()
+		self.scheduler.Schedule(0.05, done.set)
+		self.assertTrue(done.wait(5))
+
+	def testCancelledTokenNeverStarts(self):
+		ran = []
+		token = scheduler.CancelToken()
+		child = scheduler.CancelToken(token)
+		self.scheduler.Schedule(0.05, lambda: ran.append(1), child)
+		call = self.scheduler.Schedule(0.05, lambda: ran.append(2))
+		token.Cancel()
+		call.Cancel()
+		self.Drain()
+		self.assertEqual(ran, [])
+
+	def testCountdownFiresOnce(self):
+		fired = []
+		countdowns = []
+
+		for i in xrange(200):
+			countdown = Countdown(0.001 * (i % 5), 0, lambda i=i: fired.append(i),
+				lambda message: None, scheduler = self.scheduler)
+			countdown.start()
+			countdowns.append(countdown)
+
+		for countdown in countdowns:
+			countdown.fire()
+
+		self.Drain()
+		self.assertEqual(sorted(fired), range(200))
+
+	def testStoppedCountdownNeverFires(self):
+		started = Event()
+		stopped = Event()
+		fired = []
+
+		class SlowCountdown(Countdown):
+			# Holds the scheduler's call after it has started, until the
+			# countdown is stopped.
+			def _finish(self, calls = None):
+				started.set()
+				stopped.wait(5)
+				Countdown._finish(self, calls)
+
+		countdown = SlowCountdown(0.01, 0, lambda: fired.append(True),
+			lambda message: None, scheduler = self.scheduler)
+		countdown.start()
+		self.assertTrue(started.wait(5))
+		countdown.stop()
+		stopped.set()
+
+		self.Drain()
+		self.assertEqual(fired, [])
+		self.assertFalse(countdown.Done)
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,33 @@
+import threading
+import unittest
+
+import modulehost
+from modulehost import SteamID, Callback
+
+class TodoTest(unittest.TestCase):
+	def setUp(self):
+		self.host = modulehost.Host()
+		self.callback = Callback(SteamID(1), SteamID(100))
+
+	def tearDown(self):
+		self.host.Close()
+
+	def CountWriters(self):
+		return len([thread for thread in threading.enumerate() if thread.name == "TodoJournal"])
+
+	def testReloadsShareTheJournal(self):
+		writers = self.CountWriters()
+		todo = self.host.Load('Todo.py')
+		todo.AddTodo(self.callback, ['todo', 'add', 'one'])
+
+		for i in xrange(3):
+			reloaded = self.host.Load('Todo.py')
+			self.assertIs(reloaded.var.Journal, todo.var.Journal)
+
+		reloaded.AddTodo(self.callback, ['todo', 'add', 'two'])
+		self.assertEqual([item.strip() for item in reloaded.var.TodoList], ['one', 'two'])
+		self.assertEqual([line for line, score in reloaded.var.Index.Search('two')], [1])
+		self.assertEqual(self.CountWriters(), writers + 1)
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,54 @@
+"""
+	Streams bank accounts between the Bank's storage and CSV or JSON Lines
+	files, without a Steam connection. The storage is either the Bank.db
+	database it uses when var.UseDatabase is set, or the Money.p pickle file
+	it uses otherwise (Loans.p is read from the same folder). Stop the bot
+	before importing into the pickle files, or it will write over them.
+	Interrupted runs resume where they left off unless --restart is given.
+
+	Usage:
+		python bankdata.py export [Bank.db|Money.p] [file] [--format csv|jsonl]
+		python bankdata.py import [Bank.db|Money.p] [file] [--format csv|jsonl]
+"""
+import os
+import sys
+import argparse
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Modules'))
+
+import bankstore
+
+def Main(argv):
+	parser = argparse.ArgumentParser(description = "Import or export bank accounts.")
+	parser.add_argument('command', choices = ['export', 'import'])
+	parser.add_argument('bank', help = "The bank's SQLite database (Bank.db), or " +
+		"its Money.p if it doesn't use one.")
+	parser.add_argument('file', help = "The CSV or JSON Lines file.")
+	parser.add_argument('--format', choices = ['csv', 'jsonl'], 
+		help = "Defaults to csv for .csv files and jsonl for everything else.")
+	parser.add_argument('--restart', action = 'store_true', 
+		help = "Ignore the progress of an interrupted run.")
+	parser.add_argument('--batch', type = int, default = 1000,
+		help = "How many accounts to read or commit at a time.")
+	args = parser.parse_args(argv)
+
+	if args.bank.lower().endswith('.p'):
+		store = bankstore.PickleStore(args.bank,
+			os.path.join(os.path.dirname(args.bank), "Loans.p"))
+	else:
+		store = bankstore.SQLiteStore(args.bank)
+
+	try:
+		if args.command == 'export':
+			count = bankstore.Export(store, args.file, args.format, 
+				not args.restart, args.batch)
+			print "Exported {:,} accounts to {}.".format(count, args.file)
+		else:
+			count = bankstore.Import(store, args.file, args.format, 
+				not args.restart, args.batch)
+			print "Imported {:,} accounts from {}.".format(count, args.file)
+	finally:
+		store.Close()
+
+if __name__ == '__main__':
+	Main(sys.argv[1:])
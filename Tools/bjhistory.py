@@ -0,0 +1,84 @@
+"""
+	Sums up a Blackjack.history file without a Steam connection. Rounds are
+	read one at a time, so months of history don't have to fit in memory.
+
+	Usage:
+		python bjhistory.py [history file] [--since YYYY-MM-DD] [--top N]
+"""
+import os
+import sys
+import time
+import argparse
+from datetime import datetime
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Modules'))
+
+import blackjackhistory
+
+def Main(argv):
+	parser = argparse.ArgumentParser(description = "Sum up Blackjack history.")
+	parser.add_argument('history', help = "The history file (Blackjack.history).")
+	parser.add_argument('--since', help = "Only count rounds from this date on.")
+	parser.add_argument('--top', type = int, default = 10,
+		help = "How many of the biggest winners and losers to show.")
+	args = parser.parse_args(argv)
+
+	since = 0
+
+	if args.since:
+		since = time.mktime(datetime.strptime(args.since, '%Y-%m-%d').timetuple())
+
+	rounds = 0
+	bets = 0
+	first = last = None
+	states = {}
+	stats = {}
+
+	for round in blackjackhistory.ReadRounds(args.history):
+		if round.Time < since:
+			continue
+
+		rounds += 1
+		first = first or round.Time
+		last = round.Time
+
+		for player in round.Players:
+			if not player.SteamID in stats:
+				stats[player.SteamID] = blackjackhistory.PlayerStats()
+
+			stats[player.SteamID].Add(player)
+
+			for hand, payout in player.Hands:
+				bets += hand.GetStake(player.Bet)
+				count, total = states.get(hand.State.name, (0, 0))
+				states[hand.State.name] = (count + 1, total + payout)
+
+	if rounds == 0:
+		print "No rounds."
+		return
+
+	net = sum(player.Net for player in stats.itervalues())
+	hands = sum(player.Hands for player in stats.itervalues())
+
+	print "{:,} rounds from {} to {}, {:,} players, {:,} hands.".format(
+		rounds, datetime.fromtimestamp(first).date(), datetime.fromtimestamp(last).date(),
+		len(stats), hands)
+	print "Players bet ${:,} and won ${:,} ({:+.2%} of their bets).".format(
+		bets, net, net / float(bets) if bets else 0)
+
+	for name in sorted(states):
+		count, total = states[name]
+		print "    {:<12} {:>6.2%} of hands, ${:+,}".format(name, count / float(hands), total)
+
+	ranked = sorted(stats.iteritems(), key = lambda item: item[1].Net, reverse = True)
+
+	for title, players in (("Biggest winners", ranked[:args.top]),
+		("Biggest losers", ranked[::-1][:args.top])):
+		print title
+
+		for steamID, player in players:
+			print "    {:<20} {:>12} over {:,} hands".format(
+				steamID, "${:+,}".format(player.Net), player.Hands)
+
+if __name__ == '__main__':
+	Main(sys.argv[1:])
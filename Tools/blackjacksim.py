@@ -0,0 +1,391 @@
+"""
+	Plays Blackjack without Steam to check the house edge and payout rules and
+	to see how many hands can be played a second. Cards come from deck.Deck and
+	hands are played and settled with blackjackhand.Hand, Player and
+	Hand.Payout(), so what's measured is the code the module runs.
+
+	Each strategy is played under each rule set. Hands are split into shards
+	which are played across a process pool when multiprocessing is available.
+
+	Usage:
+		python blackjacksim.py [--hands N] [--shards N] [--processes N]
+			[--strategy basic|table|stand|random ...] [--rules NAME ...] [--seed N]
+			[--states]
+"""
+import os
+import sys
+import math
+import time
+import random
+import argparse
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Modules'))
+
+import deck
+import blackjackstrategy
+from blackjackhand import HandStates, Player, Hand, InsurancePayout, GetValue
+
+# IronPython doesn't have multiprocessing, so shards are played one after
+# another there.
+try:
+	import multiprocessing
+except ImportError:
+	multiprocessing = None
+
+Bet = 100
+
+class Rules(object):
+	"""
+		What the table allows. The defaults are how the module plays.
+	"""
+	def __init__(self, hitSoft17 = True, double = True, split = True,
+		surrender = True, insurance = True, decks = 6, penetration = 0.75):
+		self.HitSoft17 = hitSoft17
+		self.Double = double
+		self.Split = split
+		self.Surrender = surrender
+		self.Insurance = insurance
+		self.Decks = decks
+		self.Penetration = penetration
+
+RuleSets = {
+	'module': Rules(),
+	'stand-soft-17': Rules(hitSoft17 = False),
+	'no-double': Rules(double = False),
+	'no-split': Rules(split = False),
+	'no-surrender': Rules(surrender = False),
+	'single-deck': Rules(decks = 1),
+}
+
+# Strategies
+class AlwaysStand(object):
+	def Insure(self, hand, upCard):
+		return False
+
+	def Action(self, hand, upCard, actions):
+		return 'stand'
+
+class RandomStrategy(object):
+	def __init__(self, rng):
+		self._rng = rng
+
+	def Insure(self, hand, upCard):
+		return self._rng.random() < 0.5
+
+	def Action(self, hand, upCard, actions):
+		return self._rng.choice(actions)
+
+class BasicStrategy(object):
+	"""
+		Basic strategy for a dealer that hits soft 17 and allows doubling after
+		splits and late surrender. Never takes insurance.
+	"""
+	def Insure(self, hand, upCard):
+		return False
+
+	def Action(self, hand, upCard, actions):
+		up = GetValue(upCard)
+		points = hand.GetPoints()
+
+		if 'surrender' in actions and not hand.Soft and \
+			((points == 16 and up >= 9) or (points == 15 and up >= 10)):
+			return 'surrender'
+
+		if 'split' in actions:
+			pair = GetValue(hand.Cards[0])
+
+			if pair == 8 or \
+				(pair == 9 and up in (2, 3, 4, 5, 6, 8, 9)) or \
+				(pair in (2, 3, 7) and up <= 7) or \
+				(pair == 6 and up <= 6) or \
+				(pair == 4 and up in (5, 6)):
+				return 'split'
+
+		if hand.Soft:
+			action = self._soft(points, up)
+		else:
+			action = self._hard(points, up)
+
+		if action == 'double' and not 'double' in actions:
+			# Soft 18 and 19 stand when they can't double.
+			return 'stand' if hand.Soft and points >= 18 else 'hit'
+
+		return action
+
+	def _soft(self, points, up):
+		if points >= 20:
+			return 'stand'
+		elif points == 19:
+			return 'double' if up == 6 else 'stand'
+		elif points == 18:
+			if up <= 6:
+				return 'double'
+
+			return 'stand' if up <= 8 else 'hit'
+		elif points == 17:
+			return 'double' if 3 <= up <= 6 else 'hit'
+		elif points >= 15:
+			return 'double' if 4 <= up <= 6 else 'hit'
+		else:
+			return 'double' if 5 <= up <= 6 else 'hit'
+
+	def _hard(self, points, up):
+		if points >= 17:
+			return 'stand'
+		elif points >= 13:
+			return 'stand' if up <= 6 else 'hit'
+		elif points == 12:
+			return 'stand' if 4 <= up <= 6 else 'hit'
+		elif points == 11:
+			return 'double'
+		elif points == 10:
+			return 'double' if up <= 9 else 'hit'
+		elif points == 9:
+			return 'double' if 3 <= up <= 6 else 'hit'
+		else:
+			return 'hit'
+
+class TableStrategy(object):
+	"""
+		Plays whatever the module's strategy tables (the hint command) say is
+		best. Never takes insurance.
+	"""
+	def __init__(self):
+		self._table = blackjackstrategy.Build()
+
+	def Insure(self, hand, upCard):
+		return False
+
+	def Action(self, hand, upCard, actions):
+		action, evs = self._table.GetHint(hand, upCard)
+		return max(actions, key = lambda action: evs.get(action, -2))
+
+Strategies = {
+	'basic': lambda rng: BasicStrategy(),
+	'table': lambda rng: TableStrategy(),
+	'stand': lambda rng: AlwaysStand(),
+	'random': RandomStrategy,
+}
+
+# Playing
+def _actions(player, hand, rules):
+	"""
+		Gets what the module would let a player do with a hand.
+	"""
+	actions = ['hit', 'stand']
+
+	if rules.Surrender:
+		actions.append('surrender')
+
+	if rules.Double and len(hand.Cards) == 2:
+		actions.append('double')
+
+	# The module can't finish split aces (they can't hit or stand), so they
+	# aren't offered.
+	if rules.Split and len(hand.Cards) == 2 and \
+		hand.Cards[0].Rank == hand.Cards[1].Rank and \
+		hand.Cards[0].Rank != deck.Ranks.Ace:
+		actions.append('split')
+
+	return actions
+
+def _play(cards, player, hand, action):
+	if action == 'hit':
+		hand.Deal(cards.GetCards())
+	elif action == 'stand':
+		hand.SetState(HandStates.Stand)
+	elif action == 'surrender':
+		hand.SetState(HandStates.Surrender)
+	elif action == 'double':
+		hand.Double(cards.GetCards())
+	elif action == 'split':
+		card = hand.Pop()
+		newHand = Hand()
+		newHand.Deal([card])
+		newHand.State = HandStates.Split
+		hand.State = HandStates.Split
+		hand.Deal(cards.GetCards())
+		newHand.Deal(cards.GetCards())
+		player.Hands.append(newHand)
+
+def PlayRound(cards, strategy, rules, bet = Bet):
+	"""
+		Plays one round against the dealer. Returns how much the player won or
+		lost, the player and the dealer's hand.
+	"""
+	dealerHand = Hand()
+	dealerHand.Deal(cards.GetCards(2))
+	upCard = dealerHand.Cards[0]
+
+	player = Player(bet)
+	hand = Hand()
+	hand.Deal(cards.GetCards(2))
+	player.Hands.append(hand)
+
+	canInsure = rules.Insurance and upCard.Rank == deck.Ranks.Ace
+
+	if canInsure and strategy.Insure(hand, upCard):
+		player.HasInsurance = True
+
+	while not player.CheckDone():
+		hand = next(hand for hand in player.Hands if not hand.Done)
+		actions = _actions(player, hand, rules)
+		_play(cards, player, hand, strategy.Action(hand, upCard, actions))
+
+	while dealerHand.State == HandStates.None:
+		points = dealerHand.GetPoints()
+
+		if points < 17 or (points == 17 and dealerHand.Soft and rules.HitSoft17):
+			dealerHand.Deal(cards.GetCards())
+		else:
+			break
+
+	total = sum(hand.Payout(bet, dealerHand) for hand in player.Hands)
+
+	if player.HasInsurance:
+		total += InsurancePayout(bet, dealerHand)
+
+	return total, player, dealerHand
+
+class Results(object):
+	"""
+		Running totals of a run, in units of the bet.
+	"""
+	def __init__(self):
+		self.Hands = 0
+		self.Total = 0.0
+		self.Squares = 0.0
+		self.Seconds = 0.0
+		self.States = {}
+
+	def Add(self, other):
+		self.Hands += other.Hands
+		self.Total += other.Total
+		self.Squares += other.Squares
+		self.Seconds += other.Seconds
+
+		for state, (count, total) in other.States.iteritems():
+			oldCount, oldTotal = self.States.get(state, (0, 0.0))
+			self.States[state] = (oldCount + count, oldTotal + total)
+
+	def EV(self):
+		return self.Total / self.Hands if self.Hands else 0.0
+
+	def Variance(self):
+		if self.Hands < 2:
+			return 0.0
+
+		mean = self.EV()
+		return (self.Squares - self.Hands * mean * mean) / (self.Hands - 1)
+
+	def Error(self):
+		"""
+			Gets the half-width of the 95% confidence interval of the EV.
+		"""
+		return 1.96 * math.sqrt(self.Variance() / self.Hands) if self.Hands else 0.0
+
+def RunShard(shard):
+	"""
+		Plays a number of rounds with a strategy under a rule set. Takes a
+		(strategy name, rule set name, hands, seed) tuple so that it can be
+		sent to a process pool.
+	"""
+	strategyName, ruleName, hands, seed = shard
+	rules = RuleSets[ruleName]
+	strategy = Strategies[strategyName](random.Random(seed))
+	cards = deck.Deck(rules.Decks, rules.Penetration, seed)
+	results = Results()
+	states = results.States
+	start = time.time()
+
+	for i in xrange(hands):
+		total, player, dealerHand = PlayRound(cards, strategy, rules)
+		units = total / float(Bet)
+		results.Total += units
+		results.Squares += units * units
+
+		# How each kind of finished hand paid out, to check the payout rules.
+		for hand in player.Hands:
+			name = hand.State.name
+			count, stateTotal = states.get(name, (0, 0.0))
+			payout = hand.Payout(Bet, dealerHand) / float(Bet)
+			states[name] = (count + 1, stateTotal + payout)
+
+		# Shuffle between rounds the way a table does.
+		cards.Discard(card for hand in player.Hands + [dealerHand] for card in hand.Cards)
+
+		if cards.NeedsShuffle():
+			cards.Shuffle()
+
+	results.Hands = hands
+	results.Seconds = time.time() - start
+	return results
+
+def Run(strategyName, ruleName, hands, shards, pool, seed):
+	perShard, extra = divmod(hands, shards)
+
+	# Every shard deals from its own stream, so runs with the same seed and
+	# shards come out the same however many processes play them.
+	work = [
+		(strategyName, ruleName, perShard + (1 if i < extra else 0), shardSeed)
+		for i, shardSeed in enumerate(deck.SpawnSeeds(seed, shards))
+	]
+	results = Results()
+	start = time.time()
+
+	for shard in (pool.imap_unordered(RunShard, work) if pool else map(RunShard, work)):
+		results.Add(shard)
+
+	return results, time.time() - start
+
+def Report(strategyName, ruleName, results, seconds, showStates):
+	print "{:<7} {:<14} {:>11,} hands {:>10,.0f} hands/s  EV {:+7.3%} +/- {:.3%}  var {:.3f}".format(
+		strategyName, ruleName, results.Hands, results.Hands / seconds,
+		results.EV(), results.Error(), results.Variance())
+
+	if showStates:
+		for name in sorted(results.States):
+			count, total = results.States[name]
+			print "    {:<12} {:>6.2%} of hands, pays {:+.3f}".format(
+				name, count / float(results.Hands), total / count)
+
+def Main(argv):
+	parser = argparse.ArgumentParser(description = "Play Blackjack without Steam.")
+	parser.add_argument('--hands', type = int, default = 1000000,
+		help = "How many hands to play for each strategy and rule set.")
+	parser.add_argument('--shards', type = int, default = 0,
+		help = "How many pieces to split the hands into. Defaults to one per process.")
+	parser.add_argument('--processes', type = int, default = 0,
+		help = "How many processes to play on. Defaults to one per CPU.")
+	parser.add_argument('--strategy', nargs = '+', choices = sorted(Strategies),
+		default = ['basic', 'stand', 'random'])
+	parser.add_argument('--rules', nargs = '+', choices = sorted(RuleSets),
+		default = ['module'])
+	parser.add_argument('--seed', type = int, default = 0)
+	parser.add_argument('--states', action = 'store_true',
+		help = "Show how often each kind of hand comes up and what it pays.")
+	args = parser.parse_args(argv)
+
+	processes = args.processes
+
+	if not multiprocessing:
+		processes = 1
+	elif processes <= 0:
+		processes = multiprocessing.cpu_count()
+
+	shards = args.shards if args.shards > 0 else processes
+	pool = multiprocessing.Pool(processes) if processes > 1 else None
+
+	try:
+		for ruleName in args.rules:
+			for strategyName in args.strategy:
+				results, seconds = Run(strategyName, ruleName, args.hands,
+					shards, pool, args.seed)
+				Report(strategyName, ruleName, results, seconds, args.states)
+	finally:
+		if pool:
+			pool.close()
+			pool.join()
+
+if __name__ == '__main__':
+	Main(sys.argv[1:])